@@ -1,3 +1,5 @@
+from operator import attrgetter
+
 from django.contrib import admin
 from .models import (
     User,
@@ -6,11 +8,41 @@ from .models import (
     Attribute,
     AttributeValue,
     AudioFile,
+    AudioAnalysis,
     Task,
     Annotation,
     AnnotationAttributeValue,
     SuperProject,
 )
+from .schema import bump_schema_version
+
+class LabelSchemaAdmin(admin.ModelAdmin):
+    # Edits to labels, attributes and values invalidate the project's cached label schema
+    project_path = 'project'
+
+    def project_of(self, obj):
+        return attrgetter(self.project_path.replace('__', '.'))(obj)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        bump_schema_version(self.project_of(obj))
+
+    def delete_model(self, request, obj):
+        project = self.project_of(obj)
+        super().delete_model(request, obj)
+        bump_schema_version(project)
+
+    def delete_queryset(self, request, queryset):
+        projects = list(Project.objects.filter(pk__in=queryset.values(self.project_path)))
+        super().delete_queryset(request, queryset)
+        for project in projects:
+            bump_schema_version(project)
+
+class AttributeAdmin(LabelSchemaAdmin):
+    project_path = 'label__project'
+
+class AttributeValueAdmin(LabelSchemaAdmin):
+    project_path = 'attribute__label__project'
 
 class AnnotationAdmin(admin.ModelAdmin):
     # Displaying the 'id' and other relevant fields
@@ -33,10 +65,11 @@ admin.site.register(Annotation, AnnotationAdmin)
 
 admin.site.register(User)
 admin.site.register(Project)
-admin.site.register(Label)
-admin.site.register(Attribute)
-admin.site.register(AttributeValue)
+admin.site.register(Label, LabelSchemaAdmin)
+admin.site.register(Attribute, AttributeAdmin)
+admin.site.register(AttributeValue, AttributeValueAdmin)
 admin.site.register(AudioFile)
+admin.site.register(AudioAnalysis)
 admin.site.register(Task)
 #admin.site.register(Annotation)
 admin.site.register(AnnotationAttributeValue)
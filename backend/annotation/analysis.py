@@ -0,0 +1,218 @@
+"""Single-pass analysis of ingested audio.
+
+Each AudioFile is decoded once, front to back, and every block is handed to
+each analyzer named in ``settings.INGEST_ANALYZERS``.  Analyzers are small
+stateful classes registered with :func:`register`; their results are stored
+together in one :class:`~annotation.models.AudioAnalysis` row along with the
+time each analyzer took.  A new analysis therefore adds CPU time only: no
+extra reads or decodes of the file.
+"""
+import time
+
+import numpy as np
+from django.conf import settings
+
+from . import audio
+
+ANALYZERS = {}
+
+
+def register(cls):
+    """Class decorator adding an analyzer to the registry under ``cls.name``."""
+    ANALYZERS[cls.name] = cls
+    return cls
+
+
+class Analyzer:
+    """Base class: ``process`` is called with consecutive ``[frames, channels]`` float32 blocks."""
+    name = None
+
+    def __init__(self, sample_rate, channels):
+        self.sample_rate = sample_rate
+        self.channels = channels
+
+    def process(self, block):
+        raise NotImplementedError
+
+    def result(self):
+        """JSON-serialisable output, called once after the last block."""
+        raise NotImplementedError
+
+
+def _db(power):
+    return round(float(10 * np.log10(max(power, 1e-20))), 2)
+
+
+@register
+class LoudnessAnalyzer(Analyzer):
+    """Overall RMS and peak level in dBFS."""
+    name = 'loudness'
+
+    def __init__(self, sample_rate, channels):
+        super().__init__(sample_rate, channels)
+        self.sum_squares = 0.0
+        self.frames = 0
+        self.peak = 0.0
+
+    def process(self, block):
+        self.sum_squares += float(np.square(block, dtype=np.float64).sum())
+        self.frames += block.size
+        if block.size:
+            self.peak = max(self.peak, float(np.abs(block).max()))
+
+    def result(self):
+        return {
+            'rms_dbfs': _db(self.sum_squares / max(self.frames, 1)),
+            'peak_dbfs': _db(self.peak ** 2),
+        }
+
+
+@register
+class ClippingAnalyzer(Analyzer):
+    """Number and fraction of samples at or near full scale, over all channels."""
+    name = 'clipping'
+    threshold = 0.999
+
+    def __init__(self, sample_rate, channels):
+        super().__init__(sample_rate, channels)
+        self.clipped = 0
+        self.samples = 0
+
+    def process(self, block):
+        self.clipped += int(np.count_nonzero(np.abs(block) >= self.threshold))
+        self.samples += block.size
+
+    def result(self):
+        return {'clipped_samples': self.clipped, 'ratio': self.clipped / max(self.samples, 1)}
+
+
+class FrameAnalyzer(Analyzer):
+    """Helper for analyzers working on fixed-length mono frames that may span blocks."""
+    frame_seconds = None
+
+    def __init__(self, sample_rate, channels):
+        super().__init__(sample_rate, channels)
+        self.frame_length = max(1, int(sample_rate * self.frame_seconds))
+        self.pending = np.zeros(0, dtype=np.float32)
+
+    def process(self, block):
+        samples = np.concatenate([self.pending, block.mean(axis=1)])
+        usable = len(samples) - len(samples) % self.frame_length
+        if usable:
+            self.process_frames(samples[:usable].reshape(-1, self.frame_length))
+        self.pending = samples[usable:]
+
+    def flush(self):
+        if len(self.pending):
+            self.process_frames(self.pending[np.newaxis, :])
+            self.pending = self.pending[:0]
+
+    def process_frames(self, frames):
+        raise NotImplementedError
+
+
+@register
+class PeaksAnalyzer(FrameAnalyzer):
+    """Max absolute amplitude per interval, suitable for drawing the waveform without the audio.
+
+    Peaks are taken per 10 ms and max-pooled into at most
+    ``settings.INGEST_PEAKS_MAX_POINTS`` values; ``interval`` is the span each covers.
+    """
+    name = 'peaks'
+    frame_seconds = 0.01
+
+    def __init__(self, sample_rate, channels):
+        super().__init__(sample_rate, channels)
+        self.peaks = []
+
+    def process_frames(self, frames):
+        self.peaks.append(np.abs(frames).max(axis=1))
+
+    def result(self):
+        self.flush()
+        return downsample_peaks(np.concatenate(self.peaks or [np.zeros(0)]), self.frame_seconds)
+
+
+def downsample_peaks(peaks, interval, max_points=None):
+    """Max-pool ``peaks`` taken every ``interval`` seconds into at most ``max_points``; return the ``peaks`` result."""
+    if max_points is None:
+        max_points = settings.INGEST_PEAKS_MAX_POINTS
+    peaks = np.asarray(peaks, dtype=np.float32)
+    factor = max(1, -(-len(peaks) // max_points))
+    if factor > 1:
+        peaks = np.pad(peaks, (0, -len(peaks) % factor)).reshape(-1, factor).max(axis=1)
+    return {'interval': round(interval * factor, 6), 'peaks': np.round(peaks, 3).tolist()}
+
+
+@register
+class SilenceAnalyzer(FrameAnalyzer):
+    """Silent spans: runs of 50 ms frames below ``threshold_db`` lasting at least ``min_silence`` seconds."""
+    name = 'silence'
+    frame_seconds = 0.05
+    threshold_db = -50.0
+    min_silence = 0.5
+
+    def __init__(self, sample_rate, channels):
+        super().__init__(sample_rate, channels)
+        self.silent = []
+
+    def process_frames(self, frames):
+        power = np.mean(np.square(frames, dtype=np.float64), axis=1)
+        self.silent.extend((10 * np.log10(np.maximum(power, 1e-20)) < self.threshold_db).tolist())
+
+    def result(self):
+        self.flush()
+        spans, start = [], None
+        for i, silent in enumerate(self.silent + [False]):
+            if silent and start is None:
+                start = i
+            elif not silent and start is not None:
+                if (i - start) * self.frame_seconds >= self.min_silence:
+                    spans.append([round(start * self.frame_seconds, 2), round(i * self.frame_seconds, 2)])
+                start = None
+        return {'spans': spans}
+
+
+class AnalysisPass:
+    """The configured analyzers, fed block by block until :meth:`finish`.
+
+    :func:`analyze` feeds a whole decode at once; an upload can feed the
+    frames that have arrived so far and the rest later.
+    """
+
+    def __init__(self, sample_rate, channels):
+        self.analyzers = [ANALYZERS[name](sample_rate, channels) for name in settings.INGEST_ANALYZERS]
+        self.timings = {'decode': 0.0, **{a.name: 0.0 for a in self.analyzers}}
+
+    def run(self, blocks):
+        """Feed every block of the iterator ``blocks``, timing their decode too; return how many frames."""
+        frames = 0
+        while True:
+            started = time.perf_counter()
+            block = next(blocks, None)
+            self.timings['decode'] += time.perf_counter() - started
+            if block is None:
+                return frames
+            for analyzer in self.analyzers:
+                started = time.perf_counter()
+                analyzer.process(block)
+                self.timings[analyzer.name] += time.perf_counter() - started
+            frames += len(block)
+
+    def finish(self):
+        """Return ``(results, timings)``; no blocks may follow."""
+        results = {}
+        for analyzer in self.analyzers:
+            started = time.perf_counter()
+            results[analyzer.name] = analyzer.result()
+            self.timings[analyzer.name] += time.perf_counter() - started
+        return results, {name: round(seconds, 4) for name, seconds in self.timings.items()}
+
+
+def analyze(source, metadata=None):
+    """Run the configured analyzers over one decode of ``source``; return ``(results, timings)``."""
+    if metadata is None:
+        metadata = audio.probe_metadata(source)
+    analysis_pass = AnalysisPass(metadata['sample_rate'], metadata['channels'])
+    analysis_pass.run(audio.iter_blocks(source, metadata['sample_rate'], metadata['channels']))
+    return analysis_pass.finish()
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AnnotationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'annotation'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from . import fingerprint  # noqa: F401  registers the fingerprint analyzer
@@ -0,0 +1,336 @@
+"""Decoded-audio cache shared by ingest, auto-annotation, feature extraction and export.
+
+Every AudioFile is decoded at most once per sample rate into a mono PCM
+``.npy`` file under ``settings.AUDIO_CACHE_DIR``.  Consumers memory-map that
+file and slice it, so repeated reads cost no decoding and no copies.  Entries
+are keyed by the source path together with its size and modification time, so
+a changed file is decoded again.  Encoded WAV clips of virtual chunk tasks
+are kept alongside under the same keys.  The cache is trimmed to
+``settings.AUDIO_CACHE_MAX_BYTES`` by evicting the least recently used entries.
+"""
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+
+import librosa
+import numpy as np
+import soundfile as sf
+from django.conf import settings
+
+MODEL_SAMPLE_RATE = 16000
+INT16_SCALE = 32768.0
+SEEKABLE_EXTENSIONS = ('.wav', '.flac')
+BLOCK_FRAMES = 65536
+ENTRY_EXTENSIONS = ('.npy', '.wav')
+
+
+def _cache_dir():
+    path = str(settings.AUDIO_CACHE_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _source_path(source):
+    """Accept an AudioFile, a FieldFile or a filesystem path."""
+    if hasattr(source, 'file') and hasattr(source.file, 'path'):
+        return source.file.path
+    if hasattr(source, 'path'):
+        return source.path
+    return str(source)
+
+
+def _prefix(path):
+    return hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return hashlib.sha1(f"{st.st_size}:{st.st_mtime_ns}".encode('ascii')).hexdigest()[:12]
+
+
+def _entries(prefix=''):
+    """Cache entries (decodes and encoded clips) whose names start with ``prefix``."""
+    return [
+        entry for extension in ENTRY_EXTENSIONS
+        for entry in glob.glob(os.path.join(_cache_dir(), f"{prefix}*{extension}"))
+    ]
+
+
+def _lookup(path, sr):
+    pattern = f"{_prefix(path)}-{_stamp(path)}_{sr or 'native'}_*.npy"
+    matches = glob.glob(os.path.join(_cache_dir(), pattern))
+    return matches[0] if matches else None
+
+
+def _encode(waveform):
+    if settings.AUDIO_CACHE_DTYPE == 'int16':
+        return np.clip(waveform * INT16_SCALE, -INT16_SCALE, INT16_SCALE - 1).astype(np.int16)
+    return waveform.astype(np.float32)
+
+
+def _save(waveform, target):
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=_cache_dir())
+    with os.fdopen(fd, 'wb') as f:
+        np.save(f, _encode(waveform))
+    os.replace(tmp_path, target)  # atomic, so concurrent readers never see partial files
+    evict(keep=target)
+
+
+def cached_path(source, sr=MODEL_SAMPLE_RATE):
+    """Return the path of the cached ``.npy`` for ``source`` at ``sr`` (None = native rate), decoding it if needed."""
+    path = _source_path(source)
+    if path.endswith('.npy'):
+        return path  # already a decoded waveform, e.g. from range_path()
+    hit = _lookup(path, sr)
+    if hit:
+        os.utime(hit)  # mark as recently used for eviction
+        return hit
+
+    # Decodes under an older stamp belong to a previous version of the file
+    stamp = _stamp(path)
+    for entry in _entries(f"{_prefix(path)}-"):
+        if not os.path.basename(entry).startswith(f"{_prefix(path)}-{stamp}_"):
+            _remove(entry)
+
+    waveform, native_sr = librosa.load(path, sr=sr, mono=True)
+    target = os.path.join(
+        _cache_dir(), f"{_prefix(path)}-{stamp}_{sr or 'native'}_{native_sr}.npy"
+    )
+    _save(waveform, target)
+    return target
+
+
+def range_path(source, start_time, duration, sr=MODEL_SAMPLE_RATE):
+    """Return a cached ``.npy`` holding only ``duration`` seconds of ``source`` from ``start_time``.
+
+    Used for virtual chunk tasks, so model workers see just their range
+    without the whole recording being decoded.
+    """
+    path = _source_path(source)
+    target = os.path.join(
+        _cache_dir(), f"{_prefix(path)}-{_stamp(path)}_range-{start_time:g}-{duration:g}_{sr}.npy"
+    )
+    if os.path.exists(target):
+        os.utime(target)
+        return target
+    samples, _ = read_range(path, start_time, start_time + duration, sr)
+    _save(samples, target)
+    return target
+
+
+def clip_path(source, start_time, duration):
+    """Return a cached native-rate WAV of ``duration`` seconds of ``source`` from ``start_time``.
+
+    Served for virtual chunk tasks, so repeated plays of a chunk neither
+    decode nor encode it again.
+    """
+    path = _source_path(source)
+    target = os.path.join(
+        _cache_dir(), f"{_prefix(path)}-{_stamp(path)}_clip-{start_time:g}-{duration:g}.wav"
+    )
+    if os.path.exists(target):
+        os.utime(target)
+        return target
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=_cache_dir())
+    with os.fdopen(fd, 'wb') as f:
+        write_clip(source, start_time, start_time + duration, f)
+    os.replace(tmp_path, target)
+    evict(keep=target)
+    return target
+
+
+def load_audio(source, sr=MODEL_SAMPLE_RATE):
+    """Return ``(waveform, sample_rate)`` as a read-only memory map of the cached decode.
+
+    The array is float32 in [-1, 1] or int16 depending on ``AUDIO_CACHE_DTYPE``;
+    use :func:`to_float` when float samples are required.  To read a short
+    span without decoding the whole file, use :func:`read_range`.
+    """
+    path = cached_path(source, sr)
+    sample_rate = int(os.path.splitext(path)[0].rsplit('_', 1)[1])
+    return np.load(path, mmap_mode='r'), sample_rate
+
+
+def to_float(samples):
+    if samples.dtype == np.int16:
+        return samples.astype(np.float32) / INT16_SCALE
+    return samples
+
+
+def read_range(source, start_time, end_time, sr=None):
+    """Return mono float samples between ``start_time`` and ``end_time`` (seconds) and the sample rate.
+
+    Only the requested span is decoded: a cached decode is sliced when one
+    exists, WAV/FLAC files are read by seeking to the sample offset, and other
+    formats are cut by ffmpeg with ``-ss``/``-t``.  ``sr=None`` keeps the
+    native rate.
+    """
+    path = _source_path(source)
+    hit = _lookup(path, sr)
+    if hit:
+        waveform = np.load(hit, mmap_mode='r')
+        sample_rate = int(os.path.splitext(hit)[0].rsplit('_', 1)[1])
+        start = max(0, int(start_time * sample_rate))
+        end = max(start, int(end_time * sample_rate))
+        return to_float(waveform[start:end]), sample_rate
+
+    duration = max(0.0, end_time - start_time)
+    if os.path.splitext(path)[1].lower() in SEEKABLE_EXTENSIONS:
+        samples, sample_rate = _read_seekable(path, start_time, duration)
+        if sr and sr != sample_rate:
+            samples = librosa.resample(samples, orig_sr=sample_rate, target_sr=sr)
+            sample_rate = sr
+        return samples, sample_rate
+    return _read_ffmpeg(path, start_time, duration, sr or _stored_sample_rate(source))
+
+
+def iter_blocks(source, sample_rate, channels, block_frames=BLOCK_FRAMES):
+    """Decode ``source`` front to back at its native rate, yielding float32 ``[frames, channels]`` blocks.
+
+    WAV/FLAC are read with soundfile, other formats through one ffmpeg pipe,
+    so the whole file is never held in memory.
+    """
+    path = _source_path(source)
+    if os.path.splitext(path)[1].lower() in SEEKABLE_EXTENSIONS:
+        yield from sf.blocks(path, blocksize=block_frames, dtype='float32', always_2d=True)
+        return
+
+    cmd = [
+        settings.FFMPEG_BINARY, '-nostdin', '-v', 'error', '-i', path,
+        '-f', 'f32le', '-ac', str(channels), '-ar', str(sample_rate), '-',
+    ]
+    block_bytes = block_frames * channels * 4
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as proc:
+        while True:
+            data = proc.stdout.read(block_bytes)
+            if not data:
+                break
+            data = data[:len(data) - len(data) % (channels * 4)]
+            yield np.frombuffer(data, dtype=np.float32).reshape(-1, channels)
+        stderr = proc.stderr.read()
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr)
+
+
+def _read_seekable(path, start_time, duration):
+    with sf.SoundFile(path) as f:
+        start = min(int(start_time * f.samplerate), f.frames)
+        f.seek(start)
+        samples = f.read(int(duration * f.samplerate), dtype='float32', always_2d=True)
+        return samples.mean(axis=1), f.samplerate
+
+
+def _read_ffmpeg(path, start_time, duration, sr):
+    sample_rate = sr or probe_sample_rate(path)
+    result = subprocess.run(
+        [
+            settings.FFMPEG_BINARY, '-nostdin', '-v', 'error',
+            '-ss', f"{start_time:.6f}", '-t', f"{duration:.6f}", '-i', path,
+            '-f', 'f32le', '-ac', '1', '-ar', str(sample_rate), '-',
+        ],
+        capture_output=True, check=True,
+    )
+    return np.frombuffer(result.stdout, dtype=np.float32), sample_rate
+
+
+def _ffprobe(path, entries):
+    result = subprocess.run(
+        [
+            settings.FFPROBE_BINARY, '-v', 'error', '-select_streams', 'a:0',
+            '-show_entries', entries, '-of', 'default=noprint_wrappers=1:nokey=1', path,
+        ],
+        capture_output=True, text=True, check=True,
+    )
+    return result.stdout.split()[0]
+
+
+def probe_sample_rate(path):
+    if os.path.splitext(path)[1].lower() in SEEKABLE_EXTENSIONS:
+        return sf.info(path).samplerate
+    return int(_ffprobe(path, 'stream=sample_rate'))
+
+
+def probe_metadata(source):
+    """Header metadata as a dict of duration, sample_rate, channels and codec, without decoding."""
+    path = _source_path(source)
+    if os.path.splitext(path)[1].lower() in SEEKABLE_EXTENSIONS:
+        info = sf.info(path)
+        return {
+            'duration': info.duration,
+            'sample_rate': info.samplerate,
+            'channels': info.channels,
+            'codec': info.subtype.lower(),
+        }
+    result = subprocess.run(
+        [
+            settings.FFPROBE_BINARY, '-v', 'error', '-select_streams', 'a:0',
+            '-show_entries', 'stream=codec_name,sample_rate,channels:format=duration', '-of', 'json', path,
+        ],
+        capture_output=True, text=True, check=True,
+    )
+    probe = json.loads(result.stdout)
+    stream = probe['streams'][0]
+    return {
+        'duration': float(probe['format']['duration']),
+        'sample_rate': int(stream['sample_rate']),
+        'channels': int(stream['channels']),
+        'codec': stream['codec_name'],
+    }
+
+
+def _stored_sample_rate(source):
+    """Native sample rate recorded on an AudioFile, or None when it has not been probed."""
+    return getattr(source, 'sample_rate', None) if hasattr(source, 'file') else None
+
+
+def probe_duration(path):
+    """Duration in seconds, read from the container header without decoding."""
+    if getattr(path, 'duration', None) is not None and hasattr(path, 'file'):
+        return path.duration  # already stored on the AudioFile
+    path = _source_path(path)
+    if os.path.splitext(path)[1].lower() in SEEKABLE_EXTENSIONS:
+        return sf.info(path).duration
+    return float(_ffprobe(path, 'format=duration'))
+
+
+def write_clip(source, start_time, end_time, out_path):
+    """Write the span ``[start_time, end_time]`` of ``source`` to ``out_path`` (a path or file object) as a native-rate WAV."""
+    samples, sample_rate = read_range(source, start_time, end_time, sr=None)
+    sf.write(out_path, samples, sample_rate, subtype='PCM_16', format='WAV')
+
+
+def invalidate(source):
+    """Remove every cached decode and clip of ``source``."""
+    for entry in _entries(f"{_prefix(_source_path(source))}-"):
+        _remove(entry)
+
+
+def _remove(entry):
+    try:
+        os.remove(entry)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def evict(max_bytes=None, keep=None):
+    """Delete least recently used entries until the cache fits in ``max_bytes``, sparing ``keep``."""
+    if max_bytes is None:
+        max_bytes = settings.AUDIO_CACHE_MAX_BYTES
+    entries = []
+    for entry in _entries():
+        try:
+            st = os.stat(entry)
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, entry))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries):
+        if total <= max_bytes:
+            break
+        if entry != keep and _remove(entry):
+            total -= size
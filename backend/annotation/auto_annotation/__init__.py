@@ -0,0 +1,163 @@
+"""Auto-annotation model runners.
+
+Each model lives in its own directory with an ``annotate.py`` script that is
+run as a subprocess (BEATs needs torch, YAMNet needs TensorFlow) and prints
+its predictions as JSON.  ``run_model`` dispatches on ``Project.model_type``.
+"""
+import json
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .. import audio
+from .silence import getAudacityStyleNonSilence
+
+BASE_ANNOTATION_DIR = os.path.dirname(__file__)
+
+
+def _run_annotation_script(model_dir, audio_path, segments=None, top_k=1):
+    """Run auto_annotation/<model_dir>/annotate.py and return its raw subprocess result."""
+    script_path = os.path.join(BASE_ANNOTATION_DIR, model_dir, 'annotate.py')
+    # The models read the shared 16 kHz decode instead of decoding the file themselves
+    if not audio_path.endswith('.npy'):
+        audio_path = audio.cached_path(audio_path)
+    args = ['python', script_path, audio_path]
+    if top_k > 1:
+        args += ['--top-k', str(top_k)]
+
+    # Restrict the model to the given (start_time, end_time) spans
+    segments_file = None
+    if segments is not None:
+        segments_file = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+        json.dump(segments, segments_file)
+        segments_file.close()
+        args.append(segments_file.name)
+
+    try:
+        return subprocess.run(args, capture_output=True, text=True)
+    finally:
+        if segments_file is not None:
+            os.remove(segments_file.name)
+
+def run_beats_model(audio_path, segments=None, top_k=1):
+    result = _run_annotation_script('beats', audio_path, segments, top_k)
+
+    # Always print both stdout and stderr for debugging
+    print("BEATs stdout:", result.stdout)
+    print("BEATs stderr:", result.stderr)
+
+    if result.returncode != 0:
+        print("BEATs annotation error (non-zero exit code):", result.stderr)
+        return []
+
+    if not result.stdout.strip():
+        print("BEATs annotation error: Empty stdout")
+        return []
+
+    try:
+        return json.loads(result.stdout.strip())
+    except json.JSONDecodeError as e:
+        print("JSON decode error:", e)
+        return []
+
+def run_yamnet_model(audio_path, segments=None, top_k=1):
+    result = _run_annotation_script('yamnet', audio_path, segments, top_k)
+    if result.returncode != 0:
+        print("YAMNet annotation error:", result.stderr)
+        return []
+    return json.loads(result.stdout.strip())
+
+def run_cascade_model(audio_path):
+    """Label every segment with YAMNet and re-run only the uncertain ones through BEATs."""
+    threshold = settings.CASCADE_CONFIDENCE_THRESHOLD
+    ambiguous = {name.lower() for name in settings.CASCADE_AMBIGUOUS_CLASSES}
+
+    predictions = run_yamnet_model(audio_path)
+    # Silence is dropped on ingest, so it is not worth a BEATs pass however uncertain
+    escalated = [
+        i for i, pred in enumerate(predictions)
+        if pred['label'].lower() != 'silence'
+        and (pred.get('confidence', 0.0) < threshold or pred['label'].lower() in ambiguous)
+    ]
+
+    if escalated:
+        segments = [[predictions[i]['start_time'], predictions[i]['end_time']] for i in escalated]
+        beats_predictions = run_beats_model(audio_path, segments=segments)
+        if len(beats_predictions) == len(escalated):
+            for i, pred in zip(escalated, beats_predictions):
+                predictions[i] = pred
+        else:
+            print("Cascade: BEATs returned", len(beats_predictions), "of", len(escalated),
+                  "segments, keeping YAMNet labels")
+            escalated = []
+
+    total = len(predictions)
+    if total:
+        print(f"Cascade stage hit rates for {os.path.basename(audio_path)}: "
+              f"YAMNet {total - len(escalated)}/{total} ({100 * (total - len(escalated)) / total:.1f}%), "
+              f"BEATs {len(escalated)}/{total} ({100 * len(escalated) / total:.1f}%)")
+    return predictions
+
+def run_ensemble_model(audio_path):
+    """Run BEATs and YAMNet concurrently on one decoded waveform and fuse their scores."""
+    weights = settings.ENSEMBLE_WEIGHTS
+    top_k = settings.ENSEMBLE_TOP_K
+
+    # Decode once to 16 kHz; both model processes memory-map the same cached .npy
+    waveform_path = audio.cached_path(audio_path)
+    waveform, _ = audio.load_audio(audio_path)
+    segments = [
+        [round(start / 16000, 2), round(end / 16000, 2)]
+        for start, end in getAudacityStyleNonSilence(audio.to_float(waveform))
+    ]
+    if not segments:
+        return []
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        beats_future = pool.submit(run_beats_model, waveform_path, segments, top_k)
+        yamnet_future = pool.submit(run_yamnet_model, waveform_path, segments, top_k)
+        outputs = {'beats': beats_future.result(), 'yamnet': yamnet_future.result()}
+    return fuse_predictions(segments, outputs, weights)
+
+def fuse_predictions(segments, outputs, weights):
+    """One prediction per segment from the weighted sum of each model's label scores.
+
+    ``outputs`` maps a model name to its per-segment predictions; a model
+    whose output does not have one prediction per segment is left out.
+    """
+    predictions = []
+    for i, (start_time, end_time) in enumerate(segments):
+        fused = {}
+        for name, preds in outputs.items():
+            if len(preds) != len(segments):
+                continue  # a failed model contributes nothing
+            pred = preds[i]
+            for label, score in pred.get('scores', {pred['label']: pred.get('confidence', 1.0)}).items():
+                fused[label] = fused.get(label, 0.0) + weights.get(name, 0.0) * score
+        if not fused:
+            continue
+        label = max(fused, key=fused.get)
+        predictions.append({
+            'start_time': start_time,
+            'end_time': end_time,
+            'label': label,
+            'confidence': round(fused[label], 4),
+        })
+    return predictions
+
+AUTO_ANNOTATION_MODELS = {
+    'beats': run_beats_model,
+    'yamnet': run_yamnet_model,
+    'cascade': run_cascade_model,
+    'ensemble': run_ensemble_model,
+}
+
+def run_model(model_type, audio_path):
+    """Run the auto-annotation model for ``model_type``; 'others' yields no predictions."""
+    runner = AUTO_ANNOTATION_MODELS.get(model_type)
+    if runner is None:
+        return []
+    return runner(audio_path)
@@ -2,6 +2,7 @@ import os
 import sys
 import csv
 import json
+import argparse
 import torch
 import torchaudio
 import numpy as np
@@ -9,75 +10,13 @@ import numpy as np
 # Add src to path for BEATs import
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 from BEATs import BEATs, BEATsConfig
+from early_exit import ExitHeads, extract_features_early_exit
 
+# Shared silence detection lives one level up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from silence import getAudacityStyleNonSilence
 
-def db_to_power(db):
-    return 10 ** (db / 10)
-
-
-def getAudacityStyleNonSilence(
-    data,
-    sample_rate=16000,
-    frame_duration_ms=10,
-    db_threshold=-18.0,
-    threshold_measurement="peak",
-    min_silence_sec=0.01,
-    min_label_interval_sec=0.02,
-    min_non_silence_sec=0.1,
-    max_leading_silence=0.0,
-    max_trailing_silence=0.0
-):
-    frame_len = int(sample_rate * frame_duration_ms / 1000)
-    num_frames = len(data) // frame_len
-
-    if threshold_measurement == "peak":
-        frame_powers = np.array([
-            np.max(np.abs(data[i * frame_len:(i + 1) * frame_len])) ** 2
-            for i in range(num_frames)
-        ])
-    else:
-        raise NotImplementedError("Only 'peak' thresholding is implemented")
-
-    power_threshold = db_to_power(db_threshold)
-    is_loud = frame_powers > power_threshold
-
-    min_silence_frames = int(min_silence_sec * sample_rate / frame_len)
-    min_label_interval_frames = int(min_label_interval_sec * sample_rate / frame_len)
-    min_non_silence_frames = int(min_non_silence_sec * sample_rate / frame_len)
-    lead_frames = int(max_leading_silence * sample_rate / frame_len)
-    trail_frames = int(max_trailing_silence * sample_rate / frame_len)
-
-    segments = []
-    in_segment = False
-    seg_start = None
-    silence_counter = 0
-
-    for i, loud in enumerate(is_loud):
-        if loud:
-            if not in_segment:
-                in_segment = True
-                seg_start = max(0, i - lead_frames)
-            silence_counter = 0
-        else:
-            if in_segment:
-                silence_counter += 1
-                if silence_counter >= min_silence_frames:
-                    seg_end = min(i - silence_counter + trail_frames, num_frames - 1)
-                    num_frames_in_segment = seg_end - seg_start + 1
-                    if (num_frames_in_segment >= min_label_interval_frames and
-                            num_frames_in_segment >= min_non_silence_frames):
-                        segments.append((seg_start * frame_len, (seg_end + 1) * frame_len))
-                    in_segment = False
-                    silence_counter = 0
-
-    if in_segment:
-        seg_end = min(num_frames - 1, num_frames - 1 + trail_frames)
-        num_frames_in_segment = seg_end - seg_start + 1
-        if (num_frames_in_segment >= min_label_interval_frames and
-                num_frames_in_segment >= min_non_silence_frames):
-            segments.append((seg_start * frame_len, (seg_end + 1) * frame_len))
-
-    return segments
+EXIT_HEADS_PATH = os.path.join(os.path.dirname(__file__), 'checkpoint', 'BEATs_exit_heads.pt')
 
 
 # Load label map from CSV
@@ -106,6 +45,21 @@ def load_model():
     return model, label_dict, model_label_dict
 
 
+# Load the per-layer exit heads produced by calibrate_exits.py, if any
+def load_exit_heads(model):
+    if not os.path.exists(EXIT_HEADS_PATH):
+        return None
+    state = torch.load(EXIT_HEADS_PATH, map_location='cpu')
+    exit_heads = ExitHeads(
+        num_layers=len(model.encoder.layers) - 1,
+        embed_dim=model.cfg.encoder_embed_dim,
+        num_classes=model.cfg.predictor_class,
+    )
+    exit_heads.load_state_dict(state)
+    exit_heads.eval()
+    return exit_heads
+
+
 def pad_or_crop(chunk, target_len=40000):
     if chunk.size(-1) > target_len:
         return chunk[..., :target_len]
@@ -114,24 +68,45 @@ def pad_or_crop(chunk, target_len=40000):
         return torch.nn.functional.pad(chunk, (0, pad_amt))
     return chunk
 
-def annotate(file_path, top_k=1, energy_threshold=0.01):
+# Load mono 16 kHz audio as numpy; a .npy is an already decoded waveform shared by the caller
+def load_waveform(file_path):
+    if file_path.endswith('.npy'):
+        waveform = np.load(file_path, mmap_mode='r')
+        if waveform.dtype == np.int16:
+            waveform = waveform.astype(np.float32) / 32768.0
+        return waveform
     waveform, sr = torchaudio.load(file_path)
     if sr != 16000:
         waveform = torchaudio.transforms.Resample(sr, 16000)(waveform)
-    waveform = waveform.mean(dim=0).numpy()  # to numpy for getAudacityStyleNonSilence
+    return waveform.mean(dim=0).numpy()  # to numpy for getAudacityStyleNonSilence
+
+def annotate(file_path, top_k=1, energy_threshold=0.01, segments=None):
+    waveform = load_waveform(file_path)
 
     model, label_dict, model_label_dict = load_model()
+    exit_heads = load_exit_heads(model)
+    exit_counts = {}
 
     merged_results = []
 
-    for start_sample, end_sample in getAudacityStyleNonSilence(waveform):
+    # Explicit (start_time, end_time) spans, e.g. from the cascade, skip silence detection
+    if segments is not None:
+        spans = [(int(start * 16000), int(end * 16000)) for start, end in segments]
+    else:
+        spans = getAudacityStyleNonSilence(waveform)
+
+    for start_sample, end_sample in spans:
         segment = waveform[start_sample:end_sample]
-        segment_tensor = torch.from_numpy(segment).float().unsqueeze(0)
+        segment_tensor = torch.from_numpy(np.array(segment, dtype=np.float32)).unsqueeze(0)
 
         padded = pad_or_crop(segment_tensor)
 
         with torch.no_grad():
-            logits = model.extract_features(padded)[0]
+            if exit_heads is not None:
+                logits, exit_layer = extract_features_early_exit(model, exit_heads, padded)
+                exit_counts[exit_layer] = exit_counts.get(exit_layer, 0) + 1
+            else:
+                logits = model.extract_features(padded)[0]
 
         probs = logits.squeeze()
         top_val, top_idx = torch.topk(probs, top_k)
@@ -149,18 +124,33 @@ def annotate(file_path, top_k=1, energy_threshold=0.01):
         merged_results.append({
             "start_time": start_time,
             "end_time": end_time,
-            "label": label
+            "label": label,
+            "confidence": round(prob, 4)
         })
+        if top_k > 1:
+            merged_results[-1]["scores"] = {
+                label_dict.get(model_label_dict[int(i)], "unknown"): round(v.item(), 4)
+                for v, i in zip(top_val, top_idx)
+            }
+
+    if exit_counts:
+        # stdout carries the JSON result, so report exit statistics on stderr
+        print("BEATs exit layers:", dict(sorted(exit_counts.items())), file=sys.stderr)
 
     return merged_results
 
 
 # CLI usage
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python annotate.py <audio_file>")
-        sys.exit(1)
-
-    audio_file = sys.argv[1]
-    output = annotate(audio_file)
+    parser = argparse.ArgumentParser(description="Annotate an audio file with BEATs")
+    parser.add_argument("audio_file", help="audio file, or a 16 kHz float32 .npy waveform")
+    parser.add_argument("segments", nargs="?", help="JSON list of [start_time, end_time] spans")
+    parser.add_argument("--top-k", type=int, default=1, help="include the top-k class scores per segment")
+    args = parser.parse_args()
+
+    segments = None
+    if args.segments:
+        with open(args.segments) as f:
+            segments = json.load(f)
+    output = annotate(args.audio_file, top_k=args.top_k, segments=segments)
     print(json.dumps(output, indent=2))
@@ -0,0 +1,109 @@
+"""Offline calibration of the BEATs early-exit heads.
+
+Runs the full model over the non-silent segments of a directory of audio
+files, trains one linear head per intermediate encoder layer to reproduce the
+final predictor's probabilities, and picks for every layer the lowest
+confidence threshold at which its top-1 label agrees with the final head on
+at least ``--agreement`` of the held-out segments.  The result is written to
+``checkpoint/BEATs_exit_heads.pt`` and picked up by annotate.py.
+
+Usage: python calibrate_exits.py <audio_dir> [--agreement 0.97] [--epochs 200]
+"""
+import os
+import sys
+import argparse
+
+import torch
+import torchaudio
+
+from annotate import (
+    EXIT_HEADS_PATH, getAudacityStyleNonSilence, load_model, pad_or_crop,
+)
+from early_exit import ExitHeads, embed, exit_threshold
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.ogg', '.m4a')
+
+
+def collect_segments(audio_dir):
+    for name in sorted(os.listdir(audio_dir)):
+        if not name.lower().endswith(AUDIO_EXTENSIONS):
+            continue
+        waveform, sr = torchaudio.load(os.path.join(audio_dir, name))
+        if sr != 16000:
+            waveform = torchaudio.transforms.Resample(sr, 16000)(waveform)
+        waveform = waveform.mean(dim=0).numpy()
+        for start_sample, end_sample in getAudacityStyleNonSilence(waveform):
+            segment = torch.from_numpy(waveform[start_sample:end_sample]).float().unsqueeze(0)
+            yield pad_or_crop(segment)
+
+
+def extract_layer_features(model, segments):
+    """Return pooled per-layer features [N, L-1, C] and final probabilities [N, K]."""
+    last = len(model.encoder.layers) - 1
+    pooled, targets = [], []
+    with torch.no_grad():
+        for segment in segments:
+            targets.append(model.extract_features(segment)[0].squeeze(0))
+            # layer_results[0] is the encoder input, layer_results[i + 1] the output of layer i
+            _, layer_results = model.encoder.extract_features(
+                embed(model, segment), tgt_layer=last
+            )
+            pooled.append(torch.stack([x.mean(dim=0).squeeze(0) for x, _ in layer_results[1:last + 1]]))
+    return torch.stack(pooled), torch.stack(targets)
+
+
+def train_heads(exit_heads, features, targets, epochs, lr=1e-3):
+    optimizer = torch.optim.Adam(exit_heads.parameters(), lr=lr)
+    for _ in range(epochs):
+        optimizer.zero_grad()
+        loss = sum(
+            torch.nn.functional.binary_cross_entropy(exit_heads(features[:, i], i), targets)
+            for i in range(len(exit_heads.heads))
+        )
+        loss.backward()
+        optimizer.step()
+
+
+def pick_thresholds(exit_heads, features, targets, agreement):
+    teacher = targets.argmax(dim=-1)
+    with torch.no_grad():
+        for i in range(len(exit_heads.heads)):
+            probs = exit_heads(features[:, i], i)
+            confidence, predicted = probs.max(dim=-1)
+            threshold, accepted = exit_threshold(confidence, predicted == teacher, agreement)
+            exit_heads.thresholds[i] = threshold
+            print(f"layer {i}: threshold={threshold:.3f} accepted={accepted}/{len(confidence)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('audio_dir')
+    parser.add_argument('--agreement', type=float, default=0.97)
+    parser.add_argument('--epochs', type=int, default=200)
+    parser.add_argument('--holdout', type=float, default=0.2)
+    args = parser.parse_args()
+
+    model, _, _ = load_model()
+    features, targets = extract_layer_features(model, collect_segments(args.audio_dir))
+    if len(features) < 2:
+        print("Not enough non-silent segments to calibrate")
+        sys.exit(1)
+
+    perm = torch.randperm(len(features))
+    split = max(1, int(len(features) * args.holdout))
+    held_out, train = perm[:split], perm[split:]
+
+    exit_heads = ExitHeads(
+        num_layers=features.shape[1],
+        embed_dim=features.shape[2],
+        num_classes=targets.shape[1],
+    )
+    train_heads(exit_heads, features[train], targets[train], args.epochs)
+    pick_thresholds(exit_heads, features[held_out], targets[held_out], args.agreement)
+
+    torch.save(exit_heads.state_dict(), EXIT_HEADS_PATH)
+    print(f"Saved exit heads to {EXIT_HEADS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
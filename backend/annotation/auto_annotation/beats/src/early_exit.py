@@ -0,0 +1,96 @@
+import math
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+class ExitHeads(nn.Module):
+    """One linear classifier per intermediate encoder layer.
+
+    Each head maps the time-averaged output of its layer to the same classes
+    as the fine-tuned predictor.  ``thresholds[i]`` is the confidence (max
+    sigmoid probability) above which the prediction of head ``i`` is trusted
+    instead of running the remaining layers; ``inf`` disables exiting there.
+    """
+
+    def __init__(self, num_layers, embed_dim=768, num_classes=527):
+        super().__init__()
+        self.heads = nn.ModuleList([nn.Linear(embed_dim, num_classes) for _ in range(num_layers)])
+        self.register_buffer("thresholds", torch.full((num_layers,), math.inf))
+
+    def forward(self, pooled, layer):
+        return torch.sigmoid(self.heads[layer](pooled))
+
+
+def exit_threshold(confidence, agrees, agreement):
+    """Lowest confidence at which a head's accepted predictions still agree often enough with the final head.
+
+    ``confidence`` holds the head's top-1 confidence and ``agrees`` whether its
+    top-1 label matched the final head, per held-out segment.  Thresholds are
+    walked from the most to the least confident segment, keeping the lowest
+    one whose accepted set agrees on at least ``agreement`` of its segments.
+    Returns ``(threshold, accepted)``; ``inf`` and 0 when no threshold qualifies.
+    """
+    order = confidence.argsort(descending=True)
+    running = agrees[order].float().cumsum(0) / torch.arange(1, len(order) + 1)
+    ok = (running >= agreement).nonzero()
+    if not len(ok):
+        return math.inf, 0
+    last = int(ok.max())
+    return confidence[order][last].item(), last + 1
+
+
+def embed(model, source):
+    """Run the BEATs front end (fbank, patch embedding, projection)."""
+    fbank = model.preprocess(source).unsqueeze(1)
+    features = model.patch_embedding(fbank)
+    features = features.reshape(features.shape[0], features.shape[1], -1)
+    features = features.transpose(1, 2)
+    features = model.layer_norm(features)
+    if model.post_extract_proj is not None:
+        features = model.post_extract_proj(features)
+    return model.dropout_input(features)
+
+
+def iter_layers(model, source):
+    """Yield ``(layer_index, B x T x C output)`` after each encoder layer."""
+    encoder = model.encoder
+    x = embed(model, source)
+
+    x_conv = encoder.pos_conv(x.transpose(1, 2)).transpose(1, 2)
+    x = x + x_conv
+    if not encoder.layer_norm_first:
+        x = encoder.layer_norm(x)
+    x = F.dropout(x, p=encoder.dropout, training=encoder.training)
+
+    # B x T x C -> T x B x C
+    x = x.transpose(0, 1)
+    pos_bias = None
+    last = len(encoder.layers) - 1
+    for i, layer in enumerate(encoder.layers):
+        x, _, pos_bias = layer(x, self_attn_padding_mask=None, need_weights=False, pos_bias=pos_bias)
+        out = x.transpose(0, 1)
+        if i == last and encoder.layer_norm_first:
+            out = encoder.layer_norm(out)
+        yield i, out
+
+
+def extract_features_early_exit(model, exit_heads, source):
+    """Classify ``source`` stopping at the first confident intermediate layer.
+
+    Returns ``(probs, exit_layer)`` where ``probs`` has the same shape as the
+    first output of ``BEATs.extract_features`` and ``exit_layer`` is the index
+    of the layer whose head produced it (the last layer means no early exit).
+    """
+    last = len(model.encoder.layers) - 1
+    for i, x in iter_layers(model, source):
+        if i == last:
+            logits = model.predictor(model.predictor_dropout(x)).mean(dim=1)
+            return torch.sigmoid(logits), i
+
+        # The heads are linear, so pooling before projecting is equivalent
+        # to averaging per-frame logits the way the final predictor does.
+        probs = exit_heads(x.mean(dim=1), i)
+        if probs.max(dim=-1).values.min() >= exit_heads.thresholds[i]:
+            return probs, i
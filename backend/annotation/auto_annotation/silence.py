@@ -0,0 +1,83 @@
+"""Silence detection shared by the auto-annotation models.
+
+Pure numpy so it can be used both by the model scripts and by the Django
+process when it needs the segment list before running any model.
+"""
+import numpy as np
+
+
+def db_to_power(db):
+    """Convert dB to linear power ratio (peak power)."""
+    return 10 ** (db / 10)
+
+def getAudacityStyleNonSilence(
+    data,
+    sample_rate=16000,
+    frame_duration_ms=10,
+    db_threshold=-18.0,
+    threshold_measurement="peak",  # Only 'peak' implemented
+    min_silence_sec=0.01,
+    min_label_interval_sec=0.02,
+    min_non_silence_sec=0.1,          # <-- New!
+    max_leading_silence=0.0,
+    max_trailing_silence=0.0
+):
+    """
+    Mimics Audacity's 'Label Sounds' tool with added min_non_silence_sec filtering.
+    Returns (start_sample, end_sample) tuples.
+    """
+    frame_len = int(sample_rate * frame_duration_ms / 1000)
+    num_frames = len(data) // frame_len
+
+    # Compute per-frame power
+    if threshold_measurement == "peak":
+        frame_powers = np.array([
+            np.max(np.abs(data[i*frame_len:(i+1)*frame_len]))**2
+            for i in range(num_frames)
+        ])
+    else:
+        raise NotImplementedError("Only 'peak' thresholding is implemented")
+
+    power_threshold = db_to_power(db_threshold)
+
+    is_loud = frame_powers > power_threshold
+
+    # Frame-based thresholds
+    min_silence_frames = int(min_silence_sec * sample_rate / frame_len)
+    min_label_interval_frames = int(min_label_interval_sec * sample_rate / frame_len)
+    min_non_silence_frames = int(min_non_silence_sec * sample_rate / frame_len)
+    lead_frames = int(max_leading_silence * sample_rate / frame_len)
+    trail_frames = int(max_trailing_silence * sample_rate / frame_len)
+
+    segments = []
+    in_segment = False
+    seg_start = None
+    silence_counter = 0
+
+    for i, loud in enumerate(is_loud):
+        if loud:
+            if not in_segment:
+                in_segment = True
+                seg_start = max(0, i - lead_frames)
+            silence_counter = 0
+        else:
+            if in_segment:
+                silence_counter += 1
+                if silence_counter >= min_silence_frames:
+                    seg_end = min(i - silence_counter + trail_frames, num_frames - 1)
+                    num_frames_in_segment = seg_end - seg_start + 1
+                    if (num_frames_in_segment >= min_label_interval_frames and
+                        num_frames_in_segment >= min_non_silence_frames):
+                        segments.append((seg_start * frame_len, (seg_end + 1) * frame_len))
+                    in_segment = False
+                    silence_counter = 0
+
+    # Handle segment at the end
+    if in_segment:
+        seg_end = min(num_frames - 1, num_frames - 1 + trail_frames)
+        num_frames_in_segment = seg_end - seg_start + 1
+        if (num_frames_in_segment >= min_label_interval_frames and
+            num_frames_in_segment >= min_non_silence_frames):
+            segments.append((seg_start * frame_len, (seg_end + 1) * frame_len))
+
+    return segments
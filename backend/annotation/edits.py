@@ -0,0 +1,206 @@
+"""Applying annotation edits from the annotation UI.
+
+Full saves are diffed against the rows already stored, and batches of
+add/update/delete operations only touch the rows they name.  Either way
+unchanged annotations are left alone, changed ones are written with
+``bulk_update``, new ones with ``bulk_create`` and removed ones deleted, all
+in one transaction.  Labels, attributes and values are resolved with one
+query each, so the number of queries does not grow with the number of
+annotations.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import Annotation, AnnotationAttributeValue, Attribute, AttributeValue, Label, Task
+
+ANNOTATION_FIELDS = ['label', 'start_time', 'end_time', 'model_label']
+
+
+class Lookups:
+    """Labels, attributes and values referenced by a batch of client items, fetched once."""
+
+    def __init__(self, items):
+        label_ids, attribute_ids, value_ids = set(), set(), set()
+        for item in items:
+            if item.get('label_id'):
+                label_ids.add(int(item['label_id']))
+            for attr in item.get('attributes') or []:
+                attribute_ids.add(int(attr['attribute_id']))
+                value_ids.add(int(attr['value_id']))
+        self.labels = Label.objects.in_bulk(label_ids) if label_ids else {}
+        self.attributes = Attribute.objects.in_bulk(attribute_ids) if attribute_ids else {}
+        self.values = AttributeValue.objects.in_bulk(value_ids) if value_ids else {}
+
+    def fields(self, item, partial=False):
+        """Annotation field values for a client item; with ``partial`` only those the item sends."""
+        fields = {}
+        if not partial or 'label_id' in item:
+            fields['label'] = self.labels.get(int(item['label_id'])) if item.get('label_id') else None
+        for name in ('start_time', 'end_time'):
+            if not partial or name in item:
+                fields[name] = item[name]
+        if not partial or 'model_label' in item:
+            fields['model_label'] = item.get('model_label')
+        return fields
+
+    def attribute_pairs(self, item):
+        """``(attribute_id, value_id)`` pairs of a client item that refer to existing rows."""
+        pairs = set()
+        for attr in item.get('attributes') or []:
+            attribute_id, value_id = int(attr['attribute_id']), int(attr['value_id'])
+            if attribute_id in self.attributes and value_id in self.values:
+                pairs.add((attribute_id, value_id))
+        return pairs
+
+
+def bump_version(tasks):
+    """Mark the annotations of ``tasks`` (a Task queryset) as changed, so cached copies are refetched."""
+    tasks.update(annotations_version=F('annotations_version') + 1)
+
+
+def apply_fields(annotation, fields):
+    """Set ``fields`` on ``annotation``; return True if anything changed."""
+    changed = False
+    for name, value in fields.items():
+        current = getattr(annotation, name + '_id') if name == 'label' else getattr(annotation, name)
+        new = value.id if name == 'label' and value is not None else value
+        if current != new:
+            setattr(annotation, name, value)
+            changed = True
+    return changed
+
+
+def sync_attribute_values(wanted):
+    """Bring the attribute values of saved annotations in line with ``wanted``: ``(annotation, pairs)`` tuples.
+
+    Existing values must be prefetched (``attribute_values``) for annotations
+    that already existed.  Returns the number of rows deleted or created.
+    """
+    stale, new = [], []
+    for annotation, pairs in wanted:
+        current = {}
+        if getattr(annotation, '_prefetched_objects_cache', {}).get('attribute_values') is not None:
+            current = {(av.attribute_id, av.value_id): av.id for av in annotation.attribute_values.all()}
+        stale += [av_id for pair, av_id in current.items() if pair not in pairs]
+        new += [
+            AnnotationAttributeValue(annotation=annotation, attribute_id=attribute_id, value_id=value_id)
+            for attribute_id, value_id in pairs - set(current)
+        ]
+    if stale:
+        AnnotationAttributeValue.objects.filter(pk__in=stale).delete()
+    AnnotationAttributeValue.objects.bulk_create(new, batch_size=settings.INGEST_BATCH_SIZE)
+    return len(stale) + len(new)
+
+
+def replace_annotations(task, items):
+    """Make ``task``'s annotations match ``items``, the complete list sent by the client.
+
+    Items carrying the ``annotation_id`` (or, as returned by get_annotations,
+    the ``id``) of one of the task's annotations update it; other items are
+    created; annotations not in ``items`` are deleted.  Returns
+    ``(created, updated, deleted)`` counts.
+    """
+    existing = {ann.id: ann for ann in task.annotations.prefetch_related('attribute_values')}
+    lookups = Lookups(items)
+
+    to_create, to_update, kept, wanted = [], [], set(), []
+    for item in items:
+        annotation_id = item.get('annotation_id') or item.get('id')
+        annotation = existing.get(int(annotation_id)) if annotation_id else None
+        if annotation is None or annotation.id in kept:
+            annotation = Annotation(task=task, **lookups.fields(item))
+            to_create.append(annotation)
+        else:
+            kept.add(annotation.id)
+            if apply_fields(annotation, lookups.fields(item)):
+                to_update.append(annotation)
+        wanted.append((annotation, lookups.attribute_pairs(item)))
+
+    deleted = set(existing) - kept
+    batch_size = settings.INGEST_BATCH_SIZE
+    with transaction.atomic():
+        if deleted:
+            Annotation.objects.filter(pk__in=deleted).delete()
+        Annotation.objects.bulk_update(to_update, ANNOTATION_FIELDS, batch_size=batch_size)
+        Annotation.objects.bulk_create(to_create, batch_size=batch_size)
+        if sync_attribute_values(wanted) or to_create or to_update or deleted:
+            bump_version(Task.objects.filter(pk=task.pk))
+    return len(to_create), len(to_update), len(deleted)
+
+
+class OperationError(ValueError):
+    """A batch operation is malformed or refers to an unknown annotation."""
+
+
+def apply_operations(task, operations):
+    """Apply ordered ``add``/``update``/``delete`` operations to ``task``'s annotations atomically.
+
+    ``add`` carries a client-generated ``client_id`` that later operations in
+    the same batch may use instead of a server ``id``.  ``update`` only changes
+    the fields it sends.  Nothing is written unless every operation is valid.
+    Returns ``(changed_ids, client_ids, deleted_ids)`` where ``client_ids`` maps
+    each added ``client_id`` to its new id.
+    """
+    for op in operations:
+        if op.get('op') not in ('add', 'update', 'delete'):
+            raise OperationError(f"Unknown operation {op.get('op')!r}")
+
+    server_ids = {int(op['id']) for op in operations if op['op'] != 'add' and op.get('id') is not None}
+    existing = {
+        ann.id: ann for ann in task.annotations.filter(pk__in=server_ids).prefetch_related('attribute_values')
+    }
+    lookups = Lookups([op.get('annotation') or {} for op in operations])
+
+    # Keys are ('client', client_id) for annotations added in this batch and ('id', id) for stored ones
+    added, changed, deleted, attributes = {}, {}, set(), {}
+
+    def target(op):
+        if op.get('client_id') is not None and ('client', op['client_id']) in added:
+            key = ('client', op['client_id'])
+            return key, added[key]
+        if op.get('id') is not None and int(op['id']) in existing and int(op['id']) not in deleted:
+            return ('id', int(op['id'])), existing[int(op['id'])]
+        raise OperationError(f"Unknown annotation in {op['op']} operation")
+
+    for op in operations:
+        item = op.get('annotation') or {}
+        if op['op'] == 'add':
+            key = ('client', op.get('client_id'))
+            if op.get('client_id') is None or key in added:
+                raise OperationError("add operations need a unique client_id")
+            if 'start_time' not in item or 'end_time' not in item:
+                raise OperationError("add operations need start_time and end_time")
+            added[key] = Annotation(task=task, **lookups.fields(item))
+            attributes[key] = lookups.attribute_pairs(item)
+        elif op['op'] == 'update':
+            key, annotation = target(op)
+            if apply_fields(annotation, lookups.fields(item, partial=True)) and key not in added:
+                changed[key] = annotation
+            if 'attributes' in item:
+                attributes[key] = lookups.attribute_pairs(item)
+        else:
+            key, _ = target(op)
+            if key in added:
+                del added[key]
+            else:
+                deleted.add(key[1])
+                changed.pop(key, None)
+            attributes.pop(key, None)
+
+    batch_size = settings.INGEST_BATCH_SIZE
+    with transaction.atomic():
+        if deleted:
+            Annotation.objects.filter(pk__in=deleted).delete()
+        Annotation.objects.bulk_update(list(changed.values()), ANNOTATION_FIELDS, batch_size=batch_size)
+        Annotation.objects.bulk_create(list(added.values()), batch_size=batch_size)
+        attributes_changed = sync_attribute_values([
+            (added[key] if key in added else existing[key[1]], pairs) for key, pairs in attributes.items()
+        ])
+        if attributes_changed or added or changed or deleted:
+            bump_version(Task.objects.filter(pk=task.pk))
+
+    client_ids = {key[1]: annotation.id for key, annotation in added.items()}
+    changed_ids = {key[1] for key in changed} | {key[1] for key in attributes if key[0] == 'id'}
+    changed_ids |= set(client_ids.values())
+    return changed_ids, client_ids, sorted(deleted)
@@ -0,0 +1,218 @@
+"""Landmark fingerprints for near-duplicate detection.
+
+A recording that was re-encoded, resampled or trimmed has a different
+content hash but keeps the same spectral peaks.  At ingest the
+``fingerprint`` analyzer picks local maxima of a 0-4 kHz spectrogram,
+pairs each peak with a few that follow it and hashes every pair's
+frequencies and time gap into a 31-bit *landmark*.  Peaks are picked block
+by block as the audio is decoded, so only the peaks of a file are kept, not
+its spectrogram.  Landmarks are stored in the
+:class:`~annotation.models.Fingerprint` table indexed by hash.  A lookup
+counts, per indexed AudioFile, how many landmarks agree on the same time
+shift; a large count means the same audio, and the shift aligns the two.
+The counting is done by the database, and lookups use at most
+``settings.FINGERPRINT_QUERY_LANDMARKS`` landmarks spread evenly over the
+file, so their cost grows with neither its length nor the library.
+"""
+import math
+from collections import Counter, defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Case, Count, F, IntegerField, Value, When
+from scipy.ndimage import maximum_filter
+
+from .analysis import FrameAnalyzer, register
+from .models import Fingerprint
+
+FRAME_SECONDS = 0.032
+MAX_FREQUENCY = 4000.0
+FREQUENCY_BITS = 10
+FREQUENCY_BINS = 1 << FREQUENCY_BITS
+FFT_OVERSAMPLING = 4  # zero-padding interpolates peak frequencies between FFT bins
+PEAK_NEIGHBORHOOD = (15, 120)  # frames x bins, limits peak density to roughly 15 per second
+PEAK_RANGE_DB = 60.0  # ignore peaks this far below the loudest one
+PEAK_BLOCK_FRAMES = 512  # spectrogram frames searched for peaks at once
+FAN_OUT = 5
+GAP_BITS = 11
+MAX_FRAME_GAP = 255  # about 8 seconds, so peaks either side of a quiet passage still pair
+QUERY_BATCH = 500
+QUERY_REPEATS = 4  # frames per repeated hash a lookup uses
+
+
+@register
+class FingerprintAnalyzer(FrameAnalyzer):
+    """Landmarks as ``[hash, frame]`` pairs; frames are ``FRAME_SECONDS`` long."""
+    name = 'fingerprint'
+    frame_seconds = FRAME_SECONDS
+
+    def __init__(self, sample_rate, channels):
+        super().__init__(sample_rate, channels)
+        self.window = np.hanning(self.frame_length).astype(np.float32)
+        self.fft_length = self.frame_length * FFT_OVERSAMPLING
+        # Resampling every spectrum onto one frequency grid keeps landmarks comparable across sample rates
+        self.frequencies = np.fft.rfftfreq(self.fft_length, 1.0 / sample_rate)
+        self.grid = np.linspace(0.0, MAX_FREQUENCY, FREQUENCY_BINS)
+        self.columns = []  # dB spectrogram from frame self.first on
+        self.first = 0
+        self.decided = 0  # frames before this have had their peaks picked
+        self.loudest = -np.inf
+        self.peaks = []  # (frames, bins, dB) arrays of local maxima
+
+    def process_frames(self, frames):
+        if frames.shape[1] != self.frame_length:
+            return  # trailing partial frame
+        magnitude = np.abs(np.fft.rfft(frames * self.window, n=self.fft_length, axis=1))
+        for column in magnitude:
+            column = np.interp(self.grid, self.frequencies, column, right=0.0)
+            self.columns.append((20 * np.log10(np.maximum(column, 1e-10))).astype(np.float32))
+        if len(self.columns) >= PEAK_BLOCK_FRAMES:
+            self.pick_peaks()
+
+    def pick_peaks(self, final=False):
+        """Keep the local maxima of every frame whose whole neighbourhood has been seen; drop older columns."""
+        if not self.columns:
+            return
+        halo = PEAK_NEIGHBORHOOD[0] // 2
+        spectrogram = np.stack(self.columns)
+        self.loudest = max(self.loudest, float(spectrogram.max()))
+        is_peak = spectrogram == maximum_filter(spectrogram, size=PEAK_NEIGHBORHOOD)
+        end = self.first + len(spectrogram) - (0 if final else halo)
+        rows = slice(self.decided - self.first, end - self.first)
+        frames, bins = np.nonzero(is_peak[rows])
+        self.peaks.append((frames + self.decided, bins, spectrogram[rows][frames, bins]))
+        self.decided = end
+        keep = max(0, self.decided - halo - self.first)
+        self.columns = self.columns[keep:]
+        self.first += keep
+
+    def result(self):
+        self.flush()
+        self.pick_peaks(final=True)
+        return {'frame_seconds': FRAME_SECONDS, 'landmarks': landmarks(self.peaks, self.loudest)}
+
+
+def landmarks(peaks, loudest):
+    """Hash pairs of spectral peaks into ``[hash, anchor_frame]`` pairs.
+
+    ``peaks`` holds ``(frames, bins, dB)`` arrays in frame order; peaks more
+    than ``PEAK_RANGE_DB`` below ``loudest`` are ignored.
+    """
+    if not peaks:
+        return []
+    frames, bins, level = (np.concatenate(part) for part in zip(*peaks))
+    audible = level > loudest - PEAK_RANGE_DB
+    frames, bins = frames[audible], bins[audible]
+
+    pairs = []
+    for i, (t1, f1) in enumerate(zip(frames, bins)):
+        paired = 0
+        for t2, f2 in zip(frames[i + 1:], bins[i + 1:]):
+            gap = t2 - t1
+            if gap > MAX_FRAME_GAP:
+                break
+            if gap == 0:
+                continue
+            pairs.append([int(f1) << (FREQUENCY_BITS + GAP_BITS) | int(f2) << GAP_BITS | int(gap), int(t1)])
+            paired += 1
+            if paired == FAN_OUT:
+                break
+    return pairs
+
+
+def take_landmarks(results):
+    """Remove the landmark list from analysis ``results`` (it lives in the index, not the JSON) and return it."""
+    fingerprint = results.get('fingerprint')
+    if not fingerprint or 'landmarks' not in fingerprint:
+        return []
+    pairs = fingerprint.pop('landmarks')
+    fingerprint['landmark_count'] = len(pairs)
+    return pairs
+
+
+def stored_landmarks(audio_file_id):
+    """The indexed ``[hash, frame]`` pairs of an AudioFile, in frame order."""
+    rows = Fingerprint.objects.filter(audio_file_id=audio_file_id).order_by('offset', 'hash')
+    return [[h, frame] for h, frame in rows.values_list('hash', 'offset')]
+
+
+def sample_landmarks(pairs, limit):
+    """At most ``limit`` of ``pairs``, evenly spaced so every part of the file is represented."""
+    if len(pairs) <= limit:
+        return pairs
+    step = len(pairs) / limit
+    return [pairs[int(i * step)] for i in range(limit)]
+
+
+def index_rows(audio_file, pairs):
+    """Unsaved Fingerprint rows for ``audio_file``."""
+    return [Fingerprint(audio_file=audio_file, hash=h, offset=frame) for h, frame in pairs]
+
+
+def find_duplicates(pairs, exclude=None, min_matches=None):
+    """AudioFiles sharing aligned landmarks with ``pairs``, best first.
+
+    Returns ``(audio_file_id, offset_seconds, matches)`` tuples, where a time
+    ``t`` in the fingerprinted audio corresponds to ``t + offset_seconds`` in
+    the matching AudioFile.
+    """
+    if min_matches is None:
+        min_matches = settings.FINGERPRINT_MIN_MATCHES
+    frames_by_hash = defaultdict(list)
+    for h, frame in sample_landmarks(pairs, settings.FINGERPRINT_QUERY_LANDMARKS):
+        if len(frames_by_hash[h]) < QUERY_REPEATS:
+            frames_by_hash[h].append(frame)
+
+    # One query maps each of its hashes to one frame, so a repeated hash needs a query per frame
+    queries = []
+    for repeat in range(max((len(frames) for frames in frames_by_hash.values()), default=0)):
+        frame_of = {h: frames[repeat] for h, frames in frames_by_hash.items() if len(frames) > repeat}
+        hashes = list(frame_of)
+        queries += [{h: frame_of[h] for h in hashes[i:i + QUERY_BATCH]} for i in range(0, len(hashes), QUERY_BATCH)]
+    if not queries:
+        return []
+
+    # A file scoring min_matches over three neighbouring shifts has at least this many
+    # on one shift in one query, so rarer (file, shift) pairs are chance collisions
+    least = math.ceil(min_matches / (3 * len(queries)))
+    candidates = set()
+    for frame_of in queries:
+        candidates.update(audio_file_id for audio_file_id, _, _ in _shift_counts(frame_of, exclude, least))
+
+    shifts = Counter()
+    for frame_of in queries:
+        for audio_file_id, shift, count in _shift_counts(frame_of, exclude, 1, candidates):
+            shifts[(audio_file_id, shift)] += count
+
+    best = {}
+    for (audio_file_id, shift), count in shifts.items():
+        # Frame grids of two encodings rarely line up exactly, so neighbouring shifts count too
+        score = count + shifts[(audio_file_id, shift - 1)] + shifts[(audio_file_id, shift + 1)]
+        if score > best.get(audio_file_id, (0, None))[0]:
+            best[audio_file_id] = (score, shift)
+
+    matches = [
+        (audio_file_id, round(shift * FRAME_SECONDS, 3), score)
+        for audio_file_id, (score, shift) in best.items()
+        if score >= min_matches
+    ]
+    return sorted(matches, key=lambda match: -match[2])
+
+
+def _shift_counts(frame_of, exclude, least, audio_file_ids=None):
+    """``(audio_file_id, shift, count)`` of indexed landmarks matching ``frame_of`` (hash -> query frame), counted by the database."""
+    if audio_file_ids is not None and not audio_file_ids:
+        return []
+    rows = Fingerprint.objects.filter(hash__in=list(frame_of))
+    if exclude is not None:
+        rows = rows.exclude(audio_file_id__in=exclude)
+    if audio_file_ids is not None:
+        rows = rows.filter(audio_file_id__in=audio_file_ids)
+    query_frame = Case(*(When(hash=h, then=Value(frame)) for h, frame in frame_of.items()), output_field=IntegerField())
+    return (
+        rows.annotate(shift=F('offset') - query_frame)
+        .values('audio_file_id', 'shift')
+        .annotate(matches=Count('pk'))
+        .filter(matches__gte=least)
+        .values_list('audio_file_id', 'shift', 'matches')
+    )
@@ -0,0 +1,440 @@
+"""Ingestion of audio into AudioFiles, Tasks and model annotations.
+
+Header metadata, the ingest analyzers (see analysis.py) and model
+predictions are computed before anything is written; the AudioFile, its
+analysis, its Tasks and their Annotations are then inserted with ``bulk_create`` in
+batches of ``settings.INGEST_BATCH_SIZE`` inside one transaction per file,
+so a failed ingest leaves no rows behind and its stored file is released
+(see storage.release).
+
+Optimized files are split into virtual chunk tasks.  Cut points are snapped
+into silence from the ``silence`` analyzer where there is some near the
+target length; elsewhere the model sees ``CHUNK_OVERLAP_SECONDS`` of context
+on that side.  Chunks are annotated in parallel, their predictions stitched
+into file-level events, and cut points moved out of events where they can be
+before the events are divided among the tasks.
+"""
+import copy
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+
+from . import analysis, audio, fingerprint, storage
+from .edits import bump_version
+from .auto_annotation import AUTO_ANNOTATION_MODELS, run_model
+from .models import AudioFile, AudioAnalysis, Task, Annotation, AnnotationAttributeValue, Fingerprint
+
+CHUNK_SECONDS = 30.0
+CHUNK_SNAP_SECONDS = 5.0  # how far a cut may move to land in silence or outside an event
+CHUNK_MIN_SECONDS = 5.0  # a shorter last chunk is merged into the one before it
+CHUNK_OVERLAP_SECONDS = 2.0  # model context past a cut that is not in silence
+STITCH_GAP_SECONDS = 0.02  # same-label events closer than this are one event
+ALIGNMENT_TOLERANCE = 0.5  # seconds a near-duplicate may fall short of covering a task
+
+
+def task_audio_path(task):
+    """Audio the models should see for ``task``: only its range for virtual chunks."""
+    if task.is_virtual:
+        return audio.range_path(task.audio_file, task.start_offset, task.duration)
+    return task.audio_file.file.path
+
+
+def reused_predictions(task, model_type):
+    """Model predictions already made for the same audio content and range, or for a near-duplicate; else None."""
+    source = None
+    if task.audio_file.content_hash:
+        source = (
+            Task.objects
+            .filter(
+                audio_file__content_hash=task.audio_file.content_hash,
+                start_offset=task.start_offset,
+                duration=task.duration,
+                project__model_type=model_type,
+                annotations__model_label__isnull=False,
+            )
+            .exclude(pk=task.pk)
+            .first()
+        )
+    if source is not None:
+        return [
+            {'start_time': ann.start_time, 'end_time': ann.end_time, 'label': ann.model_label}
+            for ann in source.annotations.filter(model_label__isnull=False)
+        ]
+
+    predictions = Annotation.objects.filter(model_label__isnull=False, task__project__model_type=model_type)
+    aligned = aligned_annotations(task.audio_file, task.offset, task_length(task), predictions)
+    if aligned is None:
+        return None
+    return [
+        {'start_time': start, 'end_time': end, 'label': ann.model_label}
+        for ann, start, end in aligned
+    ]
+
+
+def task_length(task):
+    return task.duration if task.is_virtual else task.audio_file.duration
+
+
+def aligned_annotations(af, start, length, annotations):
+    """``(annotation, start, end)`` for ``annotations`` of the near-duplicate of ``af``.
+
+    Times are shifted into the span ``[start, start + length]`` of ``af`` and
+    clipped to it.  Returns None when the file has no near-duplicate, the
+    duplicate does not cover the span, or none of ``annotations`` belong to it.
+    """
+    source = af.duplicate_of
+    if source is None:
+        return None
+    start = start + af.duplicate_offset
+    if length is None or source.duration is None:
+        return None
+    if start < -ALIGNMENT_TOLERANCE or start + length > source.duration + ALIGNMENT_TOLERANCE:
+        return None
+
+    annotations = annotations.filter(task__audio_file=source).select_related('task')
+    if not annotations.exists():
+        return None
+    aligned = []
+    for ann in annotations:
+        ann_start = ann.task.offset + ann.start_time - start
+        ann_end = ann.task.offset + ann.end_time - start
+        if ann_end > 0 and ann_start < length:
+            aligned.append((ann, max(0.0, ann_start), min(length, ann_end)))
+    return aligned
+
+
+def reused_labelled_annotations(task):
+    """Unsaved labelled Annotations (with their attribute values) copied from the near-duplicate of ``task``'s file.
+
+    Labels and attribute values are matched by name within ``task``'s project;
+    annotations whose label does not exist there are skipped.
+    """
+    labelled = Annotation.objects.filter(label__isnull=False).select_related('label').prefetch_related(
+        'attribute_values__attribute', 'attribute_values__value'
+    )
+    aligned = aligned_annotations(task.audio_file, task.offset, task_length(task), labelled)
+    if not aligned:
+        return []
+
+    labels = {label.name: label for label in task.project.labels.prefetch_related('attributes__values')}
+    copies = []
+    for ann, start, end in aligned:
+        label = labels.get(ann.label.name)
+        if label is None:
+            continue
+        reused = Annotation(task=task, label=label, start_time=start, end_time=end)
+        values = []
+        for av in ann.attribute_values.all():
+            attribute = next((a for a in label.attributes.all() if a.name == av.attribute.name), None)
+            value = attribute and next((v for v in attribute.values.all() if v.value == av.value.value), None)
+            if value is not None:
+                values.append(AnnotationAttributeValue(annotation=reused, attribute=attribute, value=value))
+        copies.append((reused, values))
+    return copies
+
+
+def model_annotations(task, model_type):
+    """Unsaved model Annotations for ``task``, reusing predictions made for identical audio."""
+    if model_type not in AUTO_ANNOTATION_MODELS:
+        return []  # Skip for "others"
+
+    predictions = reused_predictions(task, model_type)
+    if predictions is None:
+        predictions = run_model(model_type, task_audio_path(task))
+
+    return [
+        Annotation(
+            task=task,
+            model_label=pred['label'],
+            start_time=pred['start_time'],
+            end_time=pred['end_time'],
+        )
+        for pred in predictions
+        # Skip creating annotations for 'silence'
+        if pred['label'].lower() != 'silence'
+    ]
+
+
+def auto_annotate_task(task, model_type):
+    """Create model annotations for an existing ``task``."""
+    annotations = model_annotations(task, model_type)
+    Annotation.objects.bulk_create(annotations, batch_size=settings.INGEST_BATCH_SIZE)
+    bump_version(Task.objects.filter(pk=task.pk))
+
+
+def auto_annotate_file(tasks, model_type):
+    """Create model annotations for the existing ``tasks`` of one AudioFile, stitched across chunks."""
+    tasks = sorted(tasks, key=lambda task: task.offset)
+    if not tasks[0].is_virtual:
+        for task in tasks:
+            auto_annotate_task(task, model_type)
+        return
+    af = tasks[0].audio_file
+    # Existing cut points may not be in silence, so give every inner cut context
+    cuts = [(task.start_offset, i == 0) for i, task in enumerate(tasks)]
+    cuts.append((tasks[-1].start_offset + tasks[-1].duration, True))
+    events = file_predictions(af, model_type, cuts)
+    Annotation.objects.bulk_create(distribute(events, tasks), batch_size=settings.INGEST_BATCH_SIZE)
+    bump_version(Task.objects.filter(pk__in=[task.pk for task in tasks]))
+
+
+def snap_to_silence(target, silences):
+    """The point of ``silences`` nearest ``target`` within ``CHUNK_SNAP_SECONDS``, or None."""
+    best = None
+    for start, end in silences:
+        if end < target - CHUNK_SNAP_SECONDS or start > target + CHUNK_SNAP_SECONDS:
+            continue
+        margin = min(0.1, (end - start) / 2)
+        point = min(max(target, start + margin), end - margin)
+        point = min(max(point, target - CHUNK_SNAP_SECONDS), target + CHUNK_SNAP_SECONDS)
+        if best is None or abs(point - target) < abs(best - target):
+            best = point
+    return best
+
+
+def cut_points(total, silences=(), chunk_length=CHUNK_SECONDS, min_length=CHUNK_MIN_SECONDS):
+    """``(time, in_silence)`` cuts from 0 to ``total``, about ``chunk_length`` apart, snapped into silence where possible.
+
+    A last chunk shorter than ``min_length`` is merged into the one before
+    it.  Returns no cuts when ``total`` is unknown or not positive.
+    """
+    if not total or total <= 0:
+        return []
+    cuts = [(0.0, True)]
+    while total - cuts[-1][0] > chunk_length:
+        target = round(cuts[-1][0] + chunk_length, 3)
+        snapped = snap_to_silence(target, silences)
+        cut = (target, False) if snapped is None else (round(snapped, 3), True)
+        if cut[0] >= total:
+            break
+        cuts.append(cut)
+    if len(cuts) > 1 and total - cuts[-1][0] < min_length:
+        cuts.pop()
+    cuts.append((float(total), True))
+    return cuts
+
+
+def chunk_ranges(total, chunk_length=CHUNK_SECONDS, silences=()):
+    """(start, duration) pairs covering ``total`` seconds in pieces of about ``chunk_length``."""
+    cuts = cut_points(total, silences, chunk_length)
+    return [(start, round(end - start, 3)) for (start, _), (end, _) in zip(cuts, cuts[1:])]
+
+
+def stitch(events):
+    """Merge overlapping or touching same-label events (start/end in file time), sorted by start."""
+    merged, last_by_label = [], {}
+    for event in sorted(events, key=lambda e: e['start_time']):
+        last = last_by_label.get(event['label'])
+        if last is not None and event['start_time'] <= last['end_time'] + STITCH_GAP_SECONDS:
+            last['end_time'] = max(last['end_time'], event['end_time'])
+        else:
+            last_by_label[event['label']] = dict(event)
+            merged.append(last_by_label[event['label']])
+    return merged
+
+
+def reused_file_predictions(af, model_type):
+    """File-level predictions already made for identical or near-duplicate audio, or None."""
+    if af.content_hash:
+        source = (
+            AudioFile.objects
+            .filter(
+                content_hash=af.content_hash,
+                project__model_type=model_type,
+                tasks__annotations__model_label__isnull=False,
+            )
+            .exclude(pk=af.pk)
+            .first()
+        )
+        if source is not None:
+            return stitch(
+                {'start_time': ann.task.offset + ann.start_time, 'end_time': ann.task.offset + ann.end_time,
+                 'label': ann.model_label}
+                for ann in Annotation.objects
+                .filter(task__audio_file=source, model_label__isnull=False)
+                .select_related('task')
+            )
+
+    predictions = Annotation.objects.filter(model_label__isnull=False, task__project__model_type=model_type)
+    aligned = aligned_annotations(af, 0.0, af.duration, predictions)
+    if aligned is None:
+        return None
+    return stitch(
+        {'start_time': start, 'end_time': end, 'label': ann.model_label}
+        for ann, start, end in aligned
+    )
+
+
+def file_predictions(af, model_type, cuts):
+    """Stitched model predictions for all of ``af`` in file time, running the chunks between ``cuts`` in parallel."""
+    if model_type not in AUTO_ANNOTATION_MODELS:
+        return []  # Skip for "others"
+    events = reused_file_predictions(af, model_type)
+    if events is not None:
+        return events
+
+    chunks = []
+    for (start, start_snapped), (end, end_snapped) in zip(cuts, cuts[1:]):
+        context_start = start if start_snapped else max(0.0, start - CHUNK_OVERLAP_SECONDS)
+        context_end = end if end_snapped else end + CHUNK_OVERLAP_SECONDS
+        chunks.append((start, end, context_start, context_end))
+
+    def predict(chunk):
+        _, _, context_start, context_end = chunk
+        return run_model(model_type, audio.range_path(af, context_start, context_end - context_start))
+
+    with ThreadPoolExecutor(max_workers=settings.AUTO_ANNOTATION_WORKERS) as pool:
+        results = list(pool.map(predict, chunks))
+
+    events = []
+    for (start, end, context_start, _), predictions in zip(chunks, results):
+        for pred in predictions:
+            pred_start = context_start + pred['start_time']
+            pred_end = context_start + pred['end_time']
+            # Context is only there to see whole events: each chunk keeps the events centred in it
+            middle = (pred_start + pred_end) / 2
+            if start <= middle < end or (end == cuts[-1][0] and middle >= end):
+                events.append({'start_time': pred_start, 'end_time': pred_end, 'label': pred['label']})
+    return stitch(events)
+
+
+def avoid_events(cuts, events):
+    """Move inner cuts that fall inside an event to its nearer edge, when that is within ``CHUNK_SNAP_SECONDS``."""
+    cuts = list(cuts)
+    for i in range(1, len(cuts) - 1):
+        cut, snapped = cuts[i]
+        event = next((e for e in events if e['start_time'] < cut < e['end_time']), None)
+        if event is None:
+            continue
+        for edge in sorted((event['start_time'], event['end_time']), key=lambda edge: abs(edge - cut)):
+            if abs(edge - cut) <= CHUNK_SNAP_SECONDS and cuts[i - 1][0] < edge < cuts[i + 1][0]:
+                cuts[i] = (edge, snapped)
+                break
+    return cuts
+
+
+def distribute(events, tasks):
+    """Unsaved model Annotations for file-time ``events``, clipped into the virtual ``tasks`` they overlap."""
+    starts = [task.start_offset for task in tasks]
+    annotations = []
+    for event in events:
+        # Skip creating annotations for 'silence'
+        if event['label'].lower() == 'silence':
+            continue
+        i = max(0, bisect_right(starts, event['start_time']) - 1)
+        while i < len(tasks) and tasks[i].start_offset < event['end_time']:
+            task = tasks[i]
+            start = max(event['start_time'], task.start_offset)
+            end = min(event['end_time'], task.start_offset + task.duration)
+            if end > start:
+                annotations.append(Annotation(
+                    task=task,
+                    model_label=event['label'],
+                    start_time=round(start - task.start_offset, 3),
+                    end_time=round(end - task.start_offset, 3),
+                ))
+            i += 1
+    return annotations
+
+
+def analyze_stored(af, metadata=None, analyzed=None):
+    """Unsaved AudioAnalysis for ``af``, copied from another AudioFile with the same content when possible.
+
+    ``analyzed`` is a ``(results, timings)`` pair already computed for the file, e.g. while it was uploaded.
+    """
+    if analyzed is not None:
+        results, timings = analyzed
+        return AudioAnalysis(audio_file=af, results=results, timings=timings)
+    existing = (
+        AudioAnalysis.objects
+        .filter(audio_file__content_hash=af.content_hash)
+        .exclude(audio_file__content_hash='')
+        .first()
+    )
+    if existing is not None and set(existing.results) == set(settings.INGEST_ANALYZERS):
+        results = copy.deepcopy(existing.results)
+        if 'fingerprint' in results:
+            # Landmarks are kept in the index, not the JSON; the copy needs them to be indexed and linked too
+            results['fingerprint']['landmarks'] = fingerprint.stored_landmarks(existing.audio_file_id)
+        return AudioAnalysis(audio_file=af, results=results, timings={})
+    results, timings = analysis.analyze(af, metadata)
+    return AudioAnalysis(audio_file=af, results=results, timings=timings)
+
+
+def find_original(landmarks, content_hash):
+    """``(audio_file_id, offset_seconds)`` of the AudioFile a new file duplicates, or ``(None, None)``.
+
+    Aligned landmarks decide first; a file too short or quiet for landmarks
+    still duplicates one with identical content, at offset 0.
+    """
+    matches = fingerprint.find_duplicates(landmarks) if landmarks else []
+    if matches:
+        audio_file_id, offset, _ = matches[0]
+        return audio_file_id, offset
+    if content_hash:
+        original = AudioFile.objects.filter(content_hash=content_hash).values_list('pk', flat=True).first()
+        if original is not None:
+            return original, 0.0
+    return None, None
+
+
+def ingest_stored(project, name, content_hash, optimize=False, model_type=None, analyzed=None):
+    """Create the AudioFile, Tasks and model annotations for an already stored file.
+
+    ``analyzed`` is passed on to :func:`analyze_stored`.
+    """
+    af = AudioFile(project=project, file=name, content_hash=content_hash, optimized=optimize)
+    metadata = audio.probe_metadata(af)
+    for field, value in metadata.items():
+        setattr(af, field, value)
+    file_analysis = analyze_stored(af, metadata, analyzed)
+    landmarks = fingerprint.take_landmarks(file_analysis.results)
+    af.duplicate_of_id, af.duplicate_offset = find_original(landmarks, content_hash)
+    # Run the models first so the transaction only covers the inserts
+    cuts = []
+    if optimize:
+        # Chunks are virtual: one stored file, one task per range of about 30 seconds
+        silences = file_analysis.results.get('silence', {}).get('spans', [])
+        cuts = cut_points(af.duration, silences)
+    if cuts:
+        events = file_predictions(af, model_type, cuts)
+        cuts = avoid_events(cuts, events)
+        tasks = [
+            Task(project=project, audio_file=af, start_offset=start, duration=round(end - start, 3))
+            for (start, _), (end, _) in zip(cuts, cuts[1:])
+        ]
+        annotations = distribute(events, tasks)
+    else:
+        # Not optimized, or no duration to split: one task for the whole file
+        tasks = [Task(project=project, audio_file=af)]
+        annotations = model_annotations(tasks[0], model_type)
+    attribute_values = []
+    if af.duplicate_of_id is not None and settings.NEAR_DUPLICATE_REUSE_ANNOTATIONS:
+        for task in tasks:
+            for reused, values in reused_labelled_annotations(task):
+                annotations.append(reused)
+                attribute_values += values
+
+    batch_size = settings.INGEST_BATCH_SIZE
+    with transaction.atomic():
+        # bulk_create fills in the foreign keys of the objects saved just before
+        af.save()
+        file_analysis.audio_file = af
+        file_analysis.save()
+        Fingerprint.objects.bulk_create(fingerprint.index_rows(af, landmarks), batch_size=batch_size)
+        Task.objects.bulk_create(tasks, batch_size=batch_size)
+        Annotation.objects.bulk_create(annotations, batch_size=batch_size)
+        AnnotationAttributeValue.objects.bulk_create(attribute_values, batch_size=batch_size)
+    return af
+
+
+def ingest_upload(project, uploaded_file, optimize=False, model_type=None):
+    """Store ``uploaded_file`` by content and ingest it into ``project``."""
+    name, content_hash = storage.store_upload(uploaded_file)
+    try:
+        return ingest_stored(project, name, content_hash, optimize, model_type)
+    except Exception:
+        storage.release(name)
+        raise
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from annotation import analysis, fingerprint
+from annotation.models import AudioFile, AudioAnalysis, Fingerprint
+
+
+class Command(BaseCommand):
+    help = "Run the ingest analyzers over AudioFiles whose stored analysis is missing or incomplete (or all with --all)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="re-analyze every AudioFile")
+
+    def handle(self, *args, **options):
+        audio_files = AudioFile.objects.all()
+        if not options['all']:
+            # Also files analyzed before an analyzer was added, or whose results a migration dropped
+            incomplete = Q(analysis__isnull=True)
+            for name in settings.INGEST_ANALYZERS:
+                incomplete |= ~Q(analysis__results__has_key=name)
+            audio_files = audio_files.filter(incomplete)
+
+        analyzed, failed = 0, 0
+        totals = {}
+        for af in audio_files.iterator():
+            metadata = None
+            if af.sample_rate and af.channels:
+                metadata = {'sample_rate': af.sample_rate, 'channels': af.channels}
+            try:
+                results, timings = analysis.analyze(af, metadata)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"AudioFile {af.id}: {e}")
+                continue
+            landmarks = fingerprint.take_landmarks(results)
+            with transaction.atomic():
+                AudioAnalysis.objects.update_or_create(
+                    audio_file=af, defaults={'results': results, 'timings': timings}
+                )
+                if 'fingerprint' in results:
+                    af.fingerprints.all().delete()
+                    Fingerprint.objects.bulk_create(
+                        fingerprint.index_rows(af, landmarks), batch_size=settings.INGEST_BATCH_SIZE
+                    )
+            for name, seconds in timings.items():
+                totals[name] = totals.get(name, 0.0) + seconds
+            analyzed += 1
+
+        for name, seconds in totals.items():
+            self.stdout.write(f"  {name}: {seconds:.2f}s")
+        self.stdout.write(self.style.SUCCESS(f"Analyzed {analyzed} audio files ({failed} failed)"))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from annotation import audio
+from annotation.models import AudioFile
+
+METADATA_FIELDS = ['duration', 'sample_rate', 'channels', 'codec']
+
+
+class Command(BaseCommand):
+    help = "Probe and store duration, sample rate, channels and codec for AudioFiles ingested without them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--all', action='store_true', help="re-probe every AudioFile, not only missing ones")
+
+    def handle(self, *args, **options):
+        audio_files = AudioFile.objects.all() if options['all'] else AudioFile.objects.filter(duration__isnull=True)
+        batch, updated, failed = [], 0, 0
+        for af in audio_files.iterator(chunk_size=options['batch_size']):
+            try:
+                for field, value in audio.probe_metadata(af.file.path).items():
+                    setattr(af, field, value)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"AudioFile {af.id}: {e}")
+                continue
+            batch.append(af)
+            if len(batch) >= options['batch_size']:
+                updated += AudioFile.objects.bulk_update(batch, METADATA_FIELDS)
+                batch = []
+        if batch:
+            updated += AudioFile.objects.bulk_update(batch, METADATA_FIELDS)
+
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} audio files ({failed} failed)"))
@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+from annotation import views
+from annotation.models import User, SuperProject, Project, AudioFile, Task, Annotation
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Time full and time-windowed annotation requests on one large task (nothing is kept)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--window', type=float, default=300.0, help="viewport length in seconds")
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows, window = options['rows'], options['window']
+        results = []
+        try:
+            with transaction.atomic():
+                task = self._fixture(rows)
+                total = rows * 0.6
+                results.append(('full task', self._time(task, {}, options['repeat'])))
+                for name, t0 in (('window at start', 0.0), ('window in middle', total / 2), ('window at end', total - window)):
+                    results.append((name, self._time(task, {'start': t0, 'end': t0 + window}, options['repeat'])))
+                raise Rollback
+        except Rollback:
+            pass
+
+        for name, (seconds, count) in results:
+            self.stdout.write(f"{name:17} {seconds * 1000:8.1f} ms  {count:7,d} annotations")
+
+    def _fixture(self, rows):
+        user = User.objects.create(username='bench-window', email='bench-window@example.com', role='manager')
+        super_project = SuperProject.objects.create(name='bench', manager=user)
+        project = Project.objects.create(super_project=super_project, user=user, name='bench', data_type='train')
+        af = AudioFile.objects.create(project=project, file='audio/bench.wav')
+        task = Task.objects.create(project=project, audio_file=af)
+        Annotation.objects.bulk_create(
+            [Annotation(task=task, model_label='Dog', start_time=i * 0.6, end_time=i * 0.6 + 0.5) for i in range(rows)],
+            batch_size=5000,
+        )
+        return task
+
+    def _time(self, task, params, repeat):
+        factory = APIRequestFactory()
+        best = None
+        for _ in range(repeat):
+            request = factory.get(f'/api/tasks/{task.id}/annotations/', params)
+            start = time.perf_counter()
+            response = views.get_annotations(request, task_id=task.id)
+            response.render()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, len(response.data['annotations'])
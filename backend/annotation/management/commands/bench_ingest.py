@@ -0,0 +1,51 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from annotation.models import User, SuperProject, Project, AudioFile, Task, Annotation
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare per-row and batched inserts of model annotations (nothing is kept)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--batch-size', type=int, default=settings.INGEST_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        try:
+            with transaction.atomic():
+                task = self._fixture()
+                single = self._time(lambda: [
+                    Annotation.objects.create(task=task, model_label='Dog', start_time=i, end_time=i + 1)
+                    for i in range(rows)
+                ])
+                bulk = self._time(lambda: Annotation.objects.bulk_create(
+                    [Annotation(task=task, model_label='Dog', start_time=i, end_time=i + 1) for i in range(rows)],
+                    batch_size=options['batch_size'],
+                ))
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(f"per-row create: {rows / single:,.0f} rows/s ({single:.2f}s)")
+        self.stdout.write(f"bulk_create:    {rows / bulk:,.0f} rows/s ({bulk:.2f}s, batch size {options['batch_size']})")
+
+    def _fixture(self):
+        user = User.objects.create(username='bench-ingest', email='bench-ingest@example.com', role='manager')
+        super_project = SuperProject.objects.create(name='bench', manager=user)
+        project = Project.objects.create(super_project=super_project, user=user, name='bench', data_type='train')
+        af = AudioFile.objects.create(project=project, file='audio/bench.wav')
+        return Task.objects.create(project=project, audio_file=af)
+
+    def _time(self, fn):
+        start = time.perf_counter()
+        fn()
+        return time.perf_counter() - start
@@ -0,0 +1,78 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from annotation.models import User, SuperProject, Label, Attribute, AttributeValue
+from annotation.serializers import ProjectSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Time creating a project with a large label schema, bulk and row by row (nothing is kept)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--labels', type=int, default=500)
+        parser.add_argument('--attributes', type=int, default=5, help="attributes per label")
+        parser.add_argument('--values', type=int, default=4, help="values per attribute")
+
+    def handle(self, *args, **options):
+        labels = [
+            {'name': f'label {i}', 'attributes': [
+                {'name': f'attribute {j}', 'values': [f'value {k}' for k in range(options['values'])]}
+                for j in range(options['attributes'])
+            ]}
+            for i in range(options['labels'])
+        ]
+        rows = sum(1 + sum(1 + len(a['values']) for a in label['attributes']) for label in labels)
+
+        results = []
+        try:
+            with transaction.atomic():
+                user = User.objects.create(username='bench-schema', email='bench-schema@example.com', role='manager')
+                super_project = SuperProject.objects.create(name='bench', manager=user)
+                data = {
+                    'super_project': super_project.id, 'user': user.id, 'name': 'bench', 'data_type': 'train',
+                    'assigned_annotators': [], 'labels': labels,
+                }
+                results.append(('bulk', self._time(lambda: self._create(data))))
+                results.append(('row by row', self._time(lambda: self._create_row_by_row(data))))
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(f"{options['labels']} labels, {rows:,d} schema rows")
+        for name, (seconds, queries) in results:
+            self.stdout.write(f"{name:10} {seconds * 1000:9.1f} ms  {queries:6,d} queries")
+
+    def _time(self, create):
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            start = time.perf_counter()
+            create()
+            elapsed = time.perf_counter() - start
+        return elapsed, len(queries)
+
+    def _create(self, data):
+        serializer = ProjectSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def _create_row_by_row(self, data):
+        # The nested create() loops this project used before bulk creation
+        project = self._create({**data, 'labels': []})
+        for label_data in data['labels']:
+            label = Label.objects.create(project=project, name=label_data['name'])
+            for attribute_data in label_data['attributes']:
+                attribute = Attribute.objects.create(label=label, name=attribute_data['name'])
+                for value in attribute_data['values']:
+                    AttributeValue.objects.create(attribute=attribute, value=value)
+        return project
@@ -0,0 +1,176 @@
+import argparse
+import csv
+import hashlib
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from annotation import analysis, audio, fingerprint, storage
+from annotation.ingest import auto_annotate_file, chunk_ranges, find_original, reused_labelled_annotations
+from annotation.models import (
+    Project, AudioFile, AudioAnalysis, Annotation, AnnotationAttributeValue, Fingerprint, Task,
+)
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.mp3', '.ogg', '.m4a', '.aac', '.opus')
+
+
+def probe_file(path):
+    """Worker: hash one file, probe its header and run the ingest analyzers."""
+    try:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(storage.HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        metadata = audio.probe_metadata(path)
+        results, timings = analysis.analyze(path, metadata)
+        return path, digest.hexdigest(), metadata, (results, timings), None
+    except Exception as e:
+        return path, None, None, None, str(e)
+
+
+class Command(BaseCommand):
+    help = "Import audio files already on the server into a project, resuming where a previous run stopped."
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_id', type=int)
+        parser.add_argument('source', help="directory to scan, or a CSV manifest with a 'path' column")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--batch-size', type=int, default=500, help="files committed per transaction")
+        parser.add_argument('--optimize', action=argparse.BooleanOptionalAction, default=None,
+                            help="split into 30 second virtual chunks (default: the project's setting)")
+        parser.add_argument('--annotate', action='store_true', help="run the project's model on the new tasks")
+        parser.add_argument('--state-file', help="resume marker (default: import_audio_<project_id>.state)")
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(pk=options['project_id'])
+        except Project.DoesNotExist:
+            raise CommandError(f"Project {options['project_id']} not found")
+
+        optimize = project.optimize if options['optimize'] is None else options['optimize']
+        state_file = options['state_file'] or f"import_audio_{project.id}.state"
+        done = set()
+        if os.path.exists(state_file):
+            with open(state_file) as f:
+                done = {line.rstrip('\n') for line in f if line.strip()}
+
+        paths = [p for p in self._collect(options['source']) if p not in done]
+        self.stdout.write(f"{len(paths)} files to import ({len(done)} already done)")
+
+        new_tasks, warming = [], []
+        failed = 0
+        # Workers are fresh interpreters under the spawn start method (macOS, Windows)
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as pool, \
+                open(state_file, 'a') as state:
+            results = pool.map(probe_file, paths, chunksize=8)
+            warm_pool = pool if options['annotate'] else None
+            batch = []
+            for path, content_hash, metadata, file_analysis, error in results:
+                if error:
+                    failed += 1
+                    self.stderr.write(f"skipped {path}: {error}")
+                    continue
+                batch.append((path, content_hash, metadata, file_analysis))
+                if len(batch) >= options['batch_size']:
+                    new_tasks += self._write_batch(project, batch, optimize, state, warm_pool, warming)
+                    batch = []
+            if batch:
+                new_tasks += self._write_batch(project, batch, optimize, state, warm_pool, warming)
+
+        for stored_path, future in warming:
+            if future.exception() is not None:
+                self.stderr.write(f"could not decode {stored_path} ahead of annotation: {future.exception()}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {len(paths) - failed} files as {len(new_tasks)} tasks ({failed} failed)"
+        ))
+
+        if options['annotate'] and new_tasks:
+            tasks_by_file = defaultdict(list)
+            for task in new_tasks:
+                tasks_by_file[task.audio_file_id].append(task)
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                list(pool.map(lambda tasks: auto_annotate_file(tasks, project.model_type), tasks_by_file.values()))
+            self.stdout.write(self.style.SUCCESS(f"Auto-annotated {len(new_tasks)} tasks"))
+
+    def _collect(self, source):
+        if os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                for name in sorted(files):
+                    if name.lower().endswith(AUDIO_EXTENSIONS):
+                        yield os.path.abspath(os.path.join(root, name))
+        elif os.path.isfile(source):
+            with open(source, newline='') as f:
+                for row in csv.DictReader(f):
+                    yield os.path.abspath(row['path'])
+        else:
+            raise CommandError(f"{source} is neither a directory nor a manifest file")
+
+    def _write_batch(self, project, batch, optimize, state, warm_pool=None, warming=None):
+        stored, landmarks = [], []
+        try:
+            for path, content_hash, metadata, file_analysis in batch:
+                name, content_hash = storage.store_path(path, content_hash)
+                af = AudioFile(project=project, file=name, content_hash=content_hash, optimized=optimize, **metadata)
+                pairs = fingerprint.take_landmarks(file_analysis[0])
+                af.duplicate_of_id, af.duplicate_offset = find_original(pairs, content_hash)
+                stored.append((path, af, file_analysis))
+                landmarks.append(pairs)
+
+            tasks, annotations, attribute_values = [], [], []
+            for _, af, (results, _) in stored:
+                ranges = []
+                if optimize:
+                    silences = results.get('silence', {}).get('spans', [])
+                    ranges = chunk_ranges(af.duration, silences=silences)
+                if ranges:
+                    file_tasks = [
+                        Task(project=project, audio_file=af, start_offset=start, duration=length)
+                        for start, length in ranges
+                    ]
+                else:
+                    file_tasks = [Task(project=project, audio_file=af)]
+                if af.duplicate_of_id is not None and settings.NEAR_DUPLICATE_REUSE_ANNOTATIONS:
+                    for task in file_tasks:
+                        for reused, values in reused_labelled_annotations(task):
+                            annotations.append(reused)
+                            attribute_values += values
+                tasks += file_tasks
+
+            batch_size = settings.INGEST_BATCH_SIZE
+            with transaction.atomic():
+                # bulk_create fills in the foreign keys of the objects saved just before
+                audio_files = AudioFile.objects.bulk_create([af for _, af, _ in stored], batch_size=batch_size)
+                AudioAnalysis.objects.bulk_create(
+                    [AudioAnalysis(audio_file=af, results=results, timings=timings)
+                     for _, af, (results, timings) in stored],
+                    batch_size=batch_size,
+                )
+                Fingerprint.objects.bulk_create(
+                    [row for af, pairs in zip(audio_files, landmarks) for row in fingerprint.index_rows(af, pairs)],
+                    batch_size=batch_size,
+                )
+                Task.objects.bulk_create(tasks, batch_size=batch_size)
+                Annotation.objects.bulk_create(annotations, batch_size=batch_size)
+                AnnotationAttributeValue.objects.bulk_create(attribute_values, batch_size=batch_size)
+        except Exception:
+            # Files are stored before the transaction; sweep_storage removes any whose release is deferred
+            for _, af, _ in stored:
+                storage.release(af.file.name)
+            raise
+
+        # Only record files once their rows are committed
+        state.writelines(path + '\n' for path, *_ in stored)
+        state.flush()
+        self.stdout.write(f"  committed {len(stored)} files")
+
+        if warm_pool is not None:
+            # Decode the stored copies the models will read, keyed like every later cache lookup
+            for stored_path in {af.file.path for _, af, _ in stored}:
+                warming.append((stored_path, warm_pool.submit(audio.cached_path, stored_path)))
+        return tasks
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from annotation import storage, uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Discard abandoned resumable uploads, then delete stored audio that no AudioFile "
+        "references and that was not placed within the grace period."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=float, default=settings.STORAGE_RELEASE_GRACE_SECONDS,
+            help="seconds since placement before unreferenced audio may be deleted",
+        )
+        parser.add_argument(
+            '--upload-expiry', type=float, default=settings.UPLOAD_EXPIRY_SECONDS,
+            help="seconds since the last chunk before an unfinished upload is discarded",
+        )
+
+    def handle(self, *args, **options):
+        expired = uploads.expire(options['upload_expiry'])
+        self.stdout.write(self.style.SUCCESS(f"Discarded {expired} abandoned uploads"))
+        deleted = storage.sweep(options['grace'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} unreferenced audio files"))
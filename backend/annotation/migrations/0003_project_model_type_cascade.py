@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0002_annotation_model_label_project_model_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='project',
+            name='model_type',
+            field=models.CharField(choices=[('beats', 'BEATs'), ('yamnet', 'YAMNet'), ('cascade', 'Cascade (YAMNet, then BEATs)'), ('others', 'Others')], default='beats', max_length=20),
+        ),
+    ]
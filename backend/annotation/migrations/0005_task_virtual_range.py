@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0004_project_model_type_ensemble'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='duration',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='start_offset',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
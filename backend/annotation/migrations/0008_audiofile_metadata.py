@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0007_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiofile',
+            name='channels',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='audiofile',
+            name='codec',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='audiofile',
+            name='duration',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='audiofile',
+            name='sample_rate',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0008_audiofile_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AudioAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('results', models.JSONField(default=dict)),
+                ('timings', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('audio_file', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='analysis', to='annotation.audiofile')),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0009_audioanalysis'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiofile',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='near_duplicates', to='annotation.audiofile'),
+        ),
+        migrations.AddField(
+            model_name='audiofile',
+            name='duplicate_offset',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='Fingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash', models.IntegerField(db_index=True)),
+                ('offset', models.IntegerField()),
+                ('audio_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprints', to='annotation.audiofile')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0010_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='annotations_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
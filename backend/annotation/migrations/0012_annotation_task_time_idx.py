@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0011_task_annotations_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='annotation',
+            index=models.Index(fields=['task', 'start_time', 'end_time'], name='annotation_task_time_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0012_annotation_task_time_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='schema_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0013_project_schema_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upload',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
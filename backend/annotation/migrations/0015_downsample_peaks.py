@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-19 20:15
+
+from django.db import migrations
+
+# INGEST_PEAKS_MAX_POINTS when this migration was written; migrations must not follow later settings
+MAX_POINTS = 4000
+BATCH_SIZE = 200
+
+
+def downsample_peaks(apps, schema_editor):
+    """Max-pool the 10 ms peaks stored by earlier ingests the way the peaks analyzer now does."""
+    AudioAnalysis = apps.get_model('annotation', 'AudioAnalysis')
+    changed = []
+    for row in AudioAnalysis.objects.only('results').iterator(chunk_size=BATCH_SIZE):
+        peaks = (row.results or {}).get('peaks')
+        if not peaks or len(peaks.get('peaks', [])) <= MAX_POINTS:
+            continue
+        values = peaks['peaks']
+        factor = -(-len(values) // MAX_POINTS)
+        peaks['peaks'] = [max(values[i:i + factor]) for i in range(0, len(values), factor)]
+        peaks['interval'] = round(peaks['interval'] * factor, 6)
+        changed.append(row)
+        if len(changed) >= BATCH_SIZE:
+            AudioAnalysis.objects.bulk_update(changed, ['results'])
+            changed = []
+    AudioAnalysis.objects.bulk_update(changed, ['results'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0014_upload_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(downsample_peaks, migrations.RunPython.noop),
+    ]
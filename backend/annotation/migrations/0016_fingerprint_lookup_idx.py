@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-19 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0015_downsample_peaks'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fingerprint',
+            name='hash',
+            field=models.IntegerField(),
+        ),
+        migrations.AddIndex(
+            model_name='fingerprint',
+            index=models.Index(fields=['hash', 'audio_file', 'offset'], name='fingerprint_lookup_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0016_fingerprint_lookup_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='upload',
+            name='finalizing',
+            field=models.BooleanField(default=False),
+        ),
+    ]
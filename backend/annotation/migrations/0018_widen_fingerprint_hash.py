@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:10
+
+from django.db import migrations
+
+BATCH_SIZE = 200
+
+
+def drop_narrow_fingerprints(apps, schema_editor):
+    """Landmarks hashed before the 31-bit layout can never match new ones; ``analyze_audio`` indexes the files again."""
+    Fingerprint = apps.get_model('annotation', 'Fingerprint')
+    AudioAnalysis = apps.get_model('annotation', 'AudioAnalysis')
+    Fingerprint.objects.all().delete()
+    changed = []
+    for row in AudioAnalysis.objects.only('results').iterator(chunk_size=BATCH_SIZE):
+        if 'fingerprint' not in (row.results or {}):
+            continue
+        del row.results['fingerprint']
+        changed.append(row)
+        if len(changed) >= BATCH_SIZE:
+            AudioAnalysis.objects.bulk_update(changed, ['results'])
+            changed = []
+    AudioAnalysis.objects.bulk_update(changed, ['results'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('annotation', '0017_upload_finalizing'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_narrow_fingerprints, migrations.RunPython.noop),
+    ]
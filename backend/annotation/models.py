@@ -1,3 +1,5 @@
+import uuid
+
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
@@ -26,6 +28,8 @@ class Project(models.Model):
     MODEL_TYPE_CHOICES = [
         ('beats', 'BEATs'),
         ('yamnet', 'YAMNet'),
+        ('cascade', 'Cascade (YAMNet, then BEATs)'),
+        ('ensemble', 'Ensemble (BEATs + YAMNet)'),
         ('others', 'Others'),
     ]
 
@@ -42,6 +46,9 @@ class Project(models.Model):
     # NEW FIELD for selecting model type for auto annotation
     model_type = models.CharField(max_length=20, choices=MODEL_TYPE_CHOICES, default='beats')
 
+    # Bumped whenever the project's labels, attributes or values change; part of the label schema cache key
+    schema_version = models.PositiveIntegerField(default=0)
+
     def __str__(self):
         return self.name
 
@@ -61,6 +68,52 @@ class AudioFile(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='audio_files')
     file = models.FileField(upload_to='audio/')
     optimized = models.BooleanField(default=False)
+    # SHA-256 of the file content; AudioFiles with the same hash share one stored file
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    # Header metadata, probed once at ingest (see audio.probe_metadata)
+    duration = models.FloatField(null=True, blank=True, db_index=True)
+    sample_rate = models.IntegerField(null=True, blank=True)
+    channels = models.IntegerField(null=True, blank=True)
+    codec = models.CharField(max_length=32, blank=True)
+    # Near-duplicate found by fingerprint at ingest: time t here is t + duplicate_offset in duplicate_of
+    duplicate_of = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='near_duplicates'
+    )
+    duplicate_offset = models.FloatField(null=True, blank=True)
+
+class AudioAnalysis(models.Model):
+    """Outputs of the ingest analyzers (annotation/analysis.py) for one AudioFile, keyed by analyzer name."""
+    audio_file = models.OneToOneField(AudioFile, on_delete=models.CASCADE, related_name='analysis')
+    results = models.JSONField(default=dict)
+    # Seconds spent in each analyzer, plus 'decode' for the shared decode
+    timings = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+class Fingerprint(models.Model):
+    """One landmark (hashed pair of spectral peaks) of an AudioFile; see annotation/fingerprint.py."""
+    audio_file = models.ForeignKey(AudioFile, on_delete=models.CASCADE, related_name='fingerprints')
+    hash = models.IntegerField()
+    offset = models.IntegerField()  # anchor frame
+
+    class Meta:
+        indexes = [
+            # Covers duplicate lookups by hash without reading the table rows
+            models.Index(fields=['hash', 'audio_file', 'offset'], name='fingerprint_lookup_idx'),
+        ]
+
+class Upload(models.Model):
+    """A resumable upload in progress; bytes [0, offset) have been received."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    finalizing = models.BooleanField(default=False)  # set while one request stores and ingests it
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def is_complete(self):
+        return self.offset >= self.size
 
 class Task(models.Model):
     STATUS_CHOICES = [
@@ -72,6 +125,22 @@ class Task(models.Model):
     audio_file = models.ForeignKey(AudioFile, on_delete=models.CASCADE, related_name='tasks')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='New')
 
+    # Virtual chunk: the task covers only [start_offset, start_offset + duration) seconds of audio_file
+    start_offset = models.FloatField(null=True, blank=True)
+    duration = models.FloatField(null=True, blank=True)
+
+    # Bumped whenever the task's annotations change; used as the ETag of its annotation list
+    annotations_version = models.PositiveIntegerField(default=0)
+
+    @property
+    def is_virtual(self):
+        return self.start_offset is not None
+
+    @property
+    def offset(self):
+        """Seconds to add to task-relative times to get times in audio_file."""
+        return self.start_offset or 0.0
+
     def __str__(self):
         return f"Task for {self.audio_file.file.name} in project {self.project.name} [{self.status}]"
 
@@ -84,6 +153,12 @@ class Annotation(models.Model):
     # NEW field for model-generated label (as string, independent of Label FK)
     model_label = models.CharField(max_length=100, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Serves the overlap query of time-windowed annotation requests
+            models.Index(fields=['task', 'start_time', 'end_time'], name='annotation_task_time_idx'),
+        ]
+
     def __str__(self):
         lbl = self.label.name if self.label else (self.model_label or "No Label")
         return f"{lbl} [{self.start_time} - {self.end_time}]"
@@ -0,0 +1,178 @@
+"""Project label schemas: cached reads and diffed writes.
+
+The labels → attributes → values tree of a project is read by every task
+and project detail request but rarely written.  Its serialized form is cached
+under the project's ``schema_version``, which every write to labels,
+attributes or values bumps, so stale entries are never read and simply
+expire.  Reading a schema is then one cache hit and no queries.
+
+Edits are applied as a diff: rows are matched to the submitted schema and
+only the differences are written, so renaming a label keeps the annotations
+that use it.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .edits import bump_version
+from .models import Attribute, AttributeValue, Label, Project
+
+# The field a matched row is renamed through
+RENAME_FIELDS = {Label: 'name', Attribute: 'name', AttributeValue: 'value'}
+
+
+def cache_key(project):
+    return f'label-schema:{project.pk}:{project.schema_version}'
+
+
+def bump_schema_version(project):
+    """Invalidate ``project``'s cached schema; call inside the transaction that changes it."""
+    Project.objects.filter(pk=project.pk).update(schema_version=F('schema_version') + 1)
+    project.refresh_from_db(fields=['schema_version'])
+
+
+def cached_schemas(projects, build):
+    """Map project id → schema for ``projects``, building the missing ones at once.
+
+    ``build(project_ids)`` returns a dict of schemas for the given ids.
+    """
+    keys = {cache_key(project): project.pk for project in projects}
+    schemas = {keys[key]: schema for key, schema in cache.get_many(keys).items()}
+    missing = [project_id for project_id in keys.values() if project_id not in schemas]
+    if missing:
+        built = build(missing)
+        cache.set_many(
+            {key: built[project_id] for key, project_id in keys.items() if project_id in built},
+            timeout=settings.LABEL_SCHEMA_CACHE_TIMEOUT,
+        )
+        schemas.update(built)
+    return schemas
+
+
+def create_values(pairs):
+    """Create ``(attribute, value_text)`` pairs with one bulk insert."""
+    AttributeValue.objects.bulk_create(
+        [AttributeValue(attribute=attribute, value=value) for attribute, value in pairs],
+        batch_size=settings.INGEST_BATCH_SIZE,
+    )
+
+
+def create_attributes(pairs):
+    """Create ``(label, attribute_data)`` pairs and their values, one bulk insert per level."""
+    attributes = Attribute.objects.bulk_create(
+        [Attribute(label=label, name=data['name']) for label, data in pairs],
+        batch_size=settings.INGEST_BATCH_SIZE,
+    )
+    create_values([
+        (attribute, value['value'])
+        for attribute, (_, data) in zip(attributes, pairs)
+        for value in data.get('values', [])
+    ])
+    return attributes
+
+
+def create_labels(project, labels_data):
+    """Create ``labels_data`` trees under ``project``, one bulk insert per level."""
+    labels = Label.objects.bulk_create(
+        [Label(project=project, name=data['name']) for data in labels_data],
+        batch_size=settings.INGEST_BATCH_SIZE,
+    )
+    create_attributes([(label, data) for label, data in zip(labels, labels_data) for data in data.get('attributes', [])])
+    return labels
+
+
+def _match(items, rows, field):
+    """Pair each of ``items`` with one of ``rows`` by ``id``, else by ``field``; return ``(pairs, unmatched_rows)``.
+
+    Ids are matched first so a renamed row cannot be claimed by name by another item.
+    """
+    by_id = {row.id: row for row in rows}
+    matched, used = [None] * len(items), set()
+    for i, item in enumerate(items):
+        row = by_id.get(item.get('id'))
+        if row is not None and row.id not in used:
+            matched[i] = row
+            used.add(row.id)
+    for i, item in enumerate(items):
+        if matched[i] is None:
+            row = next((row for row in rows if row.id not in used and getattr(row, field) == item[field]), None)
+            if row is not None:
+                matched[i] = row
+                used.add(row.id)
+    return list(zip(items, matched)), [row for row in rows if row.id not in used]
+
+
+def _rename(row, new_name, renamed):
+    field = RENAME_FIELDS[type(row)]
+    if getattr(row, field) != new_name:
+        setattr(row, field, new_name)
+        renamed[type(row)].append(row)
+
+
+def _attribute_size(attribute_data):
+    return 1 + len(attribute_data.get('values', []))
+
+
+def update_labels(project, labels_data):
+    """Make ``project``'s labels match ``labels_data``, writing only the differences.
+
+    Labels, attributes and values are matched by ``id``, else by name (values
+    by their text).  Matched rows are renamed in place, so annotations keep
+    their labels and attribute values; unmatched items are created and rows
+    missing from ``labels_data`` are deleted along with the annotation data
+    using them.  The project row is locked while the schema is read and
+    written, so concurrent edits are applied one after the other.  Returns
+    ``(created, updated, deleted)`` row counts, not counting rows deleted by
+    cascade.
+    """
+    with transaction.atomic():
+        Project.objects.select_for_update().only('pk').get(pk=project.pk)
+
+        new_labels, new_attributes, new_values = [], [], []
+        renamed = {model: [] for model in RENAME_FIELDS}
+        deleted = {Label: [], Attribute: [], AttributeValue: []}
+
+        labels = list(project.labels.prefetch_related('attributes__values'))
+        label_pairs, deleted[Label] = _match(labels_data, labels, 'name')
+        for label_data, label in label_pairs:
+            if label is None:
+                new_labels.append(label_data)
+                continue
+            _rename(label, label_data['name'], renamed)
+            attribute_pairs, stale = _match(label_data.get('attributes', []), list(label.attributes.all()), 'name')
+            deleted[Attribute] += stale
+            for attribute_data, attribute in attribute_pairs:
+                if attribute is None:
+                    new_attributes.append((label, attribute_data))
+                    continue
+                _rename(attribute, attribute_data['name'], renamed)
+                value_pairs, stale = _match(attribute_data.get('values', []), list(attribute.values.all()), 'value')
+                deleted[AttributeValue] += stale
+                for item, value in value_pairs:
+                    if value is None:
+                        new_values.append((attribute, item['value']))
+                    else:
+                        _rename(value, item['value'], renamed)
+
+        created = len(new_values) + sum(_attribute_size(data) for _, data in new_attributes) + sum(
+            1 + sum(_attribute_size(data) for data in label_data.get('attributes', [])) for label_data in new_labels
+        )
+        updated = sum(len(rows) for rows in renamed.values())
+        deleted_count = sum(len(rows) for rows in deleted.values())
+
+        for model, rows in deleted.items():
+            if rows:
+                model.objects.filter(pk__in=[row.pk for row in rows]).delete()
+        for model, rows in renamed.items():
+            model.objects.bulk_update(rows, [RENAME_FIELDS[model]], batch_size=settings.INGEST_BATCH_SIZE)
+        create_labels(project, new_labels)
+        create_attributes(new_attributes)
+        create_values(new_values)
+
+        if created or updated or deleted_count:
+            bump_schema_version(project)
+        # Annotation payloads carry label, attribute and value names, and deletes cascade to annotations
+        if updated or deleted_count:
+            bump_version(project.tasks.all())
+    return created, updated, deleted_count
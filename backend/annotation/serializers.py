@@ -1,10 +1,29 @@
+from django.db import models, transaction
+from django.urls import reverse
 from rest_framework import serializers
 from .models import (
     User, SuperProject, Project, Label, Attribute, AttributeValue,
     AudioFile, Task, Annotation, AnnotationAttributeValue
 )
+from .schema import bump_schema_version, cached_schemas, create_attributes, create_labels, update_labels
 
-class UserSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """Keep only the fields named in the ``fields`` context entry, when one is given.
+
+    Applies to the top-level serializer (or the items of a top-level list);
+    nested serializers are left whole.  Unknown names are ignored.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        wanted = self.context.get('fields')
+        root = self.root
+        is_top = root is self or (self.parent is root and isinstance(root, serializers.ListSerializer))
+        if wanted and is_top:
+            fields = {name: field for name, field in fields.items() if name in wanted}
+        return fields
+
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = '__all__'
@@ -17,8 +36,32 @@ class AttributeValueSerializer(serializers.ModelSerializer):
         model = AttributeValue
         fields = ['id', 'value']
 
+class AttributeValueItemField(serializers.Field):
+    """A submitted attribute value: its text, or ``{"id": ..., "value": ...}`` so an edit renames the row.
+
+    Both forms become ``{"id": id_or_None, "value": text}``.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            return {'id': None, 'value': data}
+        if not isinstance(data, dict) or not isinstance(data.get('value'), str):
+            raise serializers.ValidationError('Expected a string or an object with a "value" string.')
+        value_id = data.get('id')
+        if value_id is not None:
+            try:
+                value_id = int(value_id)
+            except (TypeError, ValueError):
+                raise serializers.ValidationError('"id" must be an integer.')
+        return {'id': value_id, 'value': data['value']}
+
+    def to_representation(self, value):
+        return value
+
 class AttributeSerializer(serializers.ModelSerializer):
-    values = serializers.ListField(child=serializers.CharField(), write_only=True, required=False)
+    # Writable so schema updates can match (and rename) existing attributes
+    id = serializers.IntegerField(required=False)
+    values = serializers.ListField(child=AttributeValueItemField(), write_only=True, required=False)
     value_objs = AttributeValueSerializer(source='values', many=True, read_only=True)
 
     class Meta:
@@ -26,10 +69,11 @@ class AttributeSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'values', 'value_objs']
 
     def create(self, validated_data):
-        values_data = validated_data.pop('values', [])
-        attribute = Attribute.objects.create(**validated_data)
-        for val in values_data:
-            AttributeValue.objects.create(attribute=attribute, value=val)
+        # The label comes from save(label=...)
+        label = validated_data['label']
+        with transaction.atomic():
+            attribute, = create_attributes([(label, validated_data)])
+            bump_schema_version(label.project)
         return attribute
 
     def to_representation(self, instance):
@@ -38,6 +82,8 @@ class AttributeSerializer(serializers.ModelSerializer):
         return rep
 
 class LabelSerializer(serializers.ModelSerializer):
+    # Writable so schema updates can match (and rename) existing labels
+    id = serializers.IntegerField(required=False)
     attributes = AttributeSerializer(many=True, required=False)
 
     class Meta:
@@ -45,21 +91,32 @@ class LabelSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'attributes']
 
     def create(self, validated_data):
-        attributes_data = validated_data.pop('attributes', [])
-        label = Label.objects.create(**validated_data)
-        for attribute_data in attributes_data:
-            values_data = attribute_data.pop('values', [])
-            attribute = Attribute.objects.create(label=label, **attribute_data)
-            for val in values_data:
-                AttributeValue.objects.create(attribute=attribute, value=val)
+        # The project comes from save(project=...)
+        project = validated_data.pop('project')
+        with transaction.atomic():
+            label, = create_labels(project, [validated_data])
+            bump_schema_version(project)
         return label
 
+def label_schemas(projects):
+    """Serialized labels of each of ``projects`` by project id, from the cache when current."""
+    def build(project_ids):
+        schemas = {project_id: [] for project_id in project_ids}
+        labels = Label.objects.filter(project_id__in=project_ids).order_by('id').prefetch_related('attributes__values')
+        for label in labels:
+            schemas[label.project_id].append(LabelSerializer(label).data)
+        return schemas
+    return cached_schemas(projects, build)
+
 class AudioFileSerializer(serializers.ModelSerializer):
     file = serializers.SerializerMethodField()
 
     class Meta:
         model = AudioFile
-        fields = ['id', 'file', 'optimized']
+        fields = [
+            'id', 'file', 'optimized', 'duration', 'sample_rate', 'channels', 'codec',
+            'duplicate_of', 'duplicate_offset',
+        ]
 
     def get_file(self, obj):
         request = self.context.get('request')
@@ -67,7 +124,7 @@ class AudioFileSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.file.url)
         return obj.file.url
 
-class SuperProjectSerializer(serializers.ModelSerializer):
+class SuperProjectSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     annotators = serializers.PrimaryKeyRelatedField(queryset=User.objects.filter(role='annotator'), many=True)
 
     class Meta:
@@ -80,8 +137,17 @@ class SuperProjectSerializer(serializers.ModelSerializer):
         super_project.annotators.set(annotators)
         return super_project
 
-class ProjectSerializer(serializers.ModelSerializer):
-    labels = LabelSerializer(many=True, required=False)
+class ProjectListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        projects = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        # Fetch the label schemas of the whole list with one cache round trip
+        if 'labels' in self.child.fields:
+            self.context['label_schemas'] = label_schemas(projects)
+        return super().to_representation(projects)
+
+class ProjectSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    # Written through the nested serializers, read from the cached schema
+    labels = LabelSerializer(many=True, required=False, write_only=True)
     audio_files = AudioFileSerializer(many=True, read_only=True)
     assigned_annotators = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.filter(role='annotator'), many=True
@@ -94,21 +160,23 @@ class ProjectSerializer(serializers.ModelSerializer):
             'display_waveform', 'display_spectrogram', 'optimize', 'degree',
             'labels', 'audio_files', 'assigned_annotators', 'model_type'
         ]
+        list_serializer_class = ProjectListSerializer
+
+    def to_representation(self, instance):
+        rep = super().to_representation(instance)
+        if 'labels' in self.fields:
+            schemas = self.context.get('label_schemas', {})
+            rep['labels'] = schemas[instance.pk] if instance.pk in schemas else label_schemas([instance])[instance.pk]
+        return rep
 
     def create(self, validated_data):
         labels_data = validated_data.pop('labels', [])
         annotators = validated_data.pop('assigned_annotators', [])
-        project = Project.objects.create(**validated_data)
-        project.assigned_annotators.set(annotators)
-
-        for label_data in labels_data:
-            attributes_data = label_data.pop('attributes', [])
-            label = Label.objects.create(project=project, **label_data)
-            for attribute_data in attributes_data:
-                values_data = attribute_data.pop('values', [])
-                attribute = Attribute.objects.create(label=label, **attribute_data)
-                for val in values_data:
-                    AttributeValue.objects.create(attribute=attribute, value=val)
+        # Nobody can read (and cache) the schema of the new project before this commits
+        with transaction.atomic():
+            project = Project.objects.create(**validated_data)
+            project.assigned_annotators.set(annotators)
+            create_labels(project, labels_data)
         return project
 
     def update(self, instance, validated_data):
@@ -123,25 +191,54 @@ class ProjectSerializer(serializers.ModelSerializer):
             instance.assigned_annotators.set(annotators)
 
         if labels_data is not None:
-            instance.labels.all().delete()
-            for label_data in labels_data:
-                attributes_data = label_data.pop('attributes', [])
-                label = Label.objects.create(project=instance, **label_data)
-                for attribute_data in attributes_data:
-                    values_data = attribute_data.pop('values', [])
-                    attribute = Attribute.objects.create(label=label, **attribute_data)
-                    for val in values_data:
-                        AttributeValue.objects.create(attribute=attribute, value=val)
+            update_labels(instance, labels_data)
 
         return instance
 
+def task_audio_url(task, request=None):
+    # Virtual chunks are served as just their range by the task audio endpoint
+    url = task.audio_file.file.url if not task.is_virtual else reverse('task-audio', args=[task.id])
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+class TaskProjectSerializer(ProjectSerializer):
+    """The project as nested in task detail: display options and the cached label schema."""
+    audio_files = None
+    assigned_annotators = None
+
+    class Meta(ProjectSerializer.Meta):
+        fields = ['id', 'name', 'display_waveform', 'display_spectrogram', 'model_type', 'labels']
+
 class TaskSerializer(serializers.ModelSerializer):
     audio_file = AudioFileSerializer()
-    project = ProjectSerializer()
+    project = TaskProjectSerializer()
+    audio_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Task
-        fields = ['id', 'project', 'audio_file', 'status']
+        fields = ['id', 'project', 'audio_file', 'status', 'start_offset', 'duration', 'audio_url']
+
+    def get_audio_url(self, obj):
+        return task_audio_url(obj, self.context.get('request'))
+
+class TaskListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Slim task representation for lists: project and audio file by id.
+
+    Use with ``select_related('project', 'audio_file')``; a page then costs one query.
+    """
+    project_name = serializers.CharField(source='project.name', read_only=True)
+    audio_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Task
+        fields = [
+            'id', 'project', 'project_name', 'audio_file', 'status',
+            'start_offset', 'duration', 'audio_url',
+        ]
+
+    def get_audio_url(self, obj):
+        return task_audio_url(obj, self.context.get('request'))
 
 class AnnotationAttributeValueSerializer(serializers.ModelSerializer):
     attribute_id = serializers.IntegerField(source='attribute.id')
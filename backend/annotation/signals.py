@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from . import storage
+from .models import AudioFile
+
+
+@receiver(post_delete, sender=AudioFile)
+def release_stored_audio(sender, instance, **kwargs):
+    """Drop the stored file (and its cached decodes) once no AudioFile uses it."""
+    if instance.file:
+        name = instance.file.name
+        transaction.on_commit(lambda: storage.release(name))
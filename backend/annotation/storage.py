@@ -0,0 +1,188 @@
+"""Content-addressed storage for uploaded audio.
+
+Uploads are stored once per distinct content under
+``audio/<h[:2]>/<h[2:4]>/<sha256><ext>``.  AudioFiles with identical content
+share one file; it is removed when the last AudioFile referencing it is
+deleted.  Uploads are hashed into a unique temporary file and moved into
+place atomically, so concurrent ingests of the same name never clash.
+
+Placing and releasing content hold a per-hash file lock, and every placement
+leaves a claim marker.  An ingest creates its AudioFile row only after the
+file is placed, so ``release`` leaves content claimed within
+``STORAGE_RELEASE_GRACE_SECONDS`` alone; ``sweep`` (the ``sweep_storage``
+command) deletes it later if it is still unreferenced.
+"""
+import contextlib
+import fcntl
+import glob
+import hashlib
+import os
+import tempfile
+import time
+import uuid
+
+from django.conf import settings
+
+from . import audio
+
+AUDIO_DIR = 'audio'
+LOCK_DIR = os.path.join(AUDIO_DIR, 'locks')
+CLAIM_DIR = os.path.join(AUDIO_DIR, 'claims')
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def content_name(content_hash, ext):
+    return os.path.join(AUDIO_DIR, content_hash[:2], content_hash[2:4], content_hash + ext.lower())
+
+
+def store_upload(uploaded_file):
+    """Store an uploaded file by content; return ``(relative_name, sha256)``."""
+    ext = os.path.splitext(uploaded_file.name)[1]
+    tmp_dir = os.path.join(settings.MEDIA_ROOT, AUDIO_DIR, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(suffix=ext, dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as dest:
+            for chunk in uploaded_file.chunks(HASH_CHUNK_SIZE):
+                digest.update(chunk)
+                dest.write(chunk)
+        return _place(tmp_path, digest.hexdigest(), ext)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def store_path(path, content_hash=None):
+    """Store a file already on disk (it is copied, not moved); return ``(relative_name, sha256)``.
+
+    With a precomputed ``content_hash`` the copy is skipped when that content is already stored.
+    """
+    ext = os.path.splitext(path)[1]
+    if content_hash is not None:
+        name = content_name(content_hash, ext)
+        with _locked(content_hash):
+            if os.path.exists(os.path.join(settings.MEDIA_ROOT, name)):
+                _claim(content_hash)
+                return name, content_hash
+    with open(path, 'rb') as f:
+        return store_upload(_NamedChunks(f, os.path.basename(path)))
+
+
+def store_assembled(path, ext, content_hash=None):
+    """Store a file assembled under MEDIA_ROOT by hard-linking it; return ``(relative_name, sha256)``.
+
+    The assembled file is left in place until its caller no longer needs it.
+    ``content_hash`` may be passed when it was computed while the file was written.
+    """
+    if content_hash is None:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+    tmp_dir = os.path.join(settings.MEDIA_ROOT, AUDIO_DIR, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex + ext)
+    os.link(path, tmp_path)
+    try:
+        return _place(tmp_path, content_hash, ext)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _place(tmp_path, content_hash, ext):
+    name = content_name(content_hash, ext)
+    final_path = os.path.join(settings.MEDIA_ROOT, name)
+    with _locked(content_hash):
+        _claim(content_hash)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)  # identical content is already stored
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+    return name, content_hash
+
+
+def release(name, grace=None):
+    """Delete the stored file ``name`` unless an AudioFile references it or it was claimed within ``grace`` seconds.
+
+    Returns whether the file was deleted.  Deferred files are left to :func:`sweep`.
+    """
+    from .models import AudioFile
+
+    if not name:
+        return False
+    if grace is None:
+        grace = settings.STORAGE_RELEASE_GRACE_SECONDS
+    content_hash = os.path.splitext(os.path.basename(name))[0]
+    with _locked(content_hash):
+        if AudioFile.objects.filter(file=name).exists():
+            return False
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        claim = _claim_path(content_hash)
+        placed = max((os.path.getmtime(p) for p in (path, claim) if os.path.exists(p)), default=0)
+        if time.time() - placed < grace:
+            return False  # an ingest may have placed it and not committed its AudioFile yet
+        audio.invalidate(path)
+        for leftover in (path, claim):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        return True
+
+
+def sweep(grace=None):
+    """Release every stored file no AudioFile references; return how many were deleted."""
+    from .models import AudioFile
+
+    root = os.path.join(settings.MEDIA_ROOT, AUDIO_DIR)
+    names = [
+        os.path.relpath(path, settings.MEDIA_ROOT)
+        for path in glob.glob(os.path.join(root, '??', '??', '*'))
+    ]
+    referenced = set(AudioFile.objects.filter(file__in=names).values_list('file', flat=True))
+    return sum(release(name, grace) for name in names if name not in referenced)
+
+
+@contextlib.contextmanager
+def _locked(content_hash):
+    """Serialize placing and releasing content across processes; hashes share 256 lock files."""
+    lock_dir = os.path.join(settings.MEDIA_ROOT, LOCK_DIR)
+    os.makedirs(lock_dir, exist_ok=True)
+    with open(os.path.join(lock_dir, content_hash[:2] + '.lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _claim_path(content_hash):
+    return os.path.join(settings.MEDIA_ROOT, CLAIM_DIR, content_hash)
+
+
+def _claim(content_hash):
+    path = _claim_path(content_hash)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a'):
+        pass
+    os.utime(path)
+
+
+class _NamedChunks:
+    """Minimal UploadedFile-like wrapper so on-disk files share the upload path."""
+
+    def __init__(self, f, name):
+        self.file = f
+        self.name = name
+
+    def chunks(self, chunk_size=HASH_CHUNK_SIZE):
+        while True:
+            data = self.file.read(chunk_size)
+            if not data:
+                break
+            yield data
@@ -1,3 +1,1064 @@
-from django.test import TestCase
+import base64
+import hashlib
+import importlib.util
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import librosa
+import numpy as np
+import soundfile as sf
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .models import (
+    User, SuperProject, Project, Label, Attribute, AttributeValue, Upload,
+    AudioFile, AudioAnalysis, Task, Annotation, AnnotationAttributeValue, Fingerprint,
+)
+from . import analysis, audio, auto_annotation, columnar, fingerprint, ingest, storage, uploads
+from .serializers import ProjectSerializer
+
+
+class TempMediaMixin:
+    """Point MEDIA_ROOT and AUDIO_CACHE_DIR at a fresh temporary directory."""
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        overrides = override_settings(
+            MEDIA_ROOT=os.path.join(self.tmp, 'media'), AUDIO_CACHE_DIR=os.path.join(self.tmp, 'cache')
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def write_wav(self, name, seconds, sample_rate=8000, seed=0):
+        """Write ``seconds`` of reproducible noise bursts; return the path."""
+        rng = np.random.default_rng(seed)
+        samples = rng.normal(0, 0.2, int(seconds * sample_rate)).astype(np.float32)
+        samples *= np.sin(np.linspace(0, seconds * np.pi, len(samples))) ** 2  # one burst per second
+        path = os.path.join(self.tmp, name)
+        sf.write(path, samples, sample_rate)
+        return path
+
+
+class AnnotationFixtureMixin:
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        manager = User.objects.create(username='manager', email='manager@example.com', role='manager')
+        super_project = SuperProject.objects.create(name='sp', manager=manager)
+        self.project = Project.objects.create(
+            super_project=super_project, user=manager, name='p', data_type='train', model_type='others'
+        )
+        self.label = Label.objects.create(project=self.project, name='bird')
+        self.attribute = Attribute.objects.create(label=self.label, name='quality')
+        self.good = AttributeValue.objects.create(attribute=self.attribute, value='good')
+        self.bad = AttributeValue.objects.create(attribute=self.attribute, value='bad')
+        audio_file = AudioFile.objects.create(project=self.project, file='audio/test.wav')
+        self.task = Task.objects.create(project=self.project, audio_file=audio_file)
+
+    def item(self, start, annotation_id=None, value=None, model_label=None):
+        value = value or self.good
+        return {
+            'annotation_id': annotation_id,
+            'start_time': start,
+            'end_time': start + 0.5,
+            'label_id': self.label.id,
+            'model_label': model_label,
+            'attributes': [{'attribute_id': self.attribute.id, 'value_id': value.id}],
+        }
+
+
+class SaveAnnotationsTests(AnnotationFixtureMixin, TestCase):
+    def save(self, items):
+        url = reverse('save-annotations', args=[self.task.id])
+        response = self.client.post(url, {'annotations': items, 'status': 'In Progress'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def saved_items(self):
+        return [
+            self.item(ann.start_time, annotation_id=ann.id)
+            for ann in Annotation.objects.filter(task=self.task).order_by('start_time')
+        ]
+
+    def test_query_count_does_not_grow_with_annotations(self):
+        counts = []
+        for n in (5, 500):
+            Annotation.objects.filter(task=self.task).delete()
+            self.save([self.item(float(i)) for i in range(n)])
+            items = self.saved_items()
+            # Update half, keep a quarter, drop the rest and add as many new ones
+            for item in items[:n // 2]:
+                item['start_time'] += 0.1
+                item['attributes'][0]['value_id'] = self.bad.id
+            items = items[:3 * n // 4] + [self.item(1000.0 + i) for i in range(n // 4)]
+            with CaptureQueriesContext(connection) as queries:
+                self.save(items)
+            counts.append(len(queries))
+        # A constant bound: backends may still split very large IN (...) lists into a few queries
+        for count in counts:
+            self.assertLessEqual(count, 25)
+        self.assertLessEqual(counts[1] - counts[0], 5)
+
+    def test_diff_only_touches_changed_rows(self):
+        self.save([self.item(0.0), self.item(1.0), self.item(2.0)])
+        items = self.saved_items()
+        ids = [item['annotation_id'] for item in items]
+
+        self.assertEqual(self.save(items), {
+            'message': 'Annotations saved successfully', 'created': 0, 'updated': 0, 'deleted': 0,
+        })
+
+        items[0]['end_time'] = 0.75
+        items[1]['attributes'] = [{'attribute_id': self.attribute.id, 'value_id': self.bad.id}]
+        result = self.save(items[:2] + [self.item(5.0, model_label='Speech')])
+        self.assertEqual((result['created'], result['updated'], result['deleted']), (1, 1, 1))
+
+        self.assertEqual(Annotation.objects.get(pk=ids[0]).end_time, 0.75)
+        self.assertFalse(Annotation.objects.filter(pk=ids[2]).exists())
+        self.assertEqual(
+            list(AnnotationAttributeValue.objects.filter(annotation_id=ids[1]).values_list('value_id', flat=True)),
+            [self.bad.id],
+        )
+        self.assertEqual(Annotation.objects.filter(task=self.task, model_label='Speech').count(), 1)
+
+    def test_get_annotations_payload_saves_back_unchanged(self):
+        self.save([self.item(0.0), self.item(1.0, value=self.bad), self.item(2.0, model_label='Speech')])
+        ids = set(Annotation.objects.filter(task=self.task).values_list('id', flat=True))
+        payload = self.client.get(reverse('get-annotations', args=[self.task.id])).data['annotations']
+
+        self.assertEqual(self.save(payload), {
+            'message': 'Annotations saved successfully', 'created': 0, 'updated': 0, 'deleted': 0,
+        })
+        self.assertEqual(set(Annotation.objects.filter(task=self.task).values_list('id', flat=True)), ids)
+
+
+class AnnotationOperationsTests(AnnotationFixtureMixin, TestCase):
+    def apply(self, operations, expected_status=200):
+        url = reverse('annotation-operations', args=[self.task.id])
+        response = self.client.post(url, {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, expected_status, response.data)
+        return response.data
+
+    def test_operations_return_only_changed_rows(self):
+        untouched = Annotation.objects.create(task=self.task, label=self.label, start_time=0.0, end_time=1.0)
+        stored = Annotation.objects.create(task=self.task, model_label='Speech', start_time=2.0, end_time=3.0)
+        doomed = Annotation.objects.create(task=self.task, model_label='Music', start_time=4.0, end_time=5.0)
+
+        result = self.apply([
+            {'op': 'add', 'client_id': 'a', 'annotation': self.item(6.0)},
+            {'op': 'update', 'client_id': 'a', 'annotation': {'end_time': 7.0}},
+            {'op': 'add', 'client_id': 'b', 'annotation': self.item(8.0)},
+            {'op': 'delete', 'client_id': 'b'},
+            {'op': 'update', 'id': stored.id, 'annotation': {'label_id': self.label.id}},
+            {'op': 'delete', 'id': doomed.id},
+        ])
+
+        self.assertEqual(list(result['client_ids']), ['a'])
+        self.assertEqual(result['deleted'], [doomed.id])
+        returned = {row['id']: row for row in result['annotations']}
+        self.assertEqual(set(returned), {result['client_ids']['a'], stored.id})
+        self.assertEqual(returned[result['client_ids']['a']]['end_time'], 7.0)
+        self.assertEqual(returned[result['client_ids']['a']]['attributes'][0]['value_id'], self.good.id)
+        self.assertEqual(returned[stored.id]['label_id'], self.label.id)
+        self.assertEqual(returned[stored.id]['model_label'], 'Speech')
+        self.assertTrue(Annotation.objects.filter(pk=untouched.id).exists())
+
+    def test_invalid_batch_changes_nothing(self):
+        stored = Annotation.objects.create(task=self.task, model_label='Speech', start_time=2.0, end_time=3.0)
+        self.apply([
+            {'op': 'delete', 'id': stored.id},
+            {'op': 'update', 'id': stored.id, 'annotation': {'end_time': 4.0}},
+        ], expected_status=400)
+        self.assertTrue(Annotation.objects.filter(pk=stored.id).exists())
+
+
+class GetAnnotationsTests(AnnotationFixtureMixin, TestCase):
+    def get(self, etag=None):
+        url = reverse('get-annotations', args=[self.task.id])
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def test_query_count_does_not_grow_with_annotations(self):
+        counts = []
+        for n in (5, 200):
+            Annotation.objects.filter(task=self.task).delete()
+            for i in range(n):
+                annotation = Annotation.objects.create(task=self.task, label=self.label, start_time=i, end_time=i + 1)
+                AnnotationAttributeValue.objects.create(annotation=annotation, attribute=self.attribute, value=self.good)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.get()
+            self.assertEqual(len(response.data['annotations']), n)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertLessEqual(counts[1], 3)
+
+    def test_unchanged_task_returns_not_modified(self):
+        Annotation.objects.create(task=self.task, model_label='Speech', start_time=0.0, end_time=1.0)
+        etag = self.get()['ETag']
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(etag).status_code, 304)
+
+        save_url = reverse('save-annotations', args=[self.task.id])
+        self.client.post(save_url, {'annotations': [self.item(2.0)]}, format='json')
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['annotations'][0]['label_name'], 'bird')
+
+    def test_window_returns_overlapping_annotations(self):
+        for start, end in [(0.0, 5.0), (4.0, 12.0), (9.0, 10.0), (10.0, 11.0), (20.0, 30.0)]:
+            Annotation.objects.create(task=self.task, model_label='Speech', start_time=start, end_time=end)
+        url = reverse('get-annotations', args=[self.task.id])
+        response = self.client.get(url, {'start': 5.0, 'end': 10.0})
+        self.assertEqual(
+            [(a['start_time'], a['end_time']) for a in response.data['annotations']],
+            [(4.0, 12.0), (9.0, 10.0)],
+        )
+        self.assertEqual(self.client.get(url, {'start': 'x'}).status_code, 400)
+
+    def test_columnar_payload(self):
+        labelled = Annotation.objects.create(task=self.task, label=self.label, start_time=1.0, end_time=2.5)
+        AnnotationAttributeValue.objects.create(annotation=labelled, attribute=self.attribute, value=self.bad)
+        Annotation.objects.create(task=self.task, model_label='Speech', start_time=3.0, end_time=4.0)
+        Annotation.objects.create(task=self.task, model_label='Speech', start_time=5.0, end_time=6.0)
+
+        url = reverse('get-annotations', args=[self.task.id])
+        response = self.client.get(url, {'start': 0, 'end': 10}, HTTP_ACCEPT='application/vnd.annotations.columnar+json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'].endswith('.columnar"'))
+        payload = response.json()
+
+        def decode(column):
+            return np.frombuffer(base64.b64decode(column['data']), dtype=column['dtype']).tolist()
+
+        self.assertEqual(payload['count'], 3)
+        self.assertEqual(decode(payload['start_time']), [1.0, 3.0, 5.0])
+        self.assertEqual(decode(payload['end_time']), [2.5, 4.0, 6.0])
+        self.assertEqual(payload['labels'], [[self.label.id, 'bird', None], [None, None, 'Speech']])
+        self.assertEqual(decode(payload['label_index']), [0, 1, 1])
+        self.assertEqual(decode(payload['attributes']['row']), [0])
+        self.assertEqual(payload['value_names'], {str(self.bad.id): 'bad'})
+        self.assertNotEqual(self.get()['ETag'], response['ETag'])
+
+    def test_columnar_skips_annotations_added_between_its_queries(self):
+        Annotation.objects.create(task=self.task, model_label='Speech', start_time=0.0, end_time=1.0)
+        added = []
+
+        def add_before_attribute_values(execute, sql, params, many, context):
+            if not added and sql.startswith('SELECT') and 'annotationattributevalue' in sql:
+                added.append(True)
+                annotation = Annotation.objects.create(task=self.task, label=self.label, start_time=2.0, end_time=3.0)
+                AnnotationAttributeValue.objects.create(annotation=annotation, attribute=self.attribute, value=self.good)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(add_before_attribute_values):
+            payload = columnar.encode(Annotation.objects.filter(task=self.task))
+        self.assertEqual(payload['count'], 1)
+        self.assertEqual(payload['value_names'], {})
+
+
+class TaskListTests(AnnotationFixtureMixin, TestCase):
+    def add_tasks(self, n):
+        for i in range(n):
+            audio_file = AudioFile.objects.create(project=self.project, file=f'audio/{i}.wav')
+            Task.objects.create(project=self.project, audio_file=audio_file, start_offset=0.0, duration=30.0)
+
+    def test_query_count_does_not_grow_with_tasks(self):
+        counts = []
+        for n in (5, 50):
+            self.add_tasks(n)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('tasks-for-project', args=[self.project.id]), {'page_size': 1000})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), Task.objects.filter(project=self.project).count())
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertLessEqual(counts[1], 2)
+
+    def test_cursor_pages_cover_every_task_once(self):
+        self.add_tasks(7)
+        seen, url, params = [], reverse('task-list'), {'page_size': 3}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            seen += [task['id'] for task in response.data['results']]
+            url, params = response.data['next'], None
+        self.assertEqual(seen, sorted(Task.objects.values_list('id', flat=True)))
+        first = response.data['results'][0]
+        self.assertEqual(first['project'], self.project.id)
+        self.assertEqual(first['project_name'], 'p')
+        self.assertTrue(first['audio_url'].endswith(reverse('task-audio', args=[first['id']])))
+
+    def test_status_filter_applies_to_every_page(self):
+        self.add_tasks(6)
+        Task.objects.filter(pk__in=list(Task.objects.order_by('id').values_list('id', flat=True))[::2]).update(status='Completed')
+        completed = sorted(Task.objects.filter(status='Completed').values_list('id', flat=True))
+        seen, url, params = [], reverse('task-list'), {'page_size': 2, 'status': 'Completed', 'fields': 'id,status'}
+        while url:
+            response = self.client.get(url, params)
+            seen += [task['id'] for task in response.data['results']]
+            self.assertEqual({task['status'] for task in response.data['results']}, {'Completed'})
+            url, params = response.data['next'], None
+        self.assertEqual(seen, completed)
+
+
+class ListEndpointTests(AnnotationFixtureMixin, TestCase):
+    def add_projects(self, n):
+        name = f'annotator{User.objects.count()}'
+        annotator = User.objects.create(username=name, email=f'{name}@example.com', role='annotator')
+        for i in range(n):
+            project = Project.objects.create(
+                super_project=self.project.super_project, user=self.project.user, name=f'p{i}', data_type='train',
+            )
+            project.assigned_annotators.add(annotator)
+            label = Label.objects.create(project=project, name='bird')
+            attribute = Attribute.objects.create(label=label, name='quality')
+            AttributeValue.objects.create(attribute=attribute, value='good')
+
+    def test_project_list_query_count_does_not_grow_with_projects(self):
+        counts = []
+        for n in (3, 30):
+            self.add_projects(n)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('project-list'), {'page_size': 1000})
+            self.assertEqual(len(response.data['results']), Project.objects.count())
+            self.assertEqual(response.data['results'][-1]['labels'][0]['attributes'][0]['values'][0]['value'], 'good')
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_fields_limit_rows_and_skip_relations(self):
+        self.add_projects(3)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('project-list'), {'fields': 'id,name'})
+        self.assertEqual(response.data['results'][0], {'id': self.project.id, 'name': 'p'})
+
+        response = self.client.get(reverse('user-list'), {'role': 'annotator', 'fields': 'id,username'})
+        self.assertEqual([set(row) for row in response.data['results']], [{'id', 'username'}])
+
+    def test_cursor_pages_cover_every_project_once(self):
+        self.add_projects(5)
+        seen, url, params = [], reverse('project-list'), {'page_size': 2, 'fields': 'id'}
+        while url:
+            response = self.client.get(url, params)
+            seen += [row['id'] for row in response.data['results']]
+            url, params = response.data['next'], None
+        self.assertEqual(seen, sorted(Project.objects.values_list('id', flat=True)))
+
+
+class LabelSchemaCacheTests(AnnotationFixtureMixin, TestCase):
+    def get_task(self):
+        response = self.client.get(reverse('task-detail', args=[self.task.id]))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_task_detail_reads_schema_from_cache(self):
+        labels = self.get_task()['project']['labels']
+        self.assertEqual(labels[0]['attributes'][0]['values'][1]['value'], 'bad')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_task()['project']['labels'], labels)
+
+    def test_label_writes_invalidate_cached_schema(self):
+        self.get_task()
+        url = reverse('project-update', args=[self.project.id])
+        response = self.client.put(url, {'labels': [{'name': 'frog'}]}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([label['name'] for label in response.data['labels']], ['frog'])
+        self.assertEqual([label['name'] for label in self.get_task()['project']['labels']], ['frog'])
+
+
+class LabelSchemaUpdateTests(AnnotationFixtureMixin, TestCase):
+    def update(self, labels):
+        response = self.client.put(
+            reverse('project-update', args=[self.project.id]), {'labels': labels}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['labels']
+
+    def test_rename_keeps_annotations_and_only_writes_differences(self):
+        annotation = Annotation.objects.create(task=self.task, label=self.label, start_time=0.0, end_time=1.0)
+        good = AnnotationAttributeValue.objects.create(annotation=annotation, attribute=self.attribute, value=self.good)
+        bad = Annotation.objects.create(task=self.task, label=self.label, start_time=2.0, end_time=3.0)
+        AnnotationAttributeValue.objects.create(annotation=bad, attribute=self.attribute, value=self.bad)
+
+        labels = self.update([
+            {'id': self.label.id, 'name': 'songbird', 'attributes': [
+                {'id': self.attribute.id, 'name': 'quality', 'values': ['good', 'excellent']},
+            ]},
+            {'name': 'frog', 'attributes': [{'name': 'call', 'values': ['croak']}]},
+        ])
+
+        self.assertEqual([label['name'] for label in labels], ['songbird', 'frog'])
+        self.assertEqual(labels[0]['id'], self.label.id)
+        self.assertEqual([v['value'] for v in labels[0]['attributes'][0]['values']], ['good', 'excellent'])
+        self.assertEqual(labels[1]['attributes'][0]['values'][0]['value'], 'croak')
+        # Both annotations keep their label; only the removed value's attribute row went
+        self.assertEqual(Annotation.objects.filter(label=self.label).count(), 2)
+        self.assertTrue(AnnotationAttributeValue.objects.filter(pk=good.pk).exists())
+        self.assertFalse(AnnotationAttributeValue.objects.filter(value_id=self.bad.id).exists())
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.annotations_version, 1)
+
+    def test_resubmitting_same_schema_changes_nothing(self):
+        self.project.refresh_from_db()
+        version = self.project.schema_version
+        labels = [{'name': 'bird', 'attributes': [{'name': 'quality', 'values': ['good', 'bad']}]}]
+        with CaptureQueriesContext(connection) as queries:
+            self.update(labels)
+        self.assertFalse([q for q in queries if q['sql'].startswith(('INSERT', 'DELETE'))])
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.schema_version, version)
+        self.assertEqual(Label.objects.get(project=self.project).pk, self.label.pk)
+
+    def test_value_objects_rename_values_in_place(self):
+        annotation = Annotation.objects.create(task=self.task, label=self.label, start_time=0.0, end_time=1.0)
+        kept = AnnotationAttributeValue.objects.create(annotation=annotation, attribute=self.attribute, value=self.good)
+        labels = self.update([
+            {'id': self.label.id, 'name': 'bird', 'attributes': [{'id': self.attribute.id, 'name': 'quality', 'values': [
+                {'id': self.good.id, 'value': 'great'}, {'id': self.bad.id, 'value': 'bad'}, 'unsure',
+            ]}]},
+        ])
+        self.assertEqual(
+            [(v['id'], v['value']) for v in labels[0]['attributes'][0]['values']],
+            [(self.good.id, 'great'), (self.bad.id, 'bad'), (AttributeValue.objects.latest('id').id, 'unsure')],
+        )
+        self.assertEqual(AnnotationAttributeValue.objects.get(pk=kept.pk).value_id, self.good.id)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.annotations_version, 1)
+
+    def test_malformed_value_items_are_rejected(self):
+        response = self.client.put(reverse('project-update', args=[self.project.id]), {'labels': [
+            {'name': 'bird', 'attributes': [{'name': 'quality', 'values': [{'id': 'x', 'value': 'good'}, 3]}]},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(AttributeValue.objects.get(pk=self.good.pk).value, 'good')
+
+    def test_nested_creation_query_count_does_not_grow_with_schema(self):
+        counts = []
+        for n in (2, 20):
+            labels = [
+                {'name': f'label {i}', 'attributes': [{'name': 'quality', 'values': ['good', 'bad']}]}
+                for i in range(n)
+            ]
+            serializer = ProjectSerializer(data={
+                'super_project': self.project.super_project_id, 'user': self.project.user_id, 'name': f'p{n}',
+                'data_type': 'train', 'assigned_annotators': [], 'labels': labels,
+            })
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            with CaptureQueriesContext(connection) as queries:
+                project = serializer.save()
+            counts.append(len(queries))
+            self.assertEqual(AttributeValue.objects.filter(attribute__label__project=project).count(), 2 * n)
+        self.assertEqual(counts[0], counts[1])
+
+
+@unittest.skipUnless(importlib.util.find_spec('torch'), "torch is not installed")
+class EarlyExitCalibrationTests(SimpleTestCase):
+    def setUp(self):
+        import torch
+        self.torch = torch
+        path = os.path.join(os.path.dirname(__file__), 'auto_annotation', 'beats', 'src', 'early_exit.py')
+        spec = importlib.util.spec_from_file_location('early_exit', path)
+        self.early_exit = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(self.early_exit)
+
+    def threshold(self, confidence, agrees, agreement):
+        return self.early_exit.exit_threshold(
+            self.torch.tensor(confidence), self.torch.tensor(agrees), agreement
+        )
+
+    def test_lowest_threshold_meeting_agreement(self):
+        # Running agreement from the most confident segment down: 1, 1, 2/3, 3/4
+        confidence, agrees = [0.7, 0.9, 0.6, 0.8], [False, True, True, True]
+        for agreement, expected_threshold, expected_accepted in ((0.75, 0.6, 4), (0.9, 0.8, 2)):
+            threshold, accepted = self.threshold(confidence, agrees, agreement)
+            self.assertAlmostEqual(threshold, expected_threshold, places=6)
+            self.assertEqual(accepted, expected_accepted)
+
+    def test_no_threshold_when_head_never_agrees(self):
+        threshold, accepted = self.threshold([0.9, 0.8], [False, False], 0.5)
+        self.assertEqual((threshold, accepted), (float('inf'), 0))
+        heads = self.early_exit.ExitHeads(num_layers=2, embed_dim=4, num_classes=3)
+        self.assertTrue(self.torch.isinf(heads.thresholds).all())
+
+
+def prediction(start, label, confidence=1.0):
+    return {'start_time': start, 'end_time': start + 1.0, 'label': label, 'confidence': confidence}
+
+
+@override_settings(CASCADE_CONFIDENCE_THRESHOLD=0.5, CASCADE_AMBIGUOUS_CLASSES=['Speech'])
+class CascadeModelTests(SimpleTestCase):
+    def run_cascade(self, yamnet, beats):
+        with mock.patch.object(auto_annotation, 'run_yamnet_model', return_value=yamnet), \
+                mock.patch.object(auto_annotation, 'run_beats_model', return_value=beats) as run_beats:
+            return auto_annotation.run_cascade_model('clip.wav'), run_beats
+
+    def test_uncertain_and_ambiguous_segments_go_to_beats(self):
+        yamnet = [prediction(0, 'Dog', 0.9), prediction(1, 'Cat', 0.3), prediction(2, 'speech', 0.95)]
+        beats = [prediction(1, 'Bird', 0.8), prediction(2, 'Singing', 0.7)]
+        predictions, run_beats = self.run_cascade(yamnet, beats)
+        run_beats.assert_called_once_with('clip.wav', segments=[[1, 2.0], [2, 3.0]])
+        self.assertEqual([p['label'] for p in predictions], ['Dog', 'Bird', 'Singing'])
+
+    def test_confident_segments_skip_beats(self):
+        predictions, run_beats = self.run_cascade([prediction(0, 'Dog', 0.9)], [])
+        run_beats.assert_not_called()
+        self.assertEqual([p['label'] for p in predictions], ['Dog'])
+
+    def test_silence_is_not_escalated(self):
+        predictions, run_beats = self.run_cascade([prediction(0, 'Silence', 0.2)], [])
+        run_beats.assert_not_called()
+        self.assertEqual([p['label'] for p in predictions], ['Silence'])
+
+    def test_incomplete_beats_output_keeps_yamnet_labels(self):
+        yamnet = [prediction(0, 'Cat', 0.3), prediction(1, 'Cow', 0.2)]
+        predictions, _ = self.run_cascade(yamnet, [prediction(0, 'Bird')])
+        self.assertEqual([p['label'] for p in predictions], ['Cat', 'Cow'])
+
+
+class EnsembleFusionTests(SimpleTestCase):
+    segments = [[0.0, 1.0], [1.0, 2.0]]
+    weights = {'beats': 0.6, 'yamnet': 0.4}
+    beats = [
+        {'label': 'Dog', 'scores': {'Dog': 0.6, 'Cat': 0.4}},
+        {'label': 'Bird', 'scores': {'Bird': 0.9}},
+    ]
+
+    def fuse(self, yamnet):
+        predictions = auto_annotation.fuse_predictions(self.segments, {'beats': self.beats, 'yamnet': yamnet}, self.weights)
+        return [(p['start_time'], p['label'], p['confidence']) for p in predictions]
+
+    def test_weighted_scores_pick_the_label(self):
+        yamnet = [
+            {'label': 'Cat', 'scores': {'Cat': 0.9, 'Dog': 0.1}},
+            {'label': 'Car', 'confidence': 0.5},  # no score list: the top label's confidence counts
+        ]
+        self.assertEqual(self.fuse(yamnet), [(0.0, 'Cat', 0.6), (1.0, 'Bird', 0.54)])
+
+    def test_failed_model_contributes_nothing(self):
+        self.assertEqual(self.fuse([]), [(0.0, 'Dog', 0.36), (1.0, 'Bird', 0.54)])
+        self.assertEqual(auto_annotation.fuse_predictions(self.segments, {'beats': [], 'yamnet': []}, self.weights), [])
+
+
+class AudioCacheTests(TempMediaMixin, SimpleTestCase):
+    def entry(self, name, age):
+        path = os.path.join(audio._cache_dir(), name)
+        np.save(path, np.zeros(250, dtype=np.float32))
+        os.utime(path, (time.time() - age, time.time() - age))
+        return path
+
+    def test_evicts_least_recently_used_first(self):
+        old, middle, new = self.entry('a.npy', 30), self.entry('b.npy', 20), self.entry('c.npy', 10)
+        size = os.path.getsize(old)
+        audio.evict(max_bytes=2 * size)
+        self.assertEqual([os.path.exists(p) for p in (old, middle, new)], [False, True, True])
+        audio.evict(max_bytes=0, keep=middle)
+        self.assertEqual([os.path.exists(p) for p in (middle, new)], [True, False])
+
+    def test_hit_is_not_decoded_again_and_counts_as_use(self):
+        path = self.write_wav('tone.wav', 1.0)
+        with mock.patch('librosa.load', wraps=audio.librosa.load) as load:
+            cached = audio.cached_path(path)
+            os.utime(cached, (0, 0))
+            self.assertEqual(audio.cached_path(path), cached)
+        self.assertEqual(load.call_count, 1)
+        self.assertGreater(os.path.getmtime(cached), 0)
+
+    def test_changed_source_is_decoded_again(self):
+        path = self.write_wav('tone.wav', 1.0)
+        first = audio.cached_path(path)
+        self.write_wav('tone.wav', 2.0)
+        second = audio.cached_path(path)
+        self.assertNotEqual(first, second)
+        self.assertFalse(os.path.exists(first))
+        self.assertEqual(len(np.load(second)), 2 * audio.MODEL_SAMPLE_RATE)
+
+
+class TaskAudioTests(TempMediaMixin, AnnotationFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join(self.tmp, 'media', 'audio'))
+        os.replace(self.write_wav('chunk.wav', 4.0), os.path.join(self.tmp, 'media', 'audio', 'chunk.wav'))
+        audio_file = AudioFile.objects.create(project=self.project, file='audio/chunk.wav')
+        self.chunk = Task.objects.create(project=self.project, audio_file=audio_file, start_offset=1.0, duration=2.0)
+
+    def fetch(self):
+        response = self.client.get(reverse('task-audio', args=[self.chunk.id]))
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_virtual_chunk_clip_is_encoded_once(self):
+        with mock.patch.object(audio, 'read_range', wraps=audio.read_range) as read_range:
+            first = self.fetch()
+            second = self.fetch()
+        self.assertEqual(read_range.call_count, 1)
+        self.assertEqual(first, second)
+        info = sf.info(io.BytesIO(first))
+        self.assertAlmostEqual(info.duration, 2.0, places=3)
+
+    def test_clip_follows_source_changes(self):
+        self.fetch()
+        self.write_wav('longer.wav', 6.0, seed=1)
+        os.replace(os.path.join(self.tmp, 'longer.wav'), self.chunk.audio_file.file.path)
+        with mock.patch.object(audio, 'read_range', wraps=audio.read_range) as read_range:
+            self.fetch()
+        self.assertEqual(read_range.call_count, 1)
+        audio.invalidate(self.chunk.audio_file)
+        self.assertEqual(audio._entries(), [])
+
+
+class StorageTests(TempMediaMixin, AnnotationFixtureMixin, TestCase):
+    def stored_path(self, name):
+        return os.path.join(self.tmp, 'media', name)
+
+    def test_identical_content_is_stored_once(self):
+        source = self.write_wav('a.wav', 1.0)
+        name, content_hash = storage.store_path(source)
+        shutil.copy(source, os.path.join(self.tmp, 'b.wav'))
+        self.assertEqual(storage.store_path(os.path.join(self.tmp, 'b.wav')), (name, content_hash))
+        self.assertEqual(storage.store_path(source, content_hash), (name, content_hash))
+        self.assertTrue(os.path.exists(self.stored_path(name)))
+        self.assertEqual(os.listdir(os.path.join(self.tmp, 'media', 'audio', 'tmp')), [])
+
+    def test_release_spares_referenced_and_recently_placed_content(self):
+        name, _ = storage.store_path(self.write_wav('a.wav', 1.0))
+        AudioFile.objects.create(project=self.project, file=name)
+        self.assertFalse(storage.release(name, grace=0))
+
+        AudioFile.objects.filter(file=name).delete()
+        self.assertFalse(storage.release(name))  # placed moments ago: its ingest may not have committed
+        self.assertTrue(os.path.exists(self.stored_path(name)))
+
+        audio.cached_path(self.stored_path(name))
+        self.assertTrue(storage.release(name, grace=0))
+        self.assertFalse(os.path.exists(self.stored_path(name)))
+        self.assertEqual(audio._entries(), [])
+
+    def test_placing_renews_the_claim(self):
+        source = self.write_wav('a.wav', 1.0)
+        name, content_hash = storage.store_path(source)
+        claim = storage._claim_path(content_hash)
+        os.utime(claim, (0, 0))
+        storage.store_path(source, content_hash)
+        self.assertFalse(storage.release(name, grace=60))
+
+    def test_sweep_deletes_only_unreferenced_content(self):
+        kept, _ = storage.store_path(self.write_wav('a.wav', 1.0, seed=1))
+        orphan, _ = storage.store_path(self.write_wav('b.wav', 1.0, seed=2))
+        AudioFile.objects.create(project=self.project, file=kept)
+        self.assertEqual(storage.sweep(grace=60), 0)
+        self.assertEqual(storage.sweep(grace=0), 1)
+        self.assertTrue(os.path.exists(self.stored_path(kept)))
+        self.assertFalse(os.path.exists(self.stored_path(orphan)))
+
+
+class IngestUploadTests(TempMediaMixin, AnnotationFixtureMixin, TestCase):
+    def upload(self, seconds, seed=0):
+        with open(self.write_wav('upload.wav', seconds, seed=seed), 'rb') as f:
+            return SimpleUploadedFile('upload.wav', f.read(), content_type='audio/wav')
+
+    def inserts(self, queries, model):
+        return sum(q['sql'].startswith(f'INSERT INTO "{model._meta.db_table}"') for q in queries)
+
+    def test_optimized_file_is_inserted_in_bulk(self):
+        self.project.model_type = 'yamnet'
+        predictions = [
+            {'start_time': 8.0, 'end_time': 9.0, 'label': 'Speech'},
+            {'start_time': 10.0, 'end_time': 11.0, 'label': 'Silence'},
+        ]
+        with mock.patch.object(ingest, 'run_model', return_value=predictions) as run_model, \
+                CaptureQueriesContext(connection) as queries:
+            af = ingest.ingest_upload(self.project, self.upload(80.0), optimize=True, model_type='yamnet')
+
+        self.assertAlmostEqual(af.duration, 80.0, places=2)
+        tasks = list(af.tasks.order_by('start_offset'))
+        self.assertGreater(len(tasks), 2)
+        self.assertEqual(tasks[0].start_offset, 0.0)
+        for task, following in zip(tasks, tasks[1:]):
+            self.assertAlmostEqual(task.start_offset + task.duration, following.start_offset, places=3)
+        self.assertAlmostEqual(tasks[-1].start_offset + tasks[-1].duration, 80.0, places=2)
+
+        annotations = Annotation.objects.filter(task__audio_file=af)
+        self.assertEqual(annotations.count(), run_model.call_count)
+        self.assertEqual(set(annotations.values_list('model_label', flat=True)), {'Speech'})
+        self.assertTrue(AudioAnalysis.objects.filter(audio_file=af).exists())
+        self.assertGreater(Fingerprint.objects.filter(audio_file=af).count(), 0)
+        self.assertEqual(self.inserts(queries, Task), 1)
+        self.assertEqual(self.inserts(queries, Annotation), 1)
+
+    def test_whole_file_task_without_model(self):
+        af = ingest.ingest_upload(self.project, self.upload(5.0), model_type='others')
+        task = af.tasks.get()
+        self.assertFalse(task.is_virtual)
+        self.assertFalse(task.annotations.exists())
+        self.assertEqual(af.sample_rate, 8000)
+
+    def test_failed_ingest_leaves_no_rows(self):
+        before = (AudioFile.objects.count(), Task.objects.count())
+        with mock.patch.object(Task.objects, 'bulk_create', side_effect=RuntimeError('boom')), \
+                self.assertRaises(RuntimeError):
+            ingest.ingest_upload(self.project, self.upload(5.0), model_type='others')
+        self.assertEqual((AudioFile.objects.count(), Task.objects.count()), before)
+        self.assertFalse(Fingerprint.objects.exists())
+        self.assertFalse(AudioAnalysis.objects.exists())
+        self.assertEqual(storage.sweep(grace=0), 1)
+
+
+class ResumableUploadTests(TempMediaMixin, AnnotationFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        with open(self.write_wav('upload.wav', 30.0), 'rb') as f:
+            self.data = f.read()
+        response = self.client.post(
+            reverse('upload-create'), {'filename': 'upload.wav', 'size': len(self.data)}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.url = reverse('upload-detail', args=[response.data['id']])
+        self.upload_id = response.data['id']
+
+    def put(self, offset, data):
+        return self.client.put(
+            self.url, data=data, content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_wrong_offset_is_rejected_with_the_expected_one(self):
+        self.assertEqual(self.put(0, self.data[:1000]).status_code, 200)
+        response = self.put(0, self.data[:1000])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 1000)
+        self.assertEqual(self.put(5000, self.data[5000:6000]).status_code, 409)
+        self.assertEqual(Upload.objects.get(pk=self.upload_id).offset, 1000)
+
+    def test_resume_and_finalize(self):
+        split = 300 * 1024
+        self.assertEqual(self.put(0, self.data[:split]).data['offset'], split)
+        resumed = self.client.get(self.url).data['offset']  # e.g. after a dropped connection
+        self.assertEqual(resumed, split)
+
+        incomplete = self.client.post(
+            reverse('upload-finalize', args=[self.upload_id]), {'project_id': self.project.id}, format='json'
+        )
+        self.assertEqual(incomplete.status_code, 409)
+
+        self.assertEqual(self.put(resumed, self.data[resumed:]).data['offset'], len(self.data))
+        response = self.client.post(
+            reverse('upload-finalize', args=[self.upload_id]), {'project_id': self.project.id}, format='json'
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        af = AudioFile.objects.get(pk=response.data['id'])
+        self.assertEqual(af.content_hash, hashlib.sha256(self.data).hexdigest())
+        with open(af.file.path, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertFalse(Upload.objects.filter(pk=self.upload_id).exists())
+        self.assertEqual(os.listdir(os.path.join(self.tmp, 'media', 'audio', 'uploads')), [])
+
+    def finalize(self):
+        return self.client.post(
+            reverse('upload-finalize', args=[self.upload_id]), {'project_id': self.project.id}, format='json'
+        )
+
+    def test_hash_and_analysis_run_while_chunks_arrive(self):
+        split = 300 * 1024
+        self.put(0, self.data[:split])
+        uploads._progress.clear()  # the next chunk lands on a process that saw none of the first
+        self.put(split, self.data[split:])
+        progress = uploads._progress[Upload.objects.get(pk=self.upload_id).pk]
+        self.assertEqual(progress.hashed, len(self.data))
+        self.assertGreater(progress.frames, 0)
+
+        with mock.patch.object(analysis, 'analyze') as analyze, \
+                mock.patch.object(storage, 'hashlib', wraps=hashlib) as storage_hashlib:
+            response = self.finalize()
+        self.assertEqual(response.status_code, 201, response.data)
+        analyze.assert_not_called()
+        storage_hashlib.sha256.assert_not_called()
+        af = AudioFile.objects.get(pk=response.data['id'])
+        self.assertEqual(af.content_hash, hashlib.sha256(self.data).hexdigest())
+        expected, _ = analysis.analyze(af)
+        fingerprint.take_landmarks(expected)
+        self.assertEqual(af.analysis.results, expected)
+
+    def test_failed_ingest_keeps_the_upload_for_a_retry(self):
+        self.put(0, self.data)
+        with mock.patch.object(uploads, 'ingest_stored', side_effect=RuntimeError('boom')), \
+                self.assertRaises(RuntimeError):
+            self.finalize()
+        upload = Upload.objects.get(pk=self.upload_id)
+        self.assertFalse(upload.finalizing)
+        self.assertTrue(os.path.exists(uploads.assembly_path(upload)))
+
+        self.assertEqual(self.finalize().status_code, 201)
+        self.assertFalse(Upload.objects.filter(pk=self.upload_id).exists())
+
+    def test_concurrent_finalize_is_rejected(self):
+        self.put(0, self.data)
+        Upload.objects.filter(pk=self.upload_id).update(finalizing=True)  # another request is storing it
+        self.assertEqual(self.finalize().status_code, 409)
+        self.assertEqual(self.put(len(self.data), b'').status_code, 409)
+        self.assertEqual(AudioFile.objects.count(), 1)
+
+    def test_non_audio_is_rejected_once_the_header_arrives(self):
+        response = self.put(0, b'\0' * (300 * 1024))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Upload.objects.filter(pk=self.upload_id).exists())
+
+    def test_abandoned_uploads_expire(self):
+        self.put(0, self.data[:1000])
+        upload = Upload.objects.get(pk=self.upload_id)
+        stray = os.path.join(os.path.dirname(uploads.assembly_path(upload)), 'gone.part.wav')
+        open(stray, 'wb').close()
+        self.assertEqual(uploads.expire(max_age=60), 0)
+
+        Upload.objects.filter(pk=self.upload_id).update(updated_at=upload.updated_at - timedelta(minutes=2))
+        os.utime(stray, (time.time() - 120, time.time() - 120))
+        self.assertEqual(uploads.expire(max_age=60), 1)
+        self.assertFalse(Upload.objects.exists())
+        self.assertEqual(os.listdir(os.path.dirname(stray)), [])
+
+
+class ImportAudioCommandTests(TempMediaMixin, AnnotationFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.source = os.path.join(self.tmp, 'source')
+        os.makedirs(self.source)
+        for seed in range(2):
+            os.replace(self.write_wav(f'{seed}.wav', 3.0, seed=seed), os.path.join(self.source, f'{seed}.wav'))
+
+    def run_import(self, *args):
+        call_command(
+            'import_audio', self.project.id, self.source, '--workers', '1',
+            '--state-file', os.path.join(self.tmp, 'state'), *args, stdout=io.StringIO(), stderr=io.StringIO(),
+        )
+
+    def test_annotate_warms_the_cache_under_the_stored_path(self):
+        # Annotation itself runs in threads, which the in-memory test database cannot share
+        with mock.patch('annotation.management.commands.import_audio.auto_annotate_file') as annotate:
+            self.run_import('--annotate')
+        self.assertEqual(annotate.call_count, 2)
+        imported = AudioFile.objects.exclude(pk=self.task.audio_file_id)
+        self.assertEqual(imported.count(), 2)
+        for af in imported:
+            self.assertIsNotNone(audio._lookup(af.file.path, audio.MODEL_SAMPLE_RATE))
+
+    def test_failed_batch_leaves_no_rows_and_releases_its_files(self):
+        with mock.patch.object(Task.objects, 'bulk_create', side_effect=RuntimeError('boom')), \
+                self.assertRaises(RuntimeError):
+            self.run_import()
+        self.assertEqual(AudioFile.objects.count(), 1)
+        self.assertEqual(storage.sweep(grace=0), 2)
+
+        self.run_import()  # nothing was recorded as done, so a rerun imports both
+        self.assertEqual(AudioFile.objects.count(), 3)
+
+
+    def test_no_optimize_overrides_the_project_setting(self):
+        self.project.optimize = True
+        self.project.save()
+        self.run_import('--no-optimize')
+        imported = AudioFile.objects.exclude(pk=self.task.audio_file_id)
+        self.assertEqual([af.optimized for af in imported], [False, False])
+        self.assertFalse(Task.objects.filter(audio_file__in=imported, start_offset__isnull=False).exists())
+
+    @override_settings(NEAR_DUPLICATE_REUSE_ANNOTATIONS=True)
+    def test_files_already_in_the_library_are_linked_and_reuse_labels(self):
+        self.run_import()
+        originals = list(AudioFile.objects.exclude(pk=self.task.audio_file_id))
+        Annotation.objects.create(task=originals[0].tasks.get(), label=self.label, start_time=1.0, end_time=2.0)
+
+        os.remove(os.path.join(self.tmp, 'state'))
+        self.run_import()
+        for original in originals:
+            duplicate = AudioFile.objects.exclude(pk=original.pk).get(content_hash=original.content_hash)
+            self.assertEqual((duplicate.duplicate_of_id, duplicate.duplicate_offset), (original.pk, 0.0))
+        reused = Annotation.objects.filter(task__audio_file__duplicate_of=originals[0])
+        self.assertEqual([(a.label_id, a.start_time, a.end_time) for a in reused], [(self.label.id, 1.0, 2.0)])
+
+
+class ProbeMetadataTests(TempMediaMixin, SimpleTestCase):
+    def test_wav_header(self):
+        path = os.path.join(self.tmp, 'stereo.wav')
+        sf.write(path, np.zeros((22050 * 3, 2), dtype=np.float32), 22050, subtype='PCM_24')
+        self.assertEqual(audio.probe_metadata(path), {
+            'duration': 3.0, 'sample_rate': 22050, 'channels': 2, 'codec': 'pcm_24',
+        })
+
+    def test_flac_header(self):
+        path = os.path.join(self.tmp, 'mono.flac')
+        sf.write(path, np.zeros(48000 // 2, dtype=np.float32), 48000)
+        metadata = audio.probe_metadata(path)
+        self.assertEqual((metadata['sample_rate'], metadata['channels']), (48000, 1))
+        self.assertAlmostEqual(metadata['duration'], 0.5)
+
+    @unittest.skipUnless(shutil.which('ffmpeg') and shutil.which('ffprobe'), "ffmpeg and ffprobe required")
+    def test_compressed_formats_are_probed_without_decoding(self):
+        for ext, codec in (('.ogg', 'vorbis'), ('.mp3', 'mp3')):
+            path = os.path.join(self.tmp, 'tone' + ext)
+            subprocess.run(
+                ['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'sine=frequency=440:duration=2', '-ar', '44100', path],
+                check=True,
+            )
+            with mock.patch('librosa.load') as load:
+                metadata = audio.probe_metadata(path)
+            load.assert_not_called()
+            self.assertEqual((metadata['sample_rate'], metadata['channels'], metadata['codec']), (44100, 1, codec))
+            self.assertAlmostEqual(metadata['duration'], 2.0, delta=0.1)
+
+
+class PeaksAnalyzerTests(SimpleTestCase):
+    def run_peaks(self, samples, sample_rate=1000):
+        analyzer = analysis.PeaksAnalyzer(sample_rate, 1)
+        for start in range(0, len(samples), 4096):
+            analyzer.process(samples[start:start + 4096, np.newaxis])
+        return analyzer.result()
+
+    def test_short_file_keeps_10ms_peaks(self):
+        samples = np.zeros(1000, dtype=np.float32)
+        samples[505] = -0.5
+        result = self.run_peaks(samples)
+        self.assertEqual(result['interval'], 0.01)
+        self.assertEqual(len(result['peaks']), 100)
+        self.assertEqual(result['peaks'][50], 0.5)
+
+    @override_settings(INGEST_PEAKS_MAX_POINTS=100)
+    def test_long_file_is_max_pooled(self):
+        samples = np.zeros(60 * 1000 + 5, dtype=np.float32)  # 6000.5 frames of 10 ms
+        samples[59 * 1000] = 0.75
+        result = self.run_peaks(samples)
+        self.assertLessEqual(len(result['peaks']), 100)
+        self.assertEqual(result['interval'], 0.61)
+        self.assertEqual(max(result['peaks']), 0.75)
+        self.assertEqual(result['peaks'][int(59 / result['interval'])], 0.75)
+
+
+def tone_bursts(seconds, sample_rate, seed=0):
+    """Random short tones, distinctive enough to fingerprint."""
+    rng = np.random.default_rng(seed)
+    samples = np.zeros(int(seconds * sample_rate), dtype=np.float32)
+    t = 0.0
+    while t < seconds:
+        length = rng.uniform(0.1, 0.6)
+        n = int(length * sample_rate)
+        tone = 0.3 * np.sin(2 * np.pi * rng.uniform(200, 3500) * np.arange(n) / sample_rate) * np.hanning(n)
+        start = int(t * sample_rate)
+        samples[start:start + n] += tone[:len(samples) - start]
+        t += length * rng.uniform(0.5, 1.2)
+    return samples
+
+
+class FingerprintTests(TempMediaMixin, AnnotationFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.samples = tone_bursts(30.0, 16000)
+        self.original = self.ingest('original.wav', self.samples)
+
+    def ingest(self, name, samples, sample_rate=16000):
+        buffer = io.BytesIO()
+        sf.write(buffer, samples, sample_rate, format='WAV')
+        return ingest.ingest_upload(self.project, SimpleUploadedFile(name, buffer.getvalue()), model_type='others')
+
+    def test_trimmed_resampled_copy_is_detected_with_its_offset(self):
+        trimmed = librosa.resample(self.samples[int(7.3 * 16000):int(25 * 16000)], orig_sr=16000, target_sr=22050)
+        with override_settings(FINGERPRINT_QUERY_LANDMARKS=100):
+            copy = self.ingest('trimmed.wav', trimmed, sample_rate=22050)
+        self.assertEqual(copy.duplicate_of_id, self.original.id)
+        self.assertAlmostEqual(copy.duplicate_offset, 7.3, delta=0.05)
+
+    def test_byte_identical_copy_is_indexed_and_linked(self):
+        copy = self.ingest('again.wav', self.samples)
+        self.assertEqual(copy.content_hash, self.original.content_hash)
+        self.assertEqual(copy.duplicate_of_id, self.original.id)
+        self.assertEqual(copy.duplicate_offset, 0.0)
+        self.assertGreater(copy.fingerprints.count(), 0)
+        self.assertEqual(fingerprint.stored_landmarks(copy.id), fingerprint.stored_landmarks(self.original.id))
+        self.assertEqual(copy.analysis.results['fingerprint']['landmark_count'], copy.fingerprints.count())
+
+    def test_unrelated_audio_is_not_a_duplicate(self):
+        other = self.ingest('other.wav', tone_bursts(30.0, 16000, seed=5))
+        self.assertIsNone(other.duplicate_of_id)
+
+    def test_peaks_are_picked_the_same_block_by_block(self):
+        def landmarks(block_frames):
+            analyzer = fingerprint.FingerprintAnalyzer(16000, 1)
+            with mock.patch.object(fingerprint, 'PEAK_BLOCK_FRAMES', block_frames):
+                for i in range(0, len(self.samples), 5000):
+                    analyzer.process(self.samples[i:i + 5000, np.newaxis])
+                return analyzer.result()['landmarks']
+
+        pairs = landmarks(32)
+        self.assertEqual(pairs, landmarks(10 ** 6))
+        self.assertLess(max(h for h, _ in pairs), 2 ** 31)
+
+    def test_chance_collisions_do_not_make_a_duplicate(self):
+        pairs = fingerprint.stored_landmarks(self.original.id)
+        other = AudioFile.objects.create(project=self.project, file='audio/other.wav')
+        rng = np.random.default_rng(0)
+        Fingerprint.objects.bulk_create(
+            Fingerprint(audio_file=other, hash=h, offset=int(rng.integers(0, 100000))) for h, _ in pairs
+        )
+        matches = fingerprint.find_duplicates(pairs)
+        self.assertEqual([audio_file_id for audio_file_id, _, _ in matches], [self.original.id])
+        self.assertEqual(matches[0][1], 0.0)
+
+    def test_lookups_sample_long_files_evenly(self):
+        pairs = [[i, i] for i in range(10000)]
+        sampled = fingerprint.sample_landmarks(pairs, 100)
+        self.assertEqual(len(sampled), 100)
+        self.assertEqual((sampled[0][1], sampled[1][1], sampled[-1][1]), (0, 100, 9900))
+        self.assertEqual(fingerprint.sample_landmarks(pairs[:50], 100), pairs[:50])
+
+
+class ChunkingTests(SimpleTestCase):
+    def test_cut_points(self):
+        self.assertEqual(ingest.cut_points(0.0), [])
+        self.assertEqual(ingest.cut_points(None), [])
+        self.assertEqual(ingest.cut_points(12.0), [(0.0, True), (12.0, True)])
+        self.assertEqual(ingest.cut_points(30.5), [(0.0, True), (30.5, True)])
+        self.assertEqual(ingest.cut_points(70.0), [(0.0, True), (30.0, False), (60.0, False), (70.0, True)])
+        # A 2 second tail is merged into the chunk before it
+        self.assertEqual(ingest.cut_points(62.0), [(0.0, True), (30.0, False), (62.0, True)])
+        self.assertEqual(ingest.chunk_ranges(62.0), [(0.0, 30.0), (30.0, 32.0)])
+
+    def test_cuts_snap_into_nearby_silence(self):
+        cuts = ingest.cut_points(70.0, silences=[[27.0, 28.0], [40.0, 45.0]])
+        self.assertEqual(cuts, [(0.0, True), (27.9, True), (57.9, False), (70.0, True)])
+
+    def test_stitch_merges_touching_same_label_events(self):
+        events = [
+            {'start_time': 31.0, 'end_time': 33.0, 'label': 'Speech'},
+            {'start_time': 28.0, 'end_time': 30.0, 'label': 'Speech'},
+            {'start_time': 30.01, 'end_time': 31.5, 'label': 'Speech'},
+            {'start_time': 29.0, 'end_time': 32.0, 'label': 'Music'},
+            {'start_time': 40.0, 'end_time': 41.0, 'label': 'Speech'},
+        ]
+        self.assertEqual(ingest.stitch(events), [
+            {'start_time': 28.0, 'end_time': 33.0, 'label': 'Speech'},
+            {'start_time': 29.0, 'end_time': 32.0, 'label': 'Music'},
+            {'start_time': 40.0, 'end_time': 41.0, 'label': 'Speech'},
+        ])
+
+    def test_distribute_clips_events_into_overlapping_chunks(self):
+        tasks = [Task(start_offset=0.0, duration=30.0), Task(start_offset=30.0, duration=25.0)]
+        annotations = ingest.distribute([
+            {'start_time': 5.0, 'end_time': 6.0, 'label': 'Dog'},
+            {'start_time': 28.0, 'end_time': 33.5, 'label': 'Speech'},
+            {'start_time': 40.0, 'end_time': 50.0, 'label': 'Silence'},
+        ], tasks)
+        self.assertEqual(
+            [(tasks.index(a.task), a.model_label, a.start_time, a.end_time) for a in annotations],
+            [(0, 'Dog', 5.0, 6.0), (0, 'Speech', 28.0, 30.0), (1, 'Speech', 0.0, 3.5)],
+        )
@@ -0,0 +1,244 @@
+"""Resumable uploads: chunks are appended at explicit byte offsets to an
+assembly file under MEDIA_ROOT, then finalized into content-addressed storage
+and ingested into a project.
+
+Each chunk is first received into its own temporary file, so the Upload row
+is locked only while the offset is checked, the chunk appended and the
+offset advanced.  The header is probed as soon as enough bytes are present,
+so a bad file is rejected early.  After that every append hashes the new
+bytes and, for WAV, runs the ingest analyzers over the new frames, so
+finalizing only has to finish the tail.  That progress is kept per process
+(a SHA-256 state cannot be stored), and a process that did not see earlier
+chunks catches up from the assembly file.  The Upload is deleted only once
+its file is ingested, so a failed finalize can be retried.  Uploads
+untouched for ``UPLOAD_EXPIRY_SECONDS`` are removed by :func:`expire`.
+"""
+import glob
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+import soundfile as sf
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import analysis, audio, storage
+from .ingest import ingest_stored
+from .models import Upload
+
+PROBE_AFTER_BYTES = 256 * 1024
+COPY_BLOCK_SIZE = 1024 * 1024
+ANALYZE_EXTENSIONS = ('.wav',)  # decodable while incomplete; other formats are analyzed on finalize
+TRACKED_UPLOADS = 16
+
+_progress = OrderedDict()
+_progress_lock = threading.Lock()
+
+
+class OffsetMismatch(Exception):
+    def __init__(self, expected):
+        super().__init__(f"Expected offset {expected}")
+        self.expected = expected
+
+
+class InvalidAudio(Exception):
+    pass
+
+
+class Finalizing(Exception):
+    pass
+
+
+class _Progress:
+    """The bytes hashed and frames analyzed of one upload in this process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hasher = hashlib.sha256()
+        self.hashed = 0
+        self.analysis = None
+        self.frames = 0
+        self.analyzable = True
+
+    def advance(self, path, end, analyze):
+        """Hash the assembly file up to byte ``end`` and, when ``analyze``, analyze the frames it holds."""
+        with open(path, 'rb') as f:
+            f.seek(self.hashed)
+            while self.hashed < end:
+                block = f.read(min(COPY_BLOCK_SIZE, end - self.hashed))
+                if not block:
+                    break
+                self.hasher.update(block)
+                self.hashed += len(block)
+        if analyze and self.analyzable:
+            try:
+                with sf.SoundFile(path) as f:
+                    if self.analysis is None:
+                        self.analysis = analysis.AnalysisPass(f.samplerate, f.channels)
+                    f.seek(self.frames)
+                    self.frames += self.analysis.run(
+                        f.blocks(blocksize=audio.BLOCK_FRAMES, dtype='float32', always_2d=True)
+                    )
+            except RuntimeError:
+                # Not readable until complete (soundfile's errors are RuntimeErrors); ingest analyzes it instead
+                self.analysis, self.analyzable = None, False
+
+
+def _tracked(upload):
+    """This process's progress on ``upload``; the least recently used are forgotten beyond ``TRACKED_UPLOADS``."""
+    with _progress_lock:
+        progress = _progress.pop(upload.pk, None) or _Progress()
+        _progress[upload.pk] = progress
+        while len(_progress) > TRACKED_UPLOADS:
+            _progress.popitem(last=False)
+    return progress
+
+
+def _forget(upload):
+    with _progress_lock:
+        _progress.pop(upload.pk, None)
+
+
+def _analyzes_early(upload):
+    return os.path.splitext(upload.filename)[1].lower() in ANALYZE_EXTENSIONS
+
+
+def _uploads_dir():
+    directory = os.path.join(settings.MEDIA_ROOT, storage.AUDIO_DIR, 'uploads')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def assembly_path(upload):
+    # Keep the real extension last so the header probe recognises the format
+    return os.path.join(_uploads_dir(), f"{upload.id}.part{os.path.splitext(upload.filename)[1].lower()}")
+
+
+def create_upload(filename, size):
+    upload = Upload.objects.create(filename=os.path.basename(filename), size=size)
+    open(assembly_path(upload), 'wb').close()
+    return upload
+
+
+def append_chunk(upload_id, offset, stream):
+    """Append the bytes of ``stream`` at ``offset``; return the updated Upload."""
+    upload = Upload.objects.get(pk=upload_id)
+    if offset != upload.offset:
+        raise OffsetMismatch(upload.offset)  # fail before receiving the body
+
+    fd, chunk_path = tempfile.mkstemp(prefix=f"{upload.id}.", suffix='.chunk', dir=_uploads_dir())
+    try:
+        written = 0
+        with os.fdopen(fd, 'wb') as f:
+            for block in iter(lambda: stream.read(COPY_BLOCK_SIZE), b''):
+                if offset + written + len(block) > upload.size:
+                    raise ValueError("Chunk runs past the declared upload size")
+                f.write(block)
+                written += len(block)
+
+        with transaction.atomic():
+            upload = Upload.objects.select_for_update().get(pk=upload_id)
+            if offset != upload.offset:
+                raise OffsetMismatch(upload.offset)  # another request appended meanwhile
+            if upload.finalizing:
+                raise Finalizing("Upload is being finalized")
+            path = assembly_path(upload)
+            with open(path, 'r+b') as f, open(chunk_path, 'rb') as chunk:
+                f.seek(offset)
+                f.truncate()  # drop bytes from an interrupted earlier attempt
+                shutil.copyfileobj(chunk, f, COPY_BLOCK_SIZE)
+            previous, upload.offset = upload.offset, upload.offset + written
+            upload.save(update_fields=['offset', 'updated_at'])
+    finally:
+        os.remove(chunk_path)
+
+    # Validate the header once, as soon as enough of the file is here
+    header_at = min(PROBE_AFTER_BYTES, upload.size)
+    if previous < header_at <= upload.offset:
+        _check_header(upload, path)
+    if header_at <= upload.offset:
+        # Committed bytes never change, so hashing and analysis can run ahead of finalize
+        progress = _tracked(upload)
+        with progress.lock:
+            progress.advance(path, upload.offset, _analyzes_early(upload))
+    return upload
+
+
+def _check_header(upload, path):
+    try:
+        audio.probe_sample_rate(path)
+    except (subprocess.CalledProcessError, RuntimeError, ValueError, IndexError, OSError):
+        discard(upload)
+        raise InvalidAudio(f"{upload.filename} does not look like an audio file")
+
+
+def finalize(upload_id, project):
+    """Move a complete upload into storage and ingest it into ``project``; return the AudioFile."""
+    with transaction.atomic():
+        upload = Upload.objects.select_for_update().get(pk=upload_id)
+        if not upload.is_complete:
+            raise OffsetMismatch(upload.offset)
+        if upload.finalizing:
+            raise Finalizing("Upload is already being finalized")
+        upload.finalizing = True
+        upload.save(update_fields=['finalizing', 'updated_at'])
+
+    path = assembly_path(upload)
+    name = None
+    try:
+        progress = _tracked(upload)
+        with progress.lock:
+            progress.advance(path, upload.size, _analyzes_early(upload))
+            content_hash = progress.hasher.hexdigest()
+            analyzed = progress.analysis.finish() if progress.analysis is not None else None
+        _forget(upload)  # finish() ends the pass; a retry starts over
+
+        ext = os.path.splitext(upload.filename)[1]
+        name, content_hash = storage.store_assembled(path, ext, content_hash=content_hash)
+        af = ingest_stored(project, name, content_hash, project.optimize, project.model_type, analyzed)
+    except Exception:
+        # Keep the upload so the client can finalize it again
+        if name is not None:
+            storage.release(name)
+        Upload.objects.filter(pk=upload.pk).update(finalizing=False)
+        raise
+    discard(upload)
+    return af
+
+
+def discard(upload):
+    _forget(upload)
+    path = assembly_path(upload)
+    if os.path.exists(path):
+        os.remove(path)
+    upload.delete()
+
+
+def expire(max_age=None):
+    """Discard uploads not appended to for ``max_age`` seconds, and stray chunk files as old; return how many uploads."""
+    if max_age is None:
+        max_age = settings.UPLOAD_EXPIRY_SECONDS
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    expired = 0
+    for upload in Upload.objects.filter(updated_at__lt=cutoff):
+        discard(upload)
+        expired += 1
+
+    # Assembly files whose Upload row is gone, and chunks left by killed requests
+    live = {str(pk) for pk in Upload.objects.values_list('pk', flat=True)}
+    for path in glob.glob(os.path.join(_uploads_dir(), '*')):
+        upload_id = os.path.basename(path).split('.', 1)[0]
+        try:
+            stale = os.path.getmtime(path) < cutoff.timestamp()
+        except FileNotFoundError:
+            continue
+        if stale and (upload_id not in live or path.endswith('.chunk')):
+            os.remove(path)
+    return expired
@@ -16,6 +16,11 @@ urlpatterns = [
     path('projects/update/<int:pk>/', views.update_project, name='project-update'),
     path('projects/delete/<int:pk>/', views.delete_project, name='project-delete'),
 
+    # ----------- RESUMABLE UPLOAD ROUTES -----------
+    path('uploads/', views.create_upload, name='upload-create'),
+    path('uploads/<uuid:upload_id>/', views.upload_detail, name='upload-detail'),
+    path('uploads/<uuid:upload_id>/finalize/', views.finalize_upload, name='upload-finalize'),
+
     # ----------- SUPER PROJECT ROUTES -----------
     path('superprojects/', views.list_super_projects, name='superproject-list'),
     path('superprojects/create/', views.create_super_project, name='superproject-create'),
@@ -27,10 +32,12 @@ urlpatterns = [
     path('tasks/', views.get_tasks, name='task-list'),
     path('tasks/project/<int:project_id>/', views.get_tasks_for_project, name='tasks-for-project'),
     path('task/<int:task_id>/', views.get_task, name='task-detail'),
+    path('task/<int:task_id>/audio/', views.get_task_audio, name='task-audio'),
 
     # ----------- ANNOTATION ROUTES -----------
     path('tasks/<int:task_id>/annotations/', views.get_annotations, name='get-annotations'),
     path('tasks/<int:task_id>/save_annotations/', views.save_annotations, name='save-annotations'),
+    path('tasks/<int:task_id>/annotations/batch/', views.annotation_operations, name='annotation-operations'),
     path('annotations/delete/<int:annotation_id>/', views.delete_annotation, name='delete-annotation'),
 
     # ----------- EXPORT ROUTES -----------
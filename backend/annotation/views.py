@@ -4,68 +4,54 @@ import tempfile
 import shutil 
 import zipfile
 import random
-import subprocess
 import librosa
 import numpy as np
 import io
 import soundfile as sf
 import traceback
+from collections import defaultdict
 
-from rest_framework.decorators import api_view, parser_classes
+from rest_framework.decorators import api_view, parser_classes, renderer_classes
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.renderers import JSONRenderer, BrowsableAPIRenderer
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse, FileResponse  
+from django.http import JsonResponse, FileResponse
 
-from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
 from django.contrib.auth import authenticate
-from pydub import AudioSegment
 
 from .models import (
     User, Project, AudioFile, Task, Annotation, AnnotationAttributeValue,
-    Label, Attribute, AttributeValue, SuperProject
+    Label, Attribute, AttributeValue, SuperProject, Upload
 )
 from .serializers import (
-    UserSerializer, ProjectSerializer, TaskSerializer,
-    AnnotationSerializer, SuperProjectSerializer
+    UserSerializer, ProjectSerializer, TaskSerializer, TaskListSerializer,
+    AnnotationSerializer, SuperProjectSerializer, AudioFileSerializer
 )
-
-
-BASE_ANNOTATION_DIR = os.path.join(os.path.dirname(__file__), 'auto_annotation')
-
-#----------------------AUTO ANNOTATION-----------------------
-
-
-def run_beats_model(audio_path):
-    script_path = os.path.join(BASE_ANNOTATION_DIR, 'beats', 'annotate.py')
-    result = subprocess.run(['python', script_path, audio_path], capture_output=True, text=True)
-
-    # Always print both stdout and stderr for debugging
-    print("BEATs stdout:", result.stdout)
-    print("BEATs stderr:", result.stderr)
-
-    if result.returncode != 0:
-        print("BEATs annotation error (non-zero exit code):", result.stderr)
-        return []
-
-    if not result.stdout.strip():
-        print("BEATs annotation error: Empty stdout")
-        return []
-
-    try:
-        return json.loads(result.stdout.strip())
-    except json.JSONDecodeError as e:
-        print("JSON decode error:", e)
-        return []
-
-def run_yamnet_model(audio_path):
-    script_path = os.path.join(BASE_ANNOTATION_DIR, 'yamnet', 'annotate.py')
-    result = subprocess.run(['python', script_path, audio_path], capture_output=True, text=True)
-    if result.returncode != 0:
-        print("YAMNet annotation error:", result.stderr)
-        return []
-    return json.loads(result.stdout.strip())
+from .ingest import auto_annotate_file, ingest_upload
+from .columnar import ColumnarJSONRenderer, encode as columnar_encode
+from .pagination import paginated_response, wants
+from .edits import OperationError, apply_operations, bump_version, replace_annotations
+from . import audio, uploads
+
+
+# ---------------------- EXPORT HELPERS ----------------------
+
+def copy_task_audio(task, dest_dir):
+    """Place the task's audio in ``dest_dir`` for export and return its file name."""
+    audio_path = task.audio_file.file.path
+    if task.is_virtual:
+        base = os.path.splitext(os.path.basename(audio_path))[0]
+        audio_filename = f"{base}_{task.start_offset:g}s.wav"
+        audio.write_clip(task.audio_file, task.start_offset, task.start_offset + task.duration,
+                         os.path.join(dest_dir, audio_filename))
+    else:
+        audio_filename = os.path.basename(audio_path)
+        shutil.copy(audio_path, os.path.join(dest_dir, audio_filename))
+    return audio_filename
 
 
 # ---------------------- AUTHENTICATION ----------------------
@@ -73,8 +59,10 @@ def run_yamnet_model(audio_path):
 @api_view(['GET'])
 def get_users(request):
     users = User.objects.all()
-    serializer = UserSerializer(users, many=True)
-    return Response(serializer.data)
+    role = request.GET.get('role')
+    if role:
+        users = users.filter(role=role)
+    return paginated_response(request, users, UserSerializer)
 
 
 @api_view(['POST'])
@@ -156,63 +144,89 @@ def create_project(request):
     degree = int(data.get('degree', 1))
     model_type = data.get('model_type')
 
-    def auto_annotate(task, file_path):
-        if model_type == 'beats':
-            predictions = run_beats_model(file_path)
-        elif model_type == 'yamnet':
-            predictions = run_yamnet_model(file_path)
-        else:
-            return  # Skip for "others"
-
-        for pred in predictions:
-            # Check if the model label is 'silence'
-            if pred['label'].lower() == 'silence':
-                continue  # Skip creating annotation for 'silence'
-
-            # Create annotation for valid labels
-            Annotation.objects.create(
-                task=task,
-                model_label=pred['label'],
-                start_time=pred['start_time'],
-                end_time=pred['end_time']
-            )
-
-    if optimize:
-        for f in request.FILES.getlist('audio_files'):
-            temp_path = os.path.join(tempfile.gettempdir(), f.name)
-            with open(temp_path, 'wb+') as dest:
-                for chunk in f.chunks():
-                    dest.write(chunk)
-
-            audio = AudioSegment.from_file(temp_path)
-            chunk_length = 30000  # 30 seconds
-
-            for i, start in enumerate(range(0, len(audio), chunk_length)):
-                chunk = audio[start:start + chunk_length]
-                chunk_name = f"{os.path.splitext(f.name)[0]}_{i}.wav"
-                chunk_path = os.path.join(settings.MEDIA_ROOT, 'audio', chunk_name)
-                os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
-                chunk.export(chunk_path, format="wav")
-
-                rel_path = os.path.relpath(chunk_path, settings.MEDIA_ROOT)
-                af = AudioFile.objects.create(project=project, file=rel_path, optimized=True)
-                task = Task.objects.create(project=project, audio_file=af)
-
-                auto_annotate(task, os.path.join(settings.MEDIA_ROOT, rel_path))
-
-            os.remove(temp_path)
-
-    else:
-        for f in request.FILES.getlist('audio_files'):
-            af = AudioFile.objects.create(project=project, file=f)
-            task = Task.objects.create(project=project, audio_file=af)
-
-            full_path = os.path.join(settings.MEDIA_ROOT, af.file.name)
-            auto_annotate(task, full_path)
+    for f in request.FILES.getlist('audio_files'):
+        try:
+            ingest_upload(project, f, optimize=optimize, model_type=model_type)
+        except Exception as e:
+            traceback.print_exc()
+            return Response({'error': f'Failed to ingest {f.name}', 'details': str(e)},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     result = ProjectSerializer(project, context={'request': request})
     return Response(result.data, status=status.HTTP_201_CREATED)
 
+# ---------------------- RESUMABLE UPLOAD VIEWS ----------------------
+
+@api_view(['POST'])
+def create_upload(request):
+    """Start a resumable upload of ``size`` bytes."""
+    filename = request.data.get('filename')
+    try:
+        size = int(request.data.get('size'))
+    except (TypeError, ValueError):
+        size = None
+    if not filename or size is None or size <= 0:
+        return Response({'error': 'filename and a positive size are required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    upload = uploads.create_upload(filename, size)
+    return Response({'id': str(upload.id), 'offset': upload.offset, 'size': upload.size},
+                    status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET', 'PUT', 'DELETE'])
+def upload_detail(request, upload_id):
+    """GET the received offset, PUT raw bytes at ``Upload-Offset``, or DELETE the upload."""
+    try:
+        upload = Upload.objects.get(pk=upload_id)
+    except Upload.DoesNotExist:
+        return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    if request.method == 'DELETE':
+        uploads.discard(upload)
+        return Response({'message': 'Upload discarded'}, status=status.HTTP_200_OK)
+
+    if request.method == 'PUT':
+        offset = request.headers.get('Upload-Offset', request.GET.get('offset'))
+        try:
+            offset = int(offset)
+        except (TypeError, ValueError):
+            return Response({'error': 'Upload-Offset header required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            upload = uploads.append_chunk(upload.pk, offset, request.stream or io.BytesIO())
+        except uploads.OffsetMismatch as e:
+            return Response({'error': str(e), 'offset': e.expected}, status=status.HTTP_409_CONFLICT)
+        except uploads.Finalizing as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        except uploads.InvalidAudio as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({'id': str(upload.id), 'offset': upload.offset, 'size': upload.size})
+
+
+@api_view(['POST'])
+def finalize_upload(request, upload_id):
+    """Attach a completed upload to a project, creating its AudioFile and Tasks."""
+    try:
+        project = Project.objects.get(pk=request.data.get('project_id'))
+    except (Project.DoesNotExist, ValueError, TypeError):
+        return Response({'error': 'Project not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        af = uploads.finalize(upload_id, project)
+    except Upload.DoesNotExist:
+        return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+    except uploads.OffsetMismatch as e:
+        return Response({'error': 'Upload is incomplete', 'offset': e.expected}, status=status.HTTP_409_CONFLICT)
+    except uploads.Finalizing as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+
+    data = AudioFileSerializer(af, context={'request': request}).data
+    data['task_ids'] = list(af.tasks.values_list('id', flat=True))
+    return Response(data, status=status.HTTP_201_CREATED)
+
+
 @api_view(['GET'])
 def get_project(request, pk):
     try:
@@ -259,33 +273,15 @@ def update_project(request, pk):
 
         # 🔄 Only if model_type changed
         if new_model_type != old_model_type:
-            def auto_annotate(task, file_path):
-                if new_model_type == 'beats':
-                    predictions = run_beats_model(file_path)
-                elif new_model_type == 'yamnet':
-                    predictions = run_yamnet_model(file_path)
-                else:
-                    return  # Skip if "others"
-
-                for pred in predictions:
-                    # Skip creating annotation for 'silence' label
-                    if pred['label'].lower() == 'silence':
-                        continue  # Skip creating annotation for 'silence'
-
-                    # Create annotation for valid labels
-                    Annotation.objects.create(
-                        task=task,
-                        start_time=pred['start_time'],
-                        end_time=pred['end_time'],
-                        model_label=pred['label'],  # model_label used here
-                    )
-            for task in updated_project.tasks.all():
-                # 🧹 Delete existing model-based annotations
-                task.annotations.filter(model_label__isnull=False).delete()
-                # 🧠 Auto-annotate if model_type is valid
-                if new_model_type in ['beats', 'yamnet']:
-                    full_audio_path = os.path.join(settings.MEDIA_ROOT, task.audio_file.file.name)
-                    auto_annotate(task, full_audio_path)
+            # 🧹 Delete existing model-based annotations
+            Annotation.objects.filter(task__project=updated_project, model_label__isnull=False).delete()
+            bump_version(updated_project.tasks.all())
+            # 🧠 Auto-annotate if model_type is valid, one file at a time so chunks are stitched
+            tasks_by_file = defaultdict(list)
+            for task in updated_project.tasks.select_related('audio_file'):
+                tasks_by_file[task.audio_file_id].append(task)
+            for tasks in tasks_by_file.values():
+                auto_annotate_file(tasks, new_model_type)
 
         return Response(ProjectSerializer(updated_project, context={'request': request}).data)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -302,8 +298,13 @@ def list_projects(request):
     else:
         projects = Project.objects.all()
 
-    serializer = ProjectSerializer(projects, many=True, context={'request': request})
-    return Response(serializer.data)
+    # Only fetch the nested rows the client asked for: one query per relation per page.
+    # Labels come from the cached schemas (see ProjectListSerializer).
+    if wants(request, 'audio_files'):
+        projects = projects.prefetch_related('audio_files')
+    if wants(request, 'assigned_annotators'):
+        projects = projects.prefetch_related('assigned_annotators')
+    return paginated_response(request, projects, ProjectSerializer)
 
 
 @api_view(['DELETE'])
@@ -359,8 +360,9 @@ def list_super_projects(request):
         sps = SuperProject.objects.filter(manager_id=manager_id)
     else:
         sps = SuperProject.objects.all()
-    serializer = SuperProjectSerializer(sps, many=True)
-    return Response(serializer.data)
+    if wants(request, 'annotators'):
+        sps = sps.prefetch_related('annotators')
+    return paginated_response(request, sps, SuperProjectSerializer)
 
 
 @api_view(['DELETE'])
@@ -391,8 +393,7 @@ def get_tasks(request):
     if status_filter:
         tasks = tasks.filter(status=status_filter)
 
-    serializer = TaskSerializer(tasks, many=True)
-    return Response(serializer.data)
+    return paginated_response(request, tasks.select_related('project', 'audio_file'), TaskListSerializer)
 
 
 @api_view(['GET'])
@@ -402,141 +403,189 @@ def get_tasks_for_project(request, project_id):
     except Project.DoesNotExist:
         return Response({'error': 'Project not found'}, status=404)
 
-    tasks = project.tasks.all()
-    serializer = TaskSerializer(tasks, many=True)
-    return Response(serializer.data)
+    tasks = project.tasks.select_related('project', 'audio_file')
+    return paginated_response(request, tasks, TaskListSerializer)
 
 
 @api_view(['GET'])
 def get_task(request, task_id):
     """Get full task detail (audio, project, labels)."""
     try:
-        task = Task.objects.get(pk=task_id)
+        task = Task.objects.select_related('project', 'audio_file').get(pk=task_id)
         serializer = TaskSerializer(task, context={'request': request})
         return Response(serializer.data)
     except Task.DoesNotExist:
         return Response({'error': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+def get_task_audio(request, task_id):
+    """Serve the audio of a task, reading only its range for virtual chunks."""
+    try:
+        task = Task.objects.select_related('audio_file').get(pk=task_id)
+    except Task.DoesNotExist:
+        return JsonResponse({"error": "Task not found"}, status=404)
+
+    if not task.is_virtual:
+        return FileResponse(task.audio_file.file.open('rb'))
+
+    path = audio.clip_path(task.audio_file, task.start_offset, task.duration)
+    return FileResponse(open(path, 'rb'), content_type='audio/wav')
+
 
 @api_view(['POST'])
 def save_annotations(request, task_id):
-    """Save user annotations for a given task."""
+    """Save user annotations for a given task.
+
+    The posted list replaces the task's annotations; only the rows that
+    differ from what is stored are written (see edits.replace_annotations).
+    """
     try:
         task = Task.objects.get(pk=task_id)
         data = request.data
 
-        # Clear only user-created annotations (annotations where model_label is null)
-        # and that are not model-generated (no model_label).
-        # task.annotations.filter(model_label__isnull=True).delete()
-        Annotation.objects.filter(task=task).delete()
-
-        annotations = data.get('annotations', [])
-        
-        # Save or update user annotations
-        for ann in annotations:
-            label = None
-            print(ann.get('label_id'))
-            if ann.get('label_id'):
-                label = Label.objects.filter(pk=ann['label_id']).first()
-
-            # Check if it's an update (annotation_id exists) or a new one
-            annotation = None
-            if ann.get('annotation_id'):
-                # Ensure annotation_id is cast to an integer (if passed as a string from frontend)
-                annotation_id = int(ann['annotation_id'])
-                annotation = Annotation.objects.filter(pk=annotation_id, model_label__isnull=True).first()
-
-                if annotation:
-                    # Update existing annotation
-                    annotation.label = label
-                    annotation.start_time = ann['start_time']
-                    annotation.end_time = ann['end_time']
-                    annotation.model_label = ann.get('model_label')  # optional
-                    annotation.save()
-                else:
-                    # If no matching annotation found for update, create a new one
-                    print('hi')
-                    annotation = Annotation.objects.create(
-                        task=task,
-                        label=label,
-                        model_label=ann.get('model_label'),
-                        start_time=ann['start_time'],
-                        end_time=ann['end_time']
-                    )
-            else:
-                # Create new annotation if no annotation_id provided
-                print(ann.get('label_id'))
-                annotation = Annotation.objects.create(
-                    task=task,
-                    label=label,
-                    start_time=ann['start_time'],
-                    end_time=ann['end_time'],
-                    model_label=ann['model_label']
-                )
+        with transaction.atomic():
+            created, updated, deleted = replace_annotations(task, data.get('annotations', []))
 
+            # Optional: Update task status if provided in the request
+            task.status = data.get('status', 'In Progress')
+            task.save(update_fields=['status'])
 
-            # Add attributes to the annotation
-            for attr in ann.get('attributes', []):
-                attr_obj = Attribute.objects.filter(pk=attr['attribute_id']).first()
-                val_obj = AttributeValue.objects.filter(pk=attr['value_id']).first()
-                if attr_obj and val_obj:
-                    AnnotationAttributeValue.objects.create(
-                        annotation=annotation,
-                        attribute=attr_obj,
-                        value=val_obj
-                    )
+        return Response({
+            'message': 'Annotations saved successfully',
+            'created': created,
+            'updated': updated,
+            'deleted': deleted,
+        }, status=status.HTTP_200_OK)
 
-        # Optional: Update task status if provided in the request
-        task.status = data.get('status', 'In Progress')
-        task.save()
+    except Task.DoesNotExist:
+        return Response({'error': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response({'message': 'Annotations saved successfully'}, status=status.HTTP_200_OK)
+def annotation_data(annotation):
+    """API representation of an annotation; prefetch ``label`` and ``attribute_values`` when serializing many."""
+    attributes = [
+        {
+            'attribute_id': av.attribute.id,
+            'attribute_name': av.attribute.name,
+            'value_id': av.value.id,
+            'value_value': av.value.value
+        }
+        for av in annotation.attribute_values.all()
+    ]
+    return {
+        'id': annotation.id,
+        'start_time': annotation.start_time,
+        'end_time': annotation.end_time,
+        'label_id': annotation.label.id if annotation.label else None,
+        'label_name': annotation.label.name if annotation.label else None,
+        'model_label': annotation.model_label,  # included even if null
+        'attributes': attributes
+    }
 
+@api_view(['POST'])
+def annotation_operations(request, task_id):
+    """Apply a batch of add/update/delete operations to a task's annotations.
+
+    Body: ``{"operations": [{"op": "add", "client_id": ..., "annotation": {...}},
+    {"op": "update", "id" or "client_id": ..., "annotation": {...changed fields}},
+    {"op": "delete", "id" or "client_id": ...}]}``.  The batch is applied in
+    order and atomically; only the changed rows are returned.
+    """
+    try:
+        task = Task.objects.get(pk=task_id)
     except Task.DoesNotExist:
         return Response({'error': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
-    except Exception as e:
+
+    operations = request.data.get('operations')
+    if not isinstance(operations, list):
+        return Response({'error': 'operations must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        changed_ids, client_ids, deleted_ids = apply_operations(task, operations)
+    except (OperationError, KeyError, TypeError, ValueError) as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    changed = (
+        Annotation.objects.filter(pk__in=changed_ids)
+        .select_related('label')
+        .prefetch_related('attribute_values__attribute', 'attribute_values__value')
+    )
+    return Response({
+        'annotations': [annotation_data(annotation) for annotation in changed],
+        'client_ids': client_ids,
+        'deleted': deleted_ids,
+    }, status=status.HTTP_200_OK)
+
+def annotations_etag(task, representation=''):
+    return f'"{task.id}.{task.annotations_version}{representation}"'
+
+def etag_matches(request, etag):
+    """Whether the request's If-None-Match header lists ``etag`` (weak or strong)."""
+    header = request.headers.get('If-None-Match', '')
+    candidates = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+    return etag in candidates or '*' in candidates
+
 @api_view(['GET'])
+@renderer_classes([JSONRenderer, BrowsableAPIRenderer, ColumnarJSONRenderer])
 def get_annotations(request, task_id):
-    """Fetch all annotations (manual + model) for a given task."""
+    """Fetch all annotations (manual + model) for a given task.
+
+    With ``?start=<t0>&end=<t1>`` (seconds) only the annotations overlapping
+    that window are returned, ordered by start time, so long recordings can be
+    paged in as the viewport moves.  Responses carry the task's annotation
+    version as ETag; a request whose If-None-Match still matches gets 304
+    without the annotations being read.  Clients accepting
+    ``application/vnd.annotations.columnar+json`` get the compact columnar
+    encoding (see columnar.py).
+    """
     try:
-        task = Task.objects.get(pk=task_id)
-        annotations = Annotation.objects.filter(task=task)
-
-        results = []
-        for annotation in annotations:
-            attributes = [
-                {
-                    'attribute_id': av.attribute.id,
-                    'attribute_name': av.attribute.name,
-                    'value_id': av.value.id,
-                    'value_value': av.value.value
-                }
-                for av in annotation.attribute_values.all()
-            ]
-            results.append({
-                'id': annotation.id,
-                'start_time': annotation.start_time,
-                'end_time': annotation.end_time,
-                'label_id': annotation.label.id if annotation.label else None,
-                'label_name': annotation.label.name if annotation.label else None,
-                'model_label': annotation.model_label,  # included even if null
-                'attributes': attributes
-            })
-
-        return Response({'annotations': results}, status=status.HTTP_200_OK)
+        window = [float(request.GET[name]) if name in request.GET else None for name in ('start', 'end')]
+    except ValueError:
+        return Response({'error': 'start and end must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
 
+    try:
+        task = Task.objects.only('id', 'annotations_version').get(pk=task_id)
     except Task.DoesNotExist:
         return Response({'error': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
 
+    columnar = request.accepted_renderer.format == ColumnarJSONRenderer.format
+    etag = annotations_etag(task, '.columnar' if columnar else '')
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept'}
+    if etag_matches(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    annotations = Annotation.objects.filter(task=task)
+    start, end = window
+    if start is not None or end is not None:
+        # Overlap test on (task, start_time, end_time), answered from annotation_task_time_idx
+        if end is not None:
+            annotations = annotations.filter(start_time__lt=end)
+        if start is not None:
+            annotations = annotations.filter(end_time__gt=start)
+        annotations = annotations.order_by('start_time')
+    if columnar:
+        return Response(columnar_encode(annotations), status=status.HTTP_200_OK, headers=headers)
+
+    annotations = (
+        annotations
+        .select_related('label')
+        .prefetch_related(Prefetch(
+            'attribute_values',
+            queryset=AnnotationAttributeValue.objects.select_related('attribute', 'value'),
+        ))
+    )
+    results = [annotation_data(annotation) for annotation in annotations]
+
+    return Response({'annotations': results}, status=status.HTTP_200_OK, headers=headers)
+
 @api_view(['DELETE'])
 def delete_annotation(request, annotation_id):
     """Delete a single annotation."""
     try:
         ann = Annotation.objects.get(pk=annotation_id)
         ann.delete()
+        bump_version(Task.objects.filter(pk=ann.task_id))
         return Response({'message': 'Annotation deleted'}, status=status.HTTP_200_OK)
     except Annotation.DoesNotExist:
         return Response({'error': 'Annotation not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -547,8 +596,6 @@ def export_annotations(request, task_id):
     try:
         task = Task.objects.select_related('audio_file').get(pk=task_id)
         annotations = Annotation.objects.filter(task=task)
-        audio_path = task.audio_file.file.path
-        audio = AudioSegment.from_file(audio_path)
 
         with tempfile.TemporaryDirectory() as export_dir:
             clips_dir = os.path.join(export_dir, 'clips')
@@ -557,13 +604,9 @@ def export_annotations(request, task_id):
             json_data = []
 
             for i, ann in enumerate(annotations, 1):
-                start_ms = int(ann.start_time * 1000)
-                end_ms = int(ann.end_time * 1000)
-                clip = audio[start_ms:end_ms]
-
                 clip_filename = f"clip_{i}.wav"
                 clip_path = os.path.join(clips_dir, clip_filename)
-                clip.export(clip_path, format="wav")
+                audio.write_clip(task.audio_file, task.offset + ann.start_time, task.offset + ann.end_time, clip_path)
 
                 attributes = AnnotationAttributeValue.objects.filter(annotation=ann)
                 attr_data = [{
@@ -611,16 +654,11 @@ def export_project_annotations(request, project_id):
 
         with tempfile.TemporaryDirectory() as export_dir:
             for task in tasks:
-                audio_path = task.audio_file.file.path
-                audio_filename = os.path.basename(audio_path)
-                audio = AudioSegment.from_file(audio_path)
-
                 task_dir = os.path.join(export_dir, f"task_{task.id}")
                 os.makedirs(task_dir, exist_ok=True)
 
                 # Copy the original audio file
-                original_audio_dest = os.path.join(task_dir, audio_filename)
-                shutil.copy(audio_path, original_audio_dest)
+                audio_filename = copy_task_audio(task, task_dir)
 
                 task_data = {
                     "task_id": task.id,
@@ -630,13 +668,9 @@ def export_project_annotations(request, project_id):
 
                 annotations = Annotation.objects.filter(task=task)
                 for i, ann in enumerate(annotations, 1):
-                    start_ms = int(ann.start_time * 1000)
-                    end_ms = int(ann.end_time * 1000)
-                    clip = audio[start_ms:end_ms]
-
                     clip_filename = f"clip_{i}.wav"
                     clip_path = os.path.join(task_dir, clip_filename)
-                    clip.export(clip_path, format="wav")
+                    audio.write_clip(task.audio_file, task.offset + ann.start_time, task.offset + ann.end_time, clip_path)
 
                     attributes = AnnotationAttributeValue.objects.filter(annotation=ann)
                     attr_data = [{
@@ -699,16 +733,11 @@ def export_superproject_annotations(request, superproject_id):
 
                 tasks = Task.objects.filter(project=project).select_related('audio_file')
                 for task in tasks:
-                    audio_path = task.audio_file.file.path
-                    audio_filename = os.path.basename(audio_path)
-                    audio = AudioSegment.from_file(audio_path)
-
                     task_dir = os.path.join(export_dir, f"project_{project.id}/task_{task.id}")
                     os.makedirs(task_dir, exist_ok=True)
 
                     # Copy original audio
-                    original_audio_dest = os.path.join(task_dir, audio_filename)
-                    shutil.copy(audio_path, original_audio_dest)
+                    audio_filename = copy_task_audio(task, task_dir)
 
                     task_data = {
                         "task_id": task.id,
@@ -718,13 +747,9 @@ def export_superproject_annotations(request, superproject_id):
 
                     annotations = Annotation.objects.filter(task=task)
                     for i, ann in enumerate(annotations, 1):
-                        start_ms = int(ann.start_time * 1000)
-                        end_ms = int(ann.end_time * 1000)
-                        clip = audio[start_ms:end_ms]
-
                         clip_filename = f"clip_{i}.wav"
                         clip_path = os.path.join(task_dir, clip_filename)
-                        clip.export(clip_path, format="wav")
+                        audio.write_clip(task.audio_file, task.offset + ann.start_time, task.offset + ann.end_time, clip_path)
 
                         attributes = AnnotationAttributeValue.objects.filter(annotation=ann)
                         attr_data = [{
@@ -782,10 +807,11 @@ def inference_view(request):
 
         for annotation in annotations:
             try:
-                # Load audio and extract clip based on annotation's time
-                audio_path = annotation.task.audio_file.file.path
-                y, sr = librosa.load(audio_path, sr=None)
-                clip = y[int(annotation.start_time * sr):int(annotation.end_time * sr)]
+                # Read the annotation's span from the shared decoded-audio cache
+                offset = annotation.task.offset
+                clip, sr = audio.read_range(
+                    annotation.task.audio_file, offset + annotation.start_time, offset + annotation.end_time, sr=None
+                )
 
                 import numpy as np
 
@@ -890,7 +916,9 @@ def delete_annotations_view(request):
 
     annotations = Annotation.objects.filter(id__in=ids)
     count = annotations.count()
+    task_ids = set(annotations.values_list('task_id', flat=True))
     annotations.delete()
+    bump_version(Task.objects.filter(pk__in=task_ids))
 
     return Response({'message': f'Deleted {count} annotations'})
 
@@ -140,3 +140,64 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+
+# Auto-annotation cascade: YAMNet labels every segment first, and segments
+# below this confidence or in one of these classes are re-labelled by BEATs.
+# Silence is never escalated: those segments are not kept as annotations.
+CASCADE_CONFIDENCE_THRESHOLD = 0.5
+CASCADE_AMBIGUOUS_CLASSES = ['Speech', 'Music', 'Inside, small room']
+
+# Auto-annotation ensemble: per-model weights applied to each model's top-k
+# class scores before picking the fused label.
+ENSEMBLE_WEIGHTS = {'beats': 0.6, 'yamnet': 0.4}
+ENSEMBLE_TOP_K = 10
+
+# Decoded-audio cache (annotation/audio.py): mono PCM .npy files shared by
+# auto-annotation, feature extraction and export, trimmed LRU-first.
+AUDIO_CACHE_DIR = BASE_DIR / 'audio_cache'
+AUDIO_CACHE_MAX_BYTES = 10 * 1024 ** 3
+AUDIO_CACHE_DTYPE = 'float32'  # or 'int16' to halve the cache size
+
+# External decoders used for range reads and probing of compressed formats
+FFMPEG_BINARY = 'ffmpeg'
+FFPROBE_BINARY = 'ffprobe'
+
+# Stored audio (annotation/storage.py) placed within this many seconds is not
+# deleted on release, since its ingest may still be committing; the
+# sweep_storage command removes it later if it ended up unreferenced.
+STORAGE_RELEASE_GRACE_SECONDS = 24 * 60 * 60
+
+# Resumable uploads (annotation/uploads.py) not appended to for this long are
+# discarded by the sweep_storage command
+UPLOAD_EXPIRY_SECONDS = 24 * 60 * 60
+
+# Rows per INSERT when ingesting tasks and model annotations
+INGEST_BATCH_SIZE = 1000
+
+# Analyzers (annotation/analysis.py) run over one decode of every ingested file
+INGEST_ANALYZERS = ['loudness', 'clipping', 'peaks', 'silence', 'fingerprint']
+
+# Waveform overview points kept per file by the 'peaks' analyzer (10 ms peaks are max-pooled down to this)
+INGEST_PEAKS_MAX_POINTS = 4000
+
+# Near-duplicate detection (annotation/fingerprint.py): landmarks that must agree
+# on one time shift to call two files the same recording.  Model predictions of
+# a near-duplicate are always reused; labelled annotations only when enabled.
+FINGERPRINT_MIN_MATCHES = 20
+# Landmarks of a new file looked up in the index (spread evenly over the file)
+FINGERPRINT_QUERY_LANDMARKS = 2000
+NEAR_DUPLICATE_REUSE_ANNOTATIONS = False
+
+# Chunks of one optimized file annotated in parallel (each runs its own model process)
+AUTO_ANNOTATION_WORKERS = 2
+
+# Serialized project label schemas (annotation/schema.py) are cached by project
+# and schema version.  With several server processes use a shared backend, e.g.
+# 'django.core.cache.backends.filebased.FileBasedCache' with a LOCATION.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+LABEL_SCHEMA_CACHE_TIMEOUT = 24 * 60 * 60
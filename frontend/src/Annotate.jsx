@@ -120,13 +120,13 @@ const handleLogout = () => {
 
         {task.project.display_spectrogram && (
           <div className="my-3">
-            <SpectrogramViewer audioUrl={task.audio_file.file} />
+            <SpectrogramViewer audioUrl={task.audio_url} />
           </div>
         )}
 
         {task.project.display_waveform && (
           <WaveformAnnotator
-            audioUrl={task.audio_file.file}
+            audioUrl={task.audio_url}
             labels={task.project.labels}
             initialAnnotations={annotations}
             onAnnotationsChange={setAnnotations}
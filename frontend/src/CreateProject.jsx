@@ -236,6 +236,8 @@ function CreateProject() {
           <Form.Select value={modelType} onChange={(e) => setModelType(e.target.value)} required>
             <option value="beats">BEATs</option>
             <option value="yamnet">YAMNet</option>
+            <option value="cascade">Cascade (YAMNet, then BEATs)</option>
+            <option value="ensemble">Ensemble (BEATs + YAMNet)</option>
             <option value="others">Others</option>
           </Form.Select>
         </Form.Group>
@@ -11,6 +11,7 @@ import {
 } from 'react-bootstrap';
 import { useNavigate } from 'react-router-dom';
 import { API_ROUTES } from './api';
+import { fetchAllPages } from './pagination';
 
 function CreateSuperProject() {
   const navigate = useNavigate();
@@ -22,13 +23,8 @@ function CreateSuperProject() {
   const [showModal, setShowModal] = useState(false);
 
   useEffect(() => {
-    fetch(API_ROUTES.getUsers)
-
-      .then((res) => res.json())
-      .then((data) => {
-        const onlyAnnotators = data.filter((user) => user.role === 'annotator');
-        setAnnotators(onlyAnnotators);
-      })
+    fetchAllPages(API_ROUTES.getUsers, { role: 'annotator', fields: 'id,username' })
+      .then((onlyAnnotators) => setAnnotators(onlyAnnotators))
       .catch((err) => console.error('Failed to fetch annotators:', err));
   }, []);
 
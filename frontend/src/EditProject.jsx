@@ -16,6 +16,7 @@ import {
 } from 'react-bootstrap';
 import axios from 'axios';
 import { API_ROUTES } from './api';
+import { fetchAllPages } from './pagination';
 
 function EditProject() {
   const navigate = useNavigate();
@@ -47,12 +48,15 @@ function EditProject() {
         setDegree(p.degree);
         setModelType(p.model_type || 'others');
 
+        // Ids are kept so the backend can tell a renamed label, attribute or value from a new one
         const normalizedLabels = (p.labels || []).map(label => ({
+          id: label.id,
           name: label.name,
           attributes: (label.attributes || []).map(attr => ({
+            id: attr.id,
             name: attr.name,
             values: (attr.values || []).map(v =>
-              typeof v === 'string' ? v : v.value
+              typeof v === 'string' ? { value: v } : { id: v.id, value: v.value }
             )
           }))
         }));
@@ -66,11 +70,8 @@ function EditProject() {
         alert('Could not load project.');
       });
 
-    axios.get(API_ROUTES.getUsers)
-      .then(res => {
-        const annotators = res.data.filter(u => u.role === 'annotator');
-        setAllAnnotators(annotators);
-      });
+    fetchAllPages(API_ROUTES.getUsers, { role: 'annotator', fields: 'id,username' })
+      .then(annotators => setAllAnnotators(annotators));
   }, [id]);
 
   const handleLabelNameChange = (li, v) => {
@@ -92,19 +93,19 @@ function EditProject() {
 
   const addAttribute = (li) => {
     const L = [...labels];
-    L[li].attributes.push({ name: '', values: [''] });
+    L[li].attributes.push({ name: '', values: [{ value: '' }] });
     setLabels(L);
   };
 
   const handleAttributeValueChange = (li, ai, vi, v) => {
     const L = [...labels];
-    L[li].attributes[ai].values[vi] = v;
+    L[li].attributes[ai].values[vi] = { ...L[li].attributes[ai].values[vi], value: v };
     setLabels(L);
   };
 
   const addAttributeValue = (li, ai) => {
     const L = [...labels];
-    L[li].attributes[ai].values.push('');
+    L[li].attributes[ai].values.push({ value: '' });
     setLabels(L);
   };
 
@@ -119,10 +120,12 @@ function EditProject() {
     setLoading(true);  // Set loading state before submitting the form
 
     const cleanedLabels = labels.map(l => ({
+      id: l.id,
       name: l.name || '',
       attributes: (l.attributes || []).map(a => ({
+        id: a.id,
         name: a.name || '',
-        values: (a.values || []).map(v => v || '')
+        values: (a.values || []).map(v => ({ id: v.id, value: v.value || '' }))
       })),
     }));
 
@@ -263,6 +266,8 @@ function EditProject() {
             <option value="others">None (Manual)</option>
             <option value="beats">Beats</option>
             <option value="yamnet">YAMNet</option>
+            <option value="cascade">Cascade (YAMNet, then BEATs)</option>
+            <option value="ensemble">Ensemble (BEATs + YAMNet)</option>
           </Form.Select>
           <Form.Text className="text-muted">
             Changing this will re-run model predictions and overwrite model-based annotations.
@@ -306,7 +311,7 @@ function EditProject() {
                     <InputGroup className="mb-2" key={vi}>
                       <FormControl
                         placeholder="Value"
-                        value={val}
+                        value={val.value}
                         onChange={e => handleAttributeValueChange(li, ai, vi, e.target.value)}
                       />
                       <Button
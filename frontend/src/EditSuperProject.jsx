@@ -11,6 +11,7 @@ import {
   Image
 } from 'react-bootstrap';
 import { API_ROUTES } from './api';
+import { fetchAllPages } from './pagination';
 
 function EditSuperProject() {
   const { id } = useParams();
@@ -31,12 +32,8 @@ function EditSuperProject() {
         setSelectedMembers(data.annotators || []);
       });
 
-    fetch(API_ROUTES.getUsers)
-      .then(res => res.json())
-      .then(data => {
-        const annotators = data.filter(user => user.role === 'annotator');
-        setAllAnnotators(annotators);
-      });
+    fetchAllPages(API_ROUTES.getUsers, { role: 'annotator', fields: 'id,username' })
+      .then(annotators => setAllAnnotators(annotators));
   }, [id]);
 
   const handleCheckboxChange = (uid) => {
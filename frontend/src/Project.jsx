@@ -13,6 +13,7 @@ import {
 import axios from 'axios';
 import FileSaver from 'file-saver';
 import { API_ROUTES } from './api';
+import { fetchAllPages } from './pagination';
 
 
 function Project() {
@@ -32,8 +33,7 @@ function Project() {
   useEffect(() => {
     if (!user) return;
   
-    fetch(API_ROUTES.getProjectsByUserOrManager(user))
-      .then((res) => res.json())
+    fetchAllPages(API_ROUTES.getProjectsByUserOrManager(user), { fields: 'id,name,data_type,degree' })
       .then((data) => setProjects(data))
       .catch((err) => console.error('Failed to fetch projects:', err));
   }, [user]);
@@ -4,6 +4,7 @@ import { useNavigate } from 'react-router-dom';
 import { Navbar, Nav, Container, Image, Row, Col, Card } from 'react-bootstrap';
 import { Button } from 'react-bootstrap';
 import { API_ROUTES } from './api';
+import { fetchAllPages } from './pagination';
 
 
 function SuperProject() {
@@ -22,8 +23,7 @@ function SuperProject() {
 
   useEffect(() => {
     if (user) {
-      fetch(API_ROUTES.getSuperProjects(user.id))
-        .then((res) => res.json())
+      fetchAllPages(API_ROUTES.getSuperProjects(user.id), { fields: 'id,name' })
         .then((data) => setSuperProjects(data))
         .catch((err) => console.error('Error fetching super projects:', err));
     }
@@ -19,6 +19,7 @@ import { API_ROUTES } from './api';
 function Tasks() {
   const navigate = useNavigate();
   const [tasks, setTasks] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
   const [filter, setFilter] = useState('All');
   const [loadingTaskId, setLoadingTaskId] = useState(null);
 
@@ -32,14 +33,20 @@ function Tasks() {
       return;
     }
 
+    // Ignore a response that arrives after the filter has changed again
+    let ignore = false;
     const fetchTasks = async () => {
       try {
         const params = userRole === 'manager'
-          ? { manager_id: userId }
-          : { user_id: userId };
+          ? { manager_id: userId, fields: 'id,status' }
+          : { user_id: userId, fields: 'id,status' };
+        // Filtered on the server, so every page (and `next`) only holds matching tasks
+        if (filter !== 'All') params.status = filter;
 
         const res = await axios.get(API_ROUTES.getTasks, { params });
-        setTasks(res.data);
+        if (ignore) return;
+        setTasks(res.data.results);
+        setNextPage(res.data.next);
       } catch (err) {
         console.error('Error fetching tasks:', err);
         alert('Failed to fetch tasks.');
@@ -47,11 +54,20 @@ function Tasks() {
     };
 
     fetchTasks();
-  }, [userId, userRole, navigate]);
+    return () => { ignore = true; };
+  }, [userId, userRole, filter, navigate]);
 
-  const filteredTasks = filter === 'All'
-    ? tasks
-    : tasks.filter(t => t.status === filter);
+  // The task list is cursor paginated; `next` is the full URL of the following page
+  const loadMore = async () => {
+    try {
+      const res = await axios.get(nextPage);
+      setTasks(prev => [...prev, ...res.data.results]);
+      setNextPage(res.data.next);
+    } catch (err) {
+      console.error('Error fetching tasks:', err);
+      alert('Failed to fetch tasks.');
+    }
+  };
 
   const exportAnnotations = async (taskId, e) => {
     e.stopPropagation();
@@ -129,11 +145,11 @@ function Tasks() {
           </Form.Select>
         </div>
 
-        {filteredTasks.length === 0 ? (
+        {tasks.length === 0 ? (
           <p className="text-muted">No tasks found for this filter.</p>
         ) : (
           <Row className="g-3">
-            {filteredTasks.map(task => (
+            {tasks.map(task => (
               <Col md={4} key={task.id}>
                 <Card
                   onClick={() => navigate(`/annotate/${task.id}`)}
@@ -160,6 +176,12 @@ function Tasks() {
             ))}
           </Row>
         )}
+
+        {nextPage && (
+          <div className="text-center my-3">
+            <Button variant="outline-primary" onClick={loadMore}>Load more</Button>
+          </div>
+        )}
       </Container>
     </>
   );
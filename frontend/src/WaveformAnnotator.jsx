@@ -180,9 +180,18 @@ const WaveformAnnotator = ({ audioUrl, labels, initialAnnotations, onAnnotations
     setRegions(updated);
     setShowLabelModal(false);
     setEditingRegionId(null);
+    // Same shape as handleLabelSave, so the save diff keeps the remaining rows instead of recreating them
     const out = Object.entries(updated).map(([id,val])=>{
       const r=regionsPlugin.current.getRegions().find(x=>x.id===id);
-      return { start_time:r.start,end_time:r.end,label_id:val.label,attributes:Object.entries(val.attributes).map(([a,v])=>({attribute_id:+a,value_id:+v})) };
+      return {
+        start_time: r.start,
+        end_time: r.end,
+        label_id: val.label,
+        attributes: Object.entries(val.attributes).map(([a,v])=>({attribute_id:+a,value_id:+v})),
+        model_label: val.modelLabel,
+        is_model_generated: val.isModelGenerated,
+        annotation_id: val.annotationId
+      };
     });
     onAnnotationsChange(out);
   };
@@ -20,6 +20,11 @@ export const API_ROUTES = {
   // Project-related routes
   getProjects: `${BASE_URL}/projects/`,
   createProject: `${BASE_URL}/projects/create/`,
+
+  // Resumable upload routes
+  createUpload: `${BASE_URL}/uploads/`,
+  uploadChunk: (uploadId) => `${BASE_URL}/uploads/${uploadId}/`,
+  finalizeUpload: (uploadId) => `${BASE_URL}/uploads/${uploadId}/finalize/`,
   getProjectById: (projectId) => `${BASE_URL}/projects/${projectId}/`,  // ✅ already correct
   updateProject: (projectId) => `${BASE_URL}/projects/update/${projectId}/`,  // ✅ used in edit
   deleteProject: (projectId) => `${BASE_URL}/projects/delete/${projectId}/`,
@@ -29,6 +34,7 @@ export const API_ROUTES = {
   getTask: (taskId) => `${BASE_URL}/task/${taskId}/`,
   getAnnotations: (taskId) => `${BASE_URL}/tasks/${taskId}/annotations/`,
   saveAnnotations: (taskId) => `${BASE_URL}/tasks/${taskId}/save_annotations/`,
+  annotationOperations: (taskId) => `${BASE_URL}/tasks/${taskId}/annotations/batch/`,
   exportAnnotations: (taskId) => `${BASE_URL}/tasks/${taskId}/export/`,
   deleteAnnotation: (annotationId) => `${BASE_URL}/annotations/${annotationId}/`,
   exportProjectAnnotations: (projectId) => `${BASE_URL}/projects/${projectId}/export/`,
@@ -0,0 +1,13 @@
+import axios from 'axios';
+
+// List endpoints are cursor paginated: { next, previous, results }.
+// Follows `next` until the last page; use for short lists such as pickers.
+export const fetchAllPages = async (url, params = {}) => {
+  let res = await axios.get(url, { params });
+  const results = [...res.data.results];
+  while (res.data.next) {
+    res = await axios.get(res.data.next);
+    results.push(...res.data.results);
+  }
+  return results;
+};